@@ -1,291 +1,312 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 import json # For saving/loading scenarios
-import numpy_financial as npf # For IRR/NPV (pip install numpy-financial)
-
-# --- DEFAULT PARAMETERS ---
-DEFAULT_SINGLE_MACHINE_PARAMS = {
-    "id": 1,
-    "machine_cost": 1000000,
-    "machine_lifespan_years": 4,
-    "annual_maintenance_cost_pct": 0.10,
-    "engineer_monthly_salary": 7000,
+import os
+import re
+import sqlite3
+
+from simulator.background import submit_job
+from simulator.cache import cache_stats, content_hash, memoized
+from simulator.calculations import DEFAULT_SINGLE_MACHINE_PARAMS, DEFAULT_GLOBAL_PARAMS
+from simulator.grid import GRID_MAX_POINTS, GRID_METRICS, assemble_grid, downsample_grid, evaluate_grid, grid_parameters, iter_grid_chunks
+from simulator.irr import IRR_STATUS_LABELS
+from simulator.ledger import simulate_fleet_ledger, summarize_ledger
+from simulator.montecarlo import iter_monte_carlo, summarize_distribution
+from simulator.optimizer import machine_types_from_fleet, optimize_fleet
+from simulator.batch import MACHINE_PARAM_KEYS, evaluate_batch
+from simulator.params import BULK_OPERATIONS, FleetParams, GlobalParams, ScenarioParams
+from simulator.profiling import Profiler, active_profiler
+from simulator.scenario import get_all_inputs_as_dict
+from simulator.scheduler import generate_portfolio, simulate_production, summarize_production
+from simulator.sensitivity import SENSITIVITY_METRICS, sensitivity_analysis
+from simulator.store import DEFAULT_STORE_PATH, ScenarioStore
+
+FLEET_FORM_MAX_MACHINES = 10 # Larger fleets are edited in the fleet table only
+# The per-machine forms and the fleet table share FleetParams.validate's lower bounds (and no upper ones),
+# so a fleet edited in one view always fits the other's widgets
+MACHINE_INPUT_MIN_VALUES = {"machine_cost": 0.0, "machine_lifespan_years": 1, "annual_maintenance_cost_pct": 0.0, "engineer_monthly_salary": 0.0}
+FLEET_INPUT_MODES = ["Per-Machine Forms", "Fleet Table"]
+BACKGROUND_POLL_SECONDS = 0.5 # How often a running background job's partial results are redrawn
+MC_CHUNK_SIZE = 10_000 # Draws per chunk whether streamed or not, so a seed gives the same draws either way
+GRID_STREAM_CHUNK_SIZE = 50_000
+DEFAULT_MC_SPEC = {
+    "global_params": {
+        "powder_cost_per_ton": {"dist": "triangular", "low": 600, "mode": 700, "high": 900},
+        "market_selling_price_per_villa": {"dist": "normal", "mean": 2200000, "std": 150000},
+        "villa_printing_days_3dcp": {"dist": "discrete", "values": [25, 30, 35], "probs": [0.25, 0.5, 0.25]},
+    },
+    "machine_params": {},
 }
+DEFAULT_MC_NUM_SAMPLES = 100000
+DEFAULT_MC_SEED = 42
 
-DEFAULT_GLOBAL_PARAMS = {
-    "operating_days_per_year": 250,
-    "discount_rate_for_npv": 0.10, # 10% discount rate
-    # Leasing
-    "lessor_target_profit_margin": 0.40,
-    "machine_utilization_leasing_days_per_machine": 200,
-    # Villa & Material (3DCP)
-    "powder_cost_per_ton": 700,
-    "powder_tons_per_villa": 100,
-    "steel_cables_cost_per_villa": 25000,
-    "villa_printing_days_3dcp": 30,
-    "villa_additional_prep_finish_days_3dcp": 15,
-    "market_selling_price_per_villa": 2200000,
-    # Detailed 3DCP Villa Costs (Excluding 3DCP Shell Process itself)
-    "cost_foundation_per_villa_3dcp": 80000,
-    "cost_roofing_per_villa_3dcp": 100000,
-    "cost_mep_per_villa_3dcp": 120000,
-    "cost_finishes_per_villa_3dcp": 150000,
-    "cost_site_prep_approvals_design_3dcp": 50000,
-    # Traditional Model
-    "traditional_villa_build_months": 9,
-    "traditional_villa_cost": 1300000, # This is the all-in cost for comparison
-}
-
-# --- CALCULATION FUNCTIONS ---
-def calculate_machine_operational_costs(machine_params, global_params):
-    annual_capital_recovery = machine_params["machine_cost"] / machine_params["machine_lifespan_years"]
-    annual_maintenance = machine_params["machine_cost"] * machine_params["annual_maintenance_cost_pct"]
-    annual_engineer_cost = machine_params["engineer_monthly_salary"] * 12
-    total_annual_op_cost = annual_capital_recovery + annual_maintenance + annual_engineer_cost
-    daily_op_cost = total_annual_op_cost / global_params["operating_days_per_year"]
-    return total_annual_op_cost, daily_op_cost
-
-def calculate_leasing_model_for_machine(machine_params, global_params):
-    results = {}
-    total_annual_op_cost, daily_op_cost = calculate_machine_operational_costs(machine_params, global_params)
-    results["total_annual_lessor_cost_per_machine"] = total_annual_op_cost
-    results["daily_lessor_cost_basis_per_machine"] = daily_op_cost
-    profit_margin_divisor = 1 - global_params["lessor_target_profit_margin"]
-    if profit_margin_divisor <= 0: profit_margin_divisor = 0.001
-    recommended_daily_lease_price = daily_op_cost / profit_margin_divisor
-    results["recommended_daily_lease_price_per_machine"] = recommended_daily_lease_price
-    daily_profit_lessor = recommended_daily_lease_price - daily_op_cost
-    annual_profit_lessor = daily_profit_lessor * global_params["machine_utilization_leasing_days_per_machine"]
-    results["annual_profit_lessor_per_machine_at_utilization"] = annual_profit_lessor
-    lease_cost_for_villa = recommended_daily_lease_price * global_params["villa_printing_days_3dcp"]
-    powder_cost_for_villa_lease = global_params["powder_cost_per_ton"] * global_params["powder_tons_per_villa"]
-    results["contractor_3dcp_elements_cost_per_villa_via_leasing"] = (
-        lease_cost_for_villa + powder_cost_for_villa_lease + global_params["steel_cables_cost_per_villa"]
-    )
-    return results
-
-
-def calculate_contracting_model_per_villa(machine_daily_op_cost, global_params):
-    results = {}
-    # 3DCP Shell Process Costs (Machine part + materials for shell)
-    machine_op_cost_for_project_per_villa = machine_daily_op_cost * global_params["villa_printing_days_3dcp"]
-    results["machine_op_cost_for_project_per_villa"] = machine_op_cost_for_project_per_villa 
-
-    powder_cost_for_villa = global_params["powder_cost_per_ton"] * global_params["powder_tons_per_villa"]
-    steel_cables_cost = global_params["steel_cables_cost_per_villa"]
-    total_3dcp_shell_process_cost = machine_op_cost_for_project_per_villa + powder_cost_for_villa + steel_cables_cost
-    results["total_3dcp_shell_process_cost_per_villa"] = total_3dcp_shell_process_cost
-
-    # Other Direct Villa Costs (3DCP) - Foundation, Roofing, MEP, Finishes, Site Prep/Design
-    other_direct_costs_3dcp = (
-        global_params["cost_foundation_per_villa_3dcp"] +
-        global_params["cost_roofing_per_villa_3dcp"] +
-        global_params["cost_mep_per_villa_3dcp"] +
-        global_params["cost_finishes_per_villa_3dcp"] +
-        global_params["cost_site_prep_approvals_design_3dcp"]
-    )
-    results["other_direct_costs_per_villa_3dcp"] = other_direct_costs_3dcp
-    
-    optimized_total_cost_per_3dcp_villa = total_3dcp_shell_process_cost + other_direct_costs_3dcp
-    results["optimized_total_cost_per_3dcp_villa"] = optimized_total_cost_per_3dcp_villa
-    
-    profit_per_3dcp_villa = global_params["market_selling_price_per_villa"] - optimized_total_cost_per_3dcp_villa
-    results["profit_per_3dcp_villa"] = profit_per_3dcp_villa
-    return results
-
-def calculate_fleet_contracting_financials(num_machines, list_of_machine_params, global_params, contracting_villa_details):
-    results = {} 
-    
-    villa_total_cycle_days_3dcp = global_params["villa_printing_days_3dcp"] + global_params["villa_additional_prep_finish_days_3dcp"]
-    if villa_total_cycle_days_3dcp == 0: villa_total_cycle_days_3dcp = 1 
-    villas_per_year_per_active_3dcp_machine = global_params["operating_days_per_year"] / villa_total_cycle_days_3dcp
-    total_villas_per_year_3dcp_fleet = villas_per_year_per_active_3dcp_machine * num_machines
-    results["villa_total_cycle_days_3dcp"] = villa_total_cycle_days_3dcp
-    results["villas_per_year_per_active_3dcp_machine"] = villas_per_year_per_active_3dcp_machine
-    results["total_villas_per_year_3dcp_fleet"] = total_villas_per_year_3dcp_fleet
-
-    annual_revenue_3dcp_fleet = total_villas_per_year_3dcp_fleet * global_params["market_selling_price_per_villa"]
-    results["annual_revenue_3dcp_fleet"] = annual_revenue_3dcp_fleet
-    
-    total_capital_invested_fleet = sum(mp["machine_cost"] for mp in list_of_machine_params)
-    results["total_capital_invested_fleet"] = total_capital_invested_fleet
-
-    total_annual_fleet_machine_op_costs = sum(calculate_machine_operational_costs(mp, global_params)[0] for mp in list_of_machine_params)
-    
-    variable_shell_material_cost_per_villa = (global_params["powder_cost_per_ton"] * global_params["powder_tons_per_villa"] +
-                                             global_params["steel_cables_cost_per_villa"])
-    total_annual_variable_shell_material_costs_fleet = variable_shell_material_cost_per_villa * total_villas_per_year_3dcp_fleet
-
-    variable_other_direct_costs_per_villa = contracting_villa_details["other_direct_costs_per_villa_3dcp"]
-    total_annual_other_direct_costs_fleet = variable_other_direct_costs_per_villa * total_villas_per_year_3dcp_fleet
-    
-    total_annual_cost_3dcp_fleet_contracting = (total_annual_fleet_machine_op_costs + 
-                                                total_annual_variable_shell_material_costs_fleet + 
-                                                total_annual_other_direct_costs_fleet)
-    results["total_annual_cost_3dcp_fleet_contracting"] = total_annual_cost_3dcp_fleet_contracting
-    
-    annual_profit_3dcp_fleet_contracting = annual_revenue_3dcp_fleet - total_annual_cost_3dcp_fleet_contracting
-    results["annual_profit_3dcp_fleet_contracting"] = annual_profit_3dcp_fleet_contracting
-    results["profit_per_3dcp_villa_fleet_avg"] = contracting_villa_details.get("profit_per_3dcp_villa", 0) 
-    
-    if total_capital_invested_fleet > 0:
-        results["roi_3dcp_fleet_contracting"] = (annual_profit_3dcp_fleet_contracting / total_capital_invested_fleet) * 100
-    else:
-        results["roi_3dcp_fleet_contracting"] = 0
-
-    cash_flows = [-total_capital_invested_fleet] 
-    machine_lifespan_for_npv = int(max(mp["machine_lifespan_years"] for mp in list_of_machine_params) if list_of_machine_params else 1)
+def load_scenario_into_session_state(scenario_data):
+    loaded_params = ScenarioParams.from_dict(scenario_data) # Validates before anything is changed
+    st.session_state.global_params = loaded_params.global_params
+    clear_global_widgets()
+    set_fleet(loaded_params.fleet)
+
+def clear_global_widgets():
+    # Global widgets re-read their values from global_params once their keys are gone
+    for key in [k for k in st.session_state if k.startswith("widget_global_")]:
+        del st.session_state[key]
+
+def set_fleet(fleet):
+    # Replace the whole fleet; call before the machine widgets are created (e.g. from a callback)
+    st.session_state.fleet_params = fleet
+    reset_fleet_table()
+    clear_machine_widgets()
+    if len(fleet) > FLEET_FORM_MAX_MACHINES: st.session_state.fleet_input_mode = "Fleet Table"
+    else: st.session_state.num_machines_widget = len(fleet)
+
+def reset_fleet_table():
+    # The table shows fleet_table_base plus the editor's pending edits, so a new base needs a fresh editor key
+    st.session_state.fleet_table_base = st.session_state.fleet_params
+    st.session_state.fleet_editor_version = st.session_state.get("fleet_editor_version", 0) + 1
+
+def on_fleet_input_mode_change():
+    reset_fleet_table()
+    clear_machine_widgets()
+    if len(st.session_state.fleet_params) <= FLEET_FORM_MAX_MACHINES:
+        st.session_state.num_machines_widget = len(st.session_state.fleet_params)
+
+def import_fleet_csv():
+    uploaded_fleet_csv = st.session_state.fleet_csv_uploader
+    if uploaded_fleet_csv is None:
+        return
+    try:
+        set_fleet(FleetParams.from_frame(pd.read_csv(uploaded_fleet_csv)))
+        st.session_state.fleet_message = ("success", f"Imported {len(st.session_state.fleet_params)} machines.")
+    except (ValueError, pd.errors.ParserError) as e:
+        st.session_state.fleet_message = ("error", f"Could not import fleet CSV: {e}")
+
+def apply_fleet_bulk_edit():
+    # Blank bounds mean the first / last machine
+    fleet_ids = st.session_state.fleet_params.ids
+    bulk_ids = fleet_ids[(fleet_ids >= (st.session_state.bulk_from_id or 0)) & (fleet_ids <= (st.session_state.bulk_to_id or fleet_ids.max()))]
+    try:
+        set_fleet(st.session_state.fleet_params.bulk_edit(st.session_state.bulk_parameter, st.session_state.bulk_operation, st.session_state.bulk_value, bulk_ids))
+    except ValueError as e:
+        st.session_state.fleet_message = ("error", str(e))
 
-    for _ in range(machine_lifespan_for_npv): 
-        cash_flows.append(annual_profit_3dcp_fleet_contracting)
-    
+def add_fleet_copies():
     try:
-        results["npv_3dcp_fleet"] = npf.npv(global_params["discount_rate_for_npv"], cash_flows)
-        results["irr_3dcp_fleet"] = npf.irr(cash_flows) * 100 if len(cash_flows) > 1 and not (len(set(cash_flows[1:])) <= 1 and cash_flows[1] <= 0) else "N/A (Check Cash Flows)"
-    except Exception as e: 
-        results["npv_3dcp_fleet"] = "N/A"
-        results["irr_3dcp_fleet"] = "N/A (Error)"
-
-    traditional_villa_build_days = global_params["traditional_villa_build_months"] * 30
-    if traditional_villa_build_days == 0: traditional_villa_build_days = 1
-    villas_per_year_traditional_setup = global_params["operating_days_per_year"] / traditional_villa_build_days
-    total_villas_per_year_traditional_equivalent_effort = villas_per_year_traditional_setup * num_machines
-    results["traditional_villa_build_days"] = traditional_villa_build_days
-    results["villas_per_year_per_traditional_setup"] = villas_per_year_traditional_setup
-    results["total_villas_per_year_traditional_equivalent_effort"] = total_villas_per_year_traditional_equivalent_effort
-    annual_revenue_traditional_equivalent = total_villas_per_year_traditional_equivalent_effort * global_params["market_selling_price_per_villa"]
-    results["annual_revenue_traditional_equivalent"] = annual_revenue_traditional_equivalent
-    total_cost_traditional_equivalent = total_villas_per_year_traditional_equivalent_effort * global_params["traditional_villa_cost"]
-    annual_profit_traditional_equivalent = annual_revenue_traditional_equivalent - total_cost_traditional_equivalent
-    results["annual_profit_traditional_equivalent_effort"] = annual_profit_traditional_equivalent
-    
-    cost_saving_per_villa_3dcp = global_params["traditional_villa_cost"] - contracting_villa_details.get("optimized_total_cost_per_3dcp_villa", global_params["traditional_villa_cost"])
-    time_saving_per_villa_3dcp_days = traditional_villa_build_days - villa_total_cycle_days_3dcp
-    results["cost_saving_per_villa_3dcp_vs_traditional"] = cost_saving_per_villa_3dcp
-    results["time_saving_per_villa_3dcp_vs_traditional_days"] = time_saving_per_villa_3dcp_days
-
-    fixed_costs_fleet = total_annual_fleet_machine_op_costs 
-    total_variable_costs_per_villa = variable_shell_material_cost_per_villa + variable_other_direct_costs_per_villa
-    contribution_margin_per_villa = (global_params["market_selling_price_per_villa"] - total_variable_costs_per_villa)
-                                     
-    if contribution_margin_per_villa > 0:
-        results["break_even_villas_fleet"] = fixed_costs_fleet / contribution_margin_per_villa
-    else:
-        results["break_even_villas_fleet"] = "N/A (CM <= 0)" 
-        
+        set_fleet(st.session_state.fleet_params.with_copies(st.session_state.copy_template_id, st.session_state.copy_count))
+    except ValueError as e:
+        st.session_state.fleet_message = ("error", str(e))
+
+def clear_machine_widgets(start=0):
+    # Machine widgets re-read their values from fleet_params once their keys are gone
+    for key in [k for k in st.session_state if re.fullmatch(r"m_(cost|life|maint|eng)_\d+", k)]:
+        if int(key.rsplit("_", 1)[1]) >= start:
+            del st.session_state[key]
+
+def load_stored_scenario(scenario_id):
+    # Runs as a button callback, before the widgets are created on the next rerun
+    if not os.path.exists(DEFAULT_STORE_PATH):
+        st.error(f"{DEFAULT_STORE_PATH} no longer exists.")
+        return
+    try:
+        with ScenarioStore(DEFAULT_STORE_PATH) as scenario_store:
+            stored_scenario = scenario_store.get_scenario(scenario_id)
+    except (sqlite3.Error, KeyError) as e:
+        st.error(f"Could not load the stored scenario: {e}")
+        return
+    load_scenario_into_session_state(stored_scenario)
+
+# --- BACKGROUND JOBS ---
+# Heavy analyses run in simulator.background; each session keeps at most one job per name
+def background_jobs():
+    return st.session_state.setdefault("background_jobs", {})
+
+def start_background_job(name, key, chunks):
+    cancel_background_job(name)
+    background_jobs()[name] = submit_job(key, chunks)
+
+def cancel_background_job(name):
+    job = background_jobs().get(name)
+    if job is not None: job.cancel()
+
+def cancel_stale_background_job(name, key):
+    # The inputs changed since the job started, so its results would no longer match the dashboard
+    job = background_jobs().get(name)
+    if job is not None and job.running and job.key != key:
+        job.cancel()
+        st.toast(f"Inputs changed: cancelled the running {name.replace('_', ' ')} job.")
+
+def pop_finished_background_job(name):
+    job = background_jobs().get(name)
+    return background_jobs().pop(name) if job is not None and not job.running else None
+
+def stream_background_job(name, render_partial, key_prefix):
+    # Redraws render_partial(job) while the rest of the page stays interactive; once the job stops,
+    # a full rerun lets the page collect its result
+    @st.fragment(run_every=BACKGROUND_POLL_SECONDS)
+    def poll_background_job():
+        job = background_jobs().get(name)
+        if job is None:
+            return
+        if not job.running:
+            st.rerun()
+        render_partial(job)
+        st.button("⏹️ Cancel", key=f"{key_prefix}_cancel_button", on_click=job.cancel)
+    poll_background_job()
+
+
+# --- CACHED CALCULATIONS & FIGURE BUILDERS ---
+# Keyed on input content, so reruns with unchanged inputs skip both the math and the figure building
+@memoized
+def evaluate_dashboard(scenarios, machines):
+    # One batch row as a dict, with the "N/A ..." labels of the scalar path where the batch engine gives NaN
+    results = evaluate_batch(scenarios, machines).iloc[0].to_dict()
+    if np.isnan(results["irr_3dcp_fleet"]):
+        results["irr_3dcp_fleet"] = IRR_STATUS_LABELS[int(results["irr_3dcp_fleet_status"])]
+    if np.isnan(results["break_even_villas_fleet"]):
+        results["break_even_villas_fleet"] = "N/A (CM <= 0)"
     return results
 
-def get_all_inputs_as_dict(global_inputs_from_ss, machine_list_from_ss):
-    # Global inputs are already in the correct format if taken from session_state
-    # Machine list is also in the correct format
-    return {
-        "global_params": global_inputs_from_ss,
-        "machine_params_list": machine_list_from_ss,
-        "num_machines": len(machine_list_from_ss) 
-    }
-
-def load_scenario_into_session_state(scenario_data):
-    loaded_global = scenario_data.get("global_params", {})
-    loaded_machines_list = scenario_data.get("machine_params_list", [])
-    loaded_num_machines = scenario_data.get("num_machines", 1)
-
-    for key, value in loaded_global.items():
-        session_key = f"global_{key}" 
-        if session_key in st.session_state: 
-             st.session_state[session_key] = value
-
-    st.session_state.num_machines_widget = loaded_num_machines 
-    
-    new_machine_params_list_for_ss = []
-    for i in range(loaded_num_machines):
-        machine_data = loaded_machines_list[i] if i < len(loaded_machines_list) else DEFAULT_SINGLE_MACHINE_PARAMS.copy()
-        
-        machine_id = machine_data.get("id", i + 1)
-        cost = machine_data.get("machine_cost", DEFAULT_SINGLE_MACHINE_PARAMS["machine_cost"])
-        lifespan = machine_data.get("machine_lifespan_years", DEFAULT_SINGLE_MACHINE_PARAMS["machine_lifespan_years"])
-        maintenance_pct = machine_data.get("annual_maintenance_cost_pct", DEFAULT_SINGLE_MACHINE_PARAMS["annual_maintenance_cost_pct"])
-        engineer_salary = machine_data.get("engineer_monthly_salary", DEFAULT_SINGLE_MACHINE_PARAMS["engineer_monthly_salary"])
-
-        new_machine_params_list_for_ss.append({
-            "id": machine_id, "machine_cost": cost, "machine_lifespan_years": lifespan,
-            "annual_maintenance_cost_pct": maintenance_pct, "engineer_monthly_salary": engineer_salary
-        })
-        
-        st.session_state[f"m_cost_{i}"] = cost
-        st.session_state[f"m_life_{i}"] = lifespan
-        st.session_state[f"m_maint_{i}"] = maintenance_pct
-        st.session_state[f"m_eng_{i}"] = engineer_salary
-    
-    st.session_state.machine_params_list = new_machine_params_list_for_ss
-    # Call the on_change handler for num_machines_widget to ensure consistency
-    # This will trigger the resizing of machine_params_list if num_machines changed
-    update_num_machines_internal()
+@memoized
+def build_profit_figure(fleet_financials_output):
+    profit_data = pd.DataFrame({
+        'Model': ['3DCP Fleet Contracting', 'Traditional Equivalent Effort'],
+        'Annual Net Profit (AED)': [
+            fleet_financials_output['annual_profit_3dcp_fleet_contracting'],
+            fleet_financials_output['annual_profit_traditional_equivalent_effort']
+        ]})
+    fig_profit = px.bar(profit_data, x='Model', y='Annual Net Profit (AED)', title='Annual Profit Comparison', color='Model', text_auto=True)
+    fig_profit.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
+    return fig_profit
+
+@memoized
+def build_cost_comparison_figure(contracting_villa_details_output, traditional_villa_cost):
+    cost_comparison_data = pd.DataFrame({
+        'Villa Type': ['3DCP Villa (Avg.)', 'Traditional Villa'],
+        'Total Cost per Villa (AED)': [contracting_villa_details_output['optimized_total_cost_per_3dcp_villa'], traditional_villa_cost]
+    })
+    fig_cost_comp = px.bar(cost_comparison_data, x='Villa Type', y='Total Cost per Villa (AED)', title='Total Cost per Villa Comparison', color='Villa Type', text_auto=True)
+    fig_cost_comp.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
+    return fig_cost_comp
+
+@memoized
+def build_villas_figure(fleet_financials_output, num_machines):
+    villas_data = pd.DataFrame({
+        'Production Method': [f"3DCP Fleet ({num_machines} machines)", f"Traditional Equivalent ({num_machines} teams)"],
+        'Villas per Year': [fleet_financials_output['total_villas_per_year_3dcp_fleet'], fleet_financials_output['total_villas_per_year_traditional_equivalent_effort']]
+    })
+    fig_villas = px.bar(villas_data, x='Production Method', y='Villas per Year', title='Annual Villa Production Capacity', color='Production Method', text_auto=True)
+    fig_villas.update_traces(texttemplate='%{y:.1f}', textposition='outside')
+    return fig_villas
+
+@memoized
+def build_timeline_figure(fleet_financials_output):
+    timeline_data = pd.DataFrame({
+        'Method': ['3DCP Villa Cycle', 'Traditional Villa Build'],
+        'Duration (Days)': [fleet_financials_output['villa_total_cycle_days_3dcp'], fleet_financials_output['traditional_villa_build_days']]
+    })
+    fig_timeline = px.bar(timeline_data, y='Method', x='Duration (Days)', title='Project Duration per Villa', orientation='h', color='Method', text_auto=True)
+    fig_timeline.update_traces(texttemplate='%{x:.0f} days', textposition='outside')
+    return fig_timeline
+
+def build_npv_histogram_figure(npv_values):
+    # Binned here so the browser only receives the bar heights
+    counts, edges = np.histogram(npv_values, bins=60)
+    npv_hist = pd.DataFrame({"NPV (AED)": (edges[:-1] + edges[1:]) / 2, "Draws": counts})
+    fig_npv_hist = px.bar(npv_hist, x="NPV (AED)", y="Draws", title="Fleet NPV Distribution")
+    fig_npv_hist.update_traces(width=edges[1] - edges[0] if len(edges) > 1 else None)
+    return fig_npv_hist
+
+def build_grid_figure(grid_result, grid_metric, metric_label, slice_index=0):
+    grid_result_params = list(grid_result["axes"])
+    grid_values = grid_result["metrics"][grid_metric]
+    grid_npv = grid_result["metrics"]["npv_3dcp_fleet"]
+    if len(grid_result_params) == 3:
+        grid_values = grid_values[:, :, slice_index]
+        grid_npv = grid_npv[:, :, slice_index]
+    grid_xy = [grid_result["axes"][grid_result_params[0]], grid_result["axes"][grid_result_params[1]]]
+    (grid_x_coords, grid_y_coords), grid_display = downsample_grid(grid_xy, grid_values)
+    _, grid_npv_display = downsample_grid(grid_xy, grid_npv)
+    fig_grid = go.Figure(go.Heatmap(x=grid_x_coords, y=grid_y_coords, z=grid_display.T, colorscale="RdYlGn", colorbar={"title": metric_label}))
+    fig_grid.add_trace(go.Contour(x=grid_x_coords, y=grid_y_coords, z=grid_npv_display.T, contours={"start": 0, "end": 0, "size": 1, "coloring": "lines", "showlabels": True},
+                                  line={"color": "black", "width": 2}, showscale=False, name="NPV Break-Even"))
+    fig_grid.update_layout(title=f"{metric_label} (black line: NPV = 0)", xaxis_title=grid_result_params[0], yaxis_title=grid_result_params[1], height=550)
+    return fig_grid
 
 
 st.set_page_config(layout="wide", page_title="Advanced 3DCP Business Simulator")
 st.title("🏗️ Advanced 3DCP Business Case & Financial Simulator")
 
-# Initialize session state for global parameters based on DEFAULT_GLOBAL_PARAMS
-for key, value in DEFAULT_GLOBAL_PARAMS.items():
-    session_key_global = f"global_{key}"
-    if session_key_global not in st.session_state:
-        st.session_state[session_key_global] = value
+# Profiling is opt-in from the Performance panel; an inactive profiler records nothing.
+# A run cut short by st.stop, st.rerun or an error leaves its profiler on this thread until the next run
+stale_profiler = active_profiler()
+if stale_profiler is not None: stale_profiler.deactivate()
+app_profiler = Profiler(track_allocations=st.session_state.get("profiling_allocations", False))
+if st.session_state.get("profiling_enabled", False): app_profiler.activate()
+
+# The globals are one GlobalParams; the sidebar widgets below edit it in place
+if 'global_params' not in st.session_state:
+    st.session_state.global_params = GlobalParams.from_dict(DEFAULT_GLOBAL_PARAMS)
 
 if 'num_machines_widget' not in st.session_state: 
     st.session_state.num_machines_widget = 1
-# Initialize machine_params_list based on num_machines_widget if it's not set or size mismatch
-if 'machine_params_list' not in st.session_state or len(st.session_state.machine_params_list) != st.session_state.num_machines_widget:
-    st.session_state.machine_params_list = []
-    for i in range(st.session_state.num_machines_widget):
-        new_m = DEFAULT_SINGLE_MACHINE_PARAMS.copy()
-        new_m["id"] = i + 1
-        st.session_state.machine_params_list.append(new_m)
-        # Also initialize individual machine widget session states
-        st.session_state[f"m_cost_{i}"] = new_m["machine_cost"]
-        st.session_state[f"m_life_{i}"] = new_m["machine_lifespan_years"]
-        st.session_state[f"m_maint_{i}"] = new_m["annual_maintenance_cost_pct"]
-        st.session_state[f"m_eng_{i}"] = new_m["engineer_monthly_salary"]
-
-
-with st.sidebar:
+# The fleet is one FleetParams (an array per machine parameter); the machine widgets below edit it in place
+if 'fleet_params' not in st.session_state:
+    st.session_state.fleet_params = FleetParams.default(st.session_state.num_machines_widget)
+if 'fleet_table_base' not in st.session_state:
+    reset_fleet_table()
+
+
+with st.sidebar, app_profiler.stage("render.sidebar"):
     st.header("⚙️ Global Simulation Parameters")
-    st.session_state.global_operating_days_per_year = st.number_input("Operating Days/Year", 100, 365, st.session_state.global_operating_days_per_year, 5, key="widget_global_operating_days_per_year", help="Total productive days available for machines annually.")
-    st.session_state.global_discount_rate_for_npv = st.slider("Discount Rate for NPV/IRR (%)", 0.01, 0.25, st.session_state.global_discount_rate_for_npv, 0.01, format="%.2f", key="widget_global_discount_rate_for_npv", help="Rate used to discount future cash flows for NPV calculation.")
+    global_params = st.session_state.global_params
+    global_params.operating_days_per_year = st.number_input("Operating Days/Year", 100, 365, global_params.operating_days_per_year, 5, key="widget_global_operating_days_per_year", help="Total productive days available for machines annually.")
+    global_params.discount_rate_for_npv = st.slider("Discount Rate for NPV/IRR (%)", 0.01, 0.25, global_params.discount_rate_for_npv, 0.01, format="%.2f", key="widget_global_discount_rate_for_npv", help="Rate used to discount future cash flows for NPV calculation.")
 
     st.subheader("Leasing Model Globals")
-    st.session_state.global_lessor_target_profit_margin = st.slider("Lessor Target Profit Margin (%)", 0.01, 0.90, st.session_state.global_lessor_target_profit_margin, 0.01, format="%.2f", key="widget_global_lessor_target_profit_margin", help="Desired profit margin for the lessor on leasing operations.")
-    st.session_state.global_machine_utilization_leasing_days_per_machine = st.number_input("Machine Util. Days (Leasing)", 1, st.session_state.global_operating_days_per_year, st.session_state.global_machine_utilization_leasing_days_per_machine, 5, key="widget_global_machine_utilization_leasing_days_per_machine", help="Expected number of days each machine will be leased out per year.")
+    global_params.lessor_target_profit_margin = st.slider("Lessor Target Profit Margin (%)", 0.01, 0.90, global_params.lessor_target_profit_margin, 0.01, format="%.2f", key="widget_global_lessor_target_profit_margin", help="Desired profit margin for the lessor on leasing operations.")
+    global_params.machine_utilization_leasing_days_per_machine = st.number_input("Machine Util. Days (Leasing)", 1, global_params.operating_days_per_year, global_params.machine_utilization_leasing_days_per_machine, 5, key="widget_global_machine_utilization_leasing_days_per_machine", help="Expected number of days each machine will be leased out per year.")
 
     st.subheader("Villa Construction & Material Globals (3DCP)")
-    st.session_state.global_powder_cost_per_ton = st.number_input("Powder Cost/Ton (AED)", 100, value=st.session_state.global_powder_cost_per_ton, step=10, key="widget_global_powder_cost_per_ton", help="Cost of 1 ton of 3D printing powder.")
-    st.session_state.global_powder_tons_per_villa = st.number_input("Powder Tons/Villa", 10, value=st.session_state.global_powder_tons_per_villa, step=5, key="widget_global_powder_tons_per_villa", help="Amount of powder required for one villa.")
-    st.session_state.global_steel_cables_cost_per_villa = st.number_input("Steel/Cables Cost/Villa (AED)", 0, value=st.session_state.global_steel_cables_cost_per_villa, step=1000, key="widget_global_steel_cables_cost_per_villa", help="Cost of steel reinforcement and cables per villa.")
-    st.session_state.global_villa_printing_days_3dcp = st.number_input("Villa Printing Days (3DCP)", 5, value=st.session_state.global_villa_printing_days_3dcp, step=1, key="widget_global_villa_printing_days_3dcp", help="Number of days the 3D printer is actively printing for one villa.")
-    st.session_state.global_villa_additional_prep_finish_days_3dcp = st.number_input("Villa Additional Prep/Finish Days (3DCP)", 0, value=st.session_state.global_villa_additional_prep_finish_days_3dcp, step=1, key="widget_global_villa_additional_prep_finish_days_3dcp", help="Additional days for site prep, machine setup, and post-printing finishing related to one villa cycle.")
-    st.session_state.global_market_selling_price_per_villa = st.number_input("Market Selling Price/Villa (AED)", 500000, value=st.session_state.global_market_selling_price_per_villa, step=50000, key="widget_global_market_selling_price_per_villa", help="Expected selling price for a completed villa.")
+    global_params.powder_cost_per_ton = st.number_input("Powder Cost/Ton (AED)", 100.0, value=global_params.powder_cost_per_ton, step=10.0, format="%.0f", key="widget_global_powder_cost_per_ton", help="Cost of 1 ton of 3D printing powder.")
+    global_params.powder_tons_per_villa = st.number_input("Powder Tons/Villa", 10.0, value=global_params.powder_tons_per_villa, step=5.0, key="widget_global_powder_tons_per_villa", help="Amount of powder required for one villa.")
+    global_params.steel_cables_cost_per_villa = st.number_input("Steel/Cables Cost/Villa (AED)", 0.0, value=global_params.steel_cables_cost_per_villa, step=1000.0, format="%.0f", key="widget_global_steel_cables_cost_per_villa", help="Cost of steel reinforcement and cables per villa.")
+    global_params.villa_printing_days_3dcp = st.number_input("Villa Printing Days (3DCP)", 5, value=global_params.villa_printing_days_3dcp, step=1, key="widget_global_villa_printing_days_3dcp", help="Number of days the 3D printer is actively printing for one villa.")
+    global_params.villa_additional_prep_finish_days_3dcp = st.number_input("Villa Additional Prep/Finish Days (3DCP)", 0, value=global_params.villa_additional_prep_finish_days_3dcp, step=1, key="widget_global_villa_additional_prep_finish_days_3dcp", help="Additional days for site prep, machine setup, and post-printing finishing related to one villa cycle.")
+    global_params.market_selling_price_per_villa = st.number_input("Market Selling Price/Villa (AED)", 500000.0, value=global_params.market_selling_price_per_villa, step=50000.0, format="%.0f", key="widget_global_market_selling_price_per_villa", help="Expected selling price for a completed villa.")
 
     st.subheader("Detailed 3DCP Villa Costs (Excl. 3DCP Shell Process)")
-    st.session_state.global_cost_foundation_per_villa_3dcp = st.number_input("Foundation Cost/Villa (AED)", 0, value=st.session_state.global_cost_foundation_per_villa_3dcp, step=5000, key="widget_global_cost_foundation_per_villa_3dcp")
-    st.session_state.global_cost_roofing_per_villa_3dcp = st.number_input("Roofing Cost/Villa (AED)", 0, value=st.session_state.global_cost_roofing_per_villa_3dcp, step=5000, key="widget_global_cost_roofing_per_villa_3dcp")
-    st.session_state.global_cost_mep_per_villa_3dcp = st.number_input("MEP Cost/Villa (AED)", 0, value=st.session_state.global_cost_mep_per_villa_3dcp, step=5000, key="widget_global_cost_mep_per_villa_3dcp")
-    st.session_state.global_cost_finishes_per_villa_3dcp = st.number_input("Finishes Cost/Villa (AED)", 0, value=st.session_state.global_cost_finishes_per_villa_3dcp, step=5000, key="widget_global_cost_finishes_per_villa_3dcp")
-    st.session_state.global_cost_site_prep_approvals_design_3dcp = st.number_input("Site Prep/Approvals/Design Cost/Villa (AED)", 0, value=st.session_state.global_cost_site_prep_approvals_design_3dcp, step=5000, key="widget_global_cost_site_prep_approvals_design_3dcp")
+    global_params.cost_foundation_per_villa_3dcp = st.number_input("Foundation Cost/Villa (AED)", 0.0, value=global_params.cost_foundation_per_villa_3dcp, step=5000.0, format="%.0f", key="widget_global_cost_foundation_per_villa_3dcp")
+    global_params.cost_roofing_per_villa_3dcp = st.number_input("Roofing Cost/Villa (AED)", 0.0, value=global_params.cost_roofing_per_villa_3dcp, step=5000.0, format="%.0f", key="widget_global_cost_roofing_per_villa_3dcp")
+    global_params.cost_mep_per_villa_3dcp = st.number_input("MEP Cost/Villa (AED)", 0.0, value=global_params.cost_mep_per_villa_3dcp, step=5000.0, format="%.0f", key="widget_global_cost_mep_per_villa_3dcp")
+    global_params.cost_finishes_per_villa_3dcp = st.number_input("Finishes Cost/Villa (AED)", 0.0, value=global_params.cost_finishes_per_villa_3dcp, step=5000.0, format="%.0f", key="widget_global_cost_finishes_per_villa_3dcp")
+    global_params.cost_site_prep_approvals_design_3dcp = st.number_input("Site Prep/Approvals/Design Cost/Villa (AED)", 0.0, value=global_params.cost_site_prep_approvals_design_3dcp, step=5000.0, format="%.0f", key="widget_global_cost_site_prep_approvals_design_3dcp")
 
     st.subheader("Traditional Model Parameters (for Comparison)")
-    st.session_state.global_traditional_villa_build_months = st.number_input("Traditional Villa Build Time (Months)", 1, value=st.session_state.global_traditional_villa_build_months, step=1, key="widget_global_traditional_villa_build_months", help="Typical time to build a villa using traditional methods.")
-    st.session_state.global_traditional_villa_cost = st.number_input("Traditional Villa All-in Cost (AED)", 500000, value=st.session_state.global_traditional_villa_cost, step=50000, key="widget_global_traditional_villa_cost", help="Total cost to build a villa using traditional methods, for direct comparison.")
+    global_params.traditional_villa_build_months = st.number_input("Traditional Villa Build Time (Months)", 1, value=global_params.traditional_villa_build_months, step=1, key="widget_global_traditional_villa_build_months", help="Typical time to build a villa using traditional methods.")
+    global_params.traditional_villa_cost = st.number_input("Traditional Villa All-in Cost (AED)", 500000.0, value=global_params.traditional_villa_cost, step=50000.0, format="%.0f", key="widget_global_traditional_villa_cost", help="Total cost to build a villa using traditional methods, for direct comparison.")
     
-    current_global_inputs_for_saving = {k: st.session_state[f"global_{k}"] for k in DEFAULT_GLOBAL_PARAMS.keys()}
+    current_global_inputs_for_saving = global_params.to_dict()
     
     st.subheader("Scenario Management")
-    current_scenario_data_to_save = get_all_inputs_as_dict(current_global_inputs_for_saving, st.session_state.machine_params_list)
+    current_scenario_data_to_save = get_all_inputs_as_dict(current_global_inputs_for_saving, st.session_state.fleet_params.to_machine_list())
     st.download_button(
         label="📥 Save Current Scenario",
         data=json.dumps(current_scenario_data_to_save, indent=2),
         file_name="3dcp_scenario.json",
         mime="application/json"
     )
+    store_scenario_name = st.text_input("Scenario Name (for the Store)", key="store_scenario_name")
+    if st.button("💾 Save to Scenario Store", key="save_to_store_button"):
+        try:
+            with ScenarioStore(DEFAULT_STORE_PATH) as scenario_store:
+                store_counts = scenario_store.add_scenarios([current_scenario_data_to_save], names=[store_scenario_name or None])
+        except sqlite3.Error as e:
+            st.error(f"Could not save to {DEFAULT_STORE_PATH}: {e}")
+        else:
+            if store_counts["inserted"]: st.success(f"Scenario saved to {DEFAULT_STORE_PATH}.")
+            else: st.info("This scenario is already in the store.")
     uploaded_file = st.file_uploader("📤 Load Scenario from JSON", type="json", key="scenario_uploader")
     if uploaded_file is not None:
         try:
@@ -301,141 +322,461 @@ with st.sidebar:
 st.subheader("🛠️ Machine Fleet Configuration")
 
 def update_num_machines_internal():
-    # Target number of machines based on the widget
+    # Trim the fleet, or pad it with default machines, to the number in the widget
     target_num_machines = st.session_state.num_machines_widget
-    current_num_machines = len(st.session_state.machine_params_list)
-
-    if target_num_machines > current_num_machines: # Add machines
-        for i in range(current_num_machines, target_num_machines):
-            new_m = DEFAULT_SINGLE_MACHINE_PARAMS.copy()
-            new_m["id"] = i + 1
-            st.session_state.machine_params_list.append(new_m)
-            # Initialize session state for new widget keys
-            st.session_state[f"m_cost_{i}"] = new_m["machine_cost"]
-            st.session_state[f"m_life_{i}"] = new_m["machine_lifespan_years"]
-            st.session_state[f"m_maint_{i}"] = new_m["annual_maintenance_cost_pct"]
-            st.session_state[f"m_eng_{i}"] = new_m["engineer_monthly_salary"]
-    elif target_num_machines < current_num_machines: # Remove machines
-        st.session_state.machine_params_list = st.session_state.machine_params_list[:target_num_machines]
-        # Optionally, clean up unused session state keys for removed machines (more complex)
-
-st.number_input(
-    "Number of 3DCP Machines", 1, 10, 
-    key="num_machines_widget", 
-    on_change=update_num_machines_internal 
-)
-# Ensure consistency after potential load scenario
-if st.session_state.num_machines_widget != len(st.session_state.machine_params_list):
-    update_num_machines_internal()
-
-
-active_machine_params_list_for_calc = [] 
-for i in range(st.session_state.num_machines_widget): 
-    if i >= len(st.session_state.machine_params_list): # Should not happen if update_num_machines_internal works
-        continue 
-
-    machine_obj_for_display = st.session_state.machine_params_list[i] 
-
-    with st.expander(f"Machine {machine_obj_for_display.get('id', i+1)} Parameters", expanded=(i==0)):
-        cost_key = f"m_cost_{i}"
-        life_key = f"m_life_{i}"
-        maint_key = f"m_maint_{i}"
-        eng_key = f"m_eng_{i}"
-
-        # Ensure session state keys exist, using values from machine_params_list as default
-        if cost_key not in st.session_state: st.session_state[cost_key] = machine_obj_for_display["machine_cost"]
-        if life_key not in st.session_state: st.session_state[life_key] = machine_obj_for_display["machine_lifespan_years"]
-        if maint_key not in st.session_state: st.session_state[maint_key] = machine_obj_for_display["annual_maintenance_cost_pct"]
-        if eng_key not in st.session_state: st.session_state[eng_key] = machine_obj_for_display["engineer_monthly_salary"]
-        
-        st.number_input(f"Cost (AED)", 100000, value=st.session_state[cost_key], step=50000, key=cost_key)
-        st.number_input(f"Lifespan (Years)", 1, value=st.session_state[life_key], step=1, key=life_key)
-        st.slider(f"Maintenance (% Cost)", 0.01, 0.30, st.session_state[maint_key], 0.01, format="%.2f", key=maint_key)
-        st.number_input(f"Engineer Salary (AED/month)", 0, value=st.session_state[eng_key], step=500, key=eng_key)
-
-        st.session_state.machine_params_list[i]["machine_cost"] = st.session_state[cost_key]
-        st.session_state.machine_params_list[i]["machine_lifespan_years"] = st.session_state[life_key]
-        st.session_state.machine_params_list[i]["annual_maintenance_cost_pct"] = st.session_state[maint_key]
-        st.session_state.machine_params_list[i]["engineer_monthly_salary"] = st.session_state[eng_key]
-        st.session_state.machine_params_list[i]["id"] = machine_obj_for_display.get('id', i+1)
-
-        active_machine_params_list_for_calc.append(st.session_state.machine_params_list[i])
+    current_num_machines = len(st.session_state.fleet_params)
+    if target_num_machines != current_num_machines:
+        st.session_state.fleet_params = st.session_state.fleet_params.resized(target_num_machines)
+        clear_machine_widgets(min(target_num_machines, current_num_machines))
+
+fleet_input_mode = st.radio("Fleet Input Mode", FLEET_INPUT_MODES, horizontal=True, key="fleet_input_mode", on_change=on_fleet_input_mode_change,
+                            help=f"Per-machine forms work for up to {FLEET_FORM_MAX_MACHINES} machines; the fleet table handles fleets of hundreds.")
+if fleet_input_mode == "Per-Machine Forms" and len(st.session_state.fleet_params) > FLEET_FORM_MAX_MACHINES:
+    st.warning(f"The fleet has more than {FLEET_FORM_MAX_MACHINES} machines, so it is shown as a table.")
+    fleet_input_mode = "Fleet Table"
+if "fleet_message" in st.session_state:
+    fleet_message_kind, fleet_message_text = st.session_state.pop("fleet_message")
+    (st.success if fleet_message_kind == "success" else st.error)(fleet_message_text)
+
+if fleet_input_mode == "Per-Machine Forms":
+    if st.session_state.num_machines_widget != len(st.session_state.fleet_params):
+        st.session_state.num_machines_widget = len(st.session_state.fleet_params)
+    st.number_input(
+        "Number of 3DCP Machines", 1, FLEET_FORM_MAX_MACHINES, 
+        key="num_machines_widget", 
+        on_change=update_num_machines_internal 
+    )
 
+    fleet_params = st.session_state.fleet_params
+    for i in range(len(fleet_params)):
+        with st.expander(f"Machine {fleet_params.ids[i]} Parameters", expanded=(i==0)):
+            fleet_params.machine_cost[i] = st.number_input(f"Cost (AED)", MACHINE_INPUT_MIN_VALUES["machine_cost"], value=float(fleet_params.machine_cost[i]), step=50000.0, format="%.0f", key=f"m_cost_{i}")
+            fleet_params.machine_lifespan_years[i] = st.number_input(f"Lifespan (Years)", MACHINE_INPUT_MIN_VALUES["machine_lifespan_years"], value=int(fleet_params.machine_lifespan_years[i]), step=1, key=f"m_life_{i}")
+            fleet_params.annual_maintenance_cost_pct[i] = st.number_input(f"Maintenance (% Cost)", MACHINE_INPUT_MIN_VALUES["annual_maintenance_cost_pct"], value=float(fleet_params.annual_maintenance_cost_pct[i]), step=0.01, format="%.2f", key=f"m_maint_{i}")
+            fleet_params.engineer_monthly_salary[i] = st.number_input(f"Engineer Salary (AED/month)", MACHINE_INPUT_MIN_VALUES["engineer_monthly_salary"], value=float(fleet_params.engineer_monthly_salary[i]), step=500.0, format="%.0f", key=f"m_eng_{i}")
+else:
+    # Only the edited, added and deleted rows reported by the editor are applied to the base fleet on each rerun
+    fleet_table_base = st.session_state.fleet_table_base
+    fleet_editor_key = f"fleet_editor_{st.session_state.fleet_editor_version}"
+    st.data_editor(
+        fleet_table_base.to_frame(), key=fleet_editor_key, num_rows="dynamic", hide_index=True, use_container_width=True,
+        column_config={
+            "id": st.column_config.NumberColumn("ID", min_value=1, step=1),
+            "machine_cost": st.column_config.NumberColumn("Cost (AED)", min_value=MACHINE_INPUT_MIN_VALUES["machine_cost"], step=50000, format="%.0f"),
+            "machine_lifespan_years": st.column_config.NumberColumn("Lifespan (Years)", min_value=MACHINE_INPUT_MIN_VALUES["machine_lifespan_years"], step=1),
+            "annual_maintenance_cost_pct": st.column_config.NumberColumn("Maintenance (% Cost)", min_value=MACHINE_INPUT_MIN_VALUES["annual_maintenance_cost_pct"], step=0.01, format="%.2f"),
+            "engineer_monthly_salary": st.column_config.NumberColumn("Engineer Salary (AED/month)", min_value=MACHINE_INPUT_MIN_VALUES["engineer_monthly_salary"], step=500, format="%.0f"),
+        },
+    )
+    fleet_edits = st.session_state.get(fleet_editor_key, {})
+    try:
+        st.session_state.fleet_params = fleet_table_base.with_edits(fleet_edits.get("edited_rows"), fleet_edits.get("added_rows"), fleet_edits.get("deleted_rows"))
+    except ValueError as e:
+        st.error(f"Fleet table: {e}")
+    fleet_params = st.session_state.fleet_params
+    num_fleet_configurations = len(fleet_params.to_frame().drop(columns="id").drop_duplicates())
+    st.caption(f"{len(fleet_params)} machines in {num_fleet_configurations} distinct configurations.")
+
+    fleet_tool_cols = st.columns(3)
+    with fleet_tool_cols[0].popover("✏️ Bulk Edit"):
+        st.selectbox("Parameter", MACHINE_PARAM_KEYS, key="bulk_parameter")
+        st.selectbox("Operation", BULK_OPERATIONS, key="bulk_operation", format_func={"set": "Set to", "scale": "Multiply by", "add": "Add"}.get)
+        st.number_input("Value", value=1.0, key="bulk_value")
+        bulk_id_cols = st.columns(2)
+        bulk_id_cols[0].number_input("From ID", 1, value=None, placeholder="First", key="bulk_from_id")
+        bulk_id_cols[1].number_input("To ID", 1, value=None, placeholder="Last", key="bulk_to_id")
+        st.button("Apply to Machines", key="bulk_apply_button", on_click=apply_fleet_bulk_edit)
+    with fleet_tool_cols[1].popover("➕ Add Copies"):
+        st.number_input("Copy Machine ID", 1, value=1, key="copy_template_id")
+        st.number_input("Number of Copies", 1, 1000, 10, key="copy_count")
+        st.button("Add Machines", key="add_copies_button", on_click=add_fleet_copies)
+    with fleet_tool_cols[2].popover("📄 CSV Import / Export"):
+        st.download_button("📥 Export Fleet CSV", data=fleet_params.to_frame().to_csv(index=False), file_name="3dcp_fleet.csv", mime="text/csv")
+        st.file_uploader("📤 Import Fleet CSV", type="csv", key="fleet_csv_uploader", on_change=import_fleet_csv,
+                         help=f"Columns: id, {', '.join(MACHINE_PARAM_KEYS)}. Missing columns or blank cells take the defaults.")
+
+# Typed, validated inputs of this rerun; every tool below reads these instead of rebuilding dicts from session_state
+try:
+    current_params = ScenarioParams(st.session_state.global_params, fleet_params)
+    current_params.global_params.validate()
+    current_params.fleet.validate()
+except ValueError as e:
+    st.error(str(e))
+    app_profiler.deactivate()
+    st.stop()
+current_global_params = current_params.global_params.to_dict()
+active_machine_params_list_for_calc = fleet_params.to_machine_list()
+current_batch_inputs = current_params.batch_inputs()
+current_scenario_key = content_hash(*current_batch_inputs)
+
+def monte_carlo_chunks(mc_spec_text, mc_num_samples, mc_seed):
+    mc_spec = json.loads(mc_spec_text)
+    mc_global_params = dict(current_global_params)
+    mc_global_params.update(mc_spec.get("global_params", {}))
+    mc_machine_params_list = [dict(mp, **mc_spec.get("machine_params", {})) for mp in active_machine_params_list_for_calc]
+    return iter_monte_carlo(mc_global_params, mc_machine_params_list, mc_num_samples, seed=mc_seed, chunk_size=MC_CHUNK_SIZE)
+
+def render_monte_carlo_progress(job, mc_num_samples):
+    mc_partial_samples = job.snapshot()
+    mc_num_done = sum(len(chunk) for chunk in mc_partial_samples)
+    st.progress(mc_num_done / mc_num_samples, text=f"{mc_num_done:,} of {mc_num_samples:,} draws in {job.elapsed_s():.1f} s")
+    return pd.concat(mc_partial_samples, ignore_index=True) if mc_partial_samples else None
+
+# The Monte Carlo widgets are drawn further down; their values from the last rerun decide whether a running job is stale
+mc_settings = (st.session_state.get("mc_spec_text", json.dumps(DEFAULT_MC_SPEC, indent=2)),
+               st.session_state.get("mc_num_samples", DEFAULT_MC_NUM_SAMPLES), st.session_state.get("mc_seed", DEFAULT_MC_SEED))
+mc_job_key = content_hash(current_scenario_key, *mc_settings)
+cancel_stale_background_job("monte_carlo", mc_job_key)
+mc_finished_job = pop_finished_background_job("monte_carlo")
+if mc_finished_job is not None and mc_finished_job.status == "done":
+    st.session_state.mc_result = {"key": mc_finished_job.key, "samples": pd.concat(mc_finished_job.chunks, ignore_index=True)}
+
+st.checkbox("📡 Stream a Monte Carlo risk profile into the dashboard", key="dashboard_live_risk",
+            help="After the dashboard is drawn, runs the Monte Carlo settings below in the background; the percentiles fill in as draws finish.")
+run_sim_clicked = st.button("🚀 Run Simulation & Generate Dashboard", key="run_sim_button", type="primary")
+if run_sim_clicked and active_machine_params_list_for_calc:
+    # The dashboard stays up on later reruns until an input changes
+    st.session_state.dashboard_scenario_key = current_scenario_key
+    if st.session_state.dashboard_live_risk:
+        try:
+            start_background_job("monte_carlo", mc_job_key, monte_carlo_chunks(*mc_settings))
+        except json.JSONDecodeError: st.error("Invalid distribution JSON.")
+        except (KeyError, ValueError) as e: st.error(f"Error in Monte Carlo setup: {e}")
 
-if st.button("🚀 Run Simulation & Generate Dashboard", key="run_sim_button", type="primary"):
+if run_sim_clicked or st.session_state.get("dashboard_scenario_key") == current_scenario_key:
     if not active_machine_params_list_for_calc: 
         st.error("Please configure at least one machine.")
     else:
-        current_global_params_for_calc = {k: st.session_state[f"global_{k}"] for k in DEFAULT_GLOBAL_PARAMS.keys()}
-
-        avg_daily_op_cost_fleet = sum(calculate_machine_operational_costs(mp, current_global_params_for_calc)[1] for mp in active_machine_params_list_for_calc) / len(active_machine_params_list_for_calc)
-        contracting_villa_details_output = calculate_contracting_model_per_villa(avg_daily_op_cost_fleet, current_global_params_for_calc)
-        fleet_financials_output = calculate_fleet_contracting_financials(st.session_state.num_machines_widget, active_machine_params_list_for_calc, current_global_params_for_calc, contracting_villa_details_output)
+        current_global_params_for_calc = current_global_params
+        with app_profiler.stage("calc.evaluate_batch (cached)", "calc"):
+            dashboard_results = evaluate_dashboard(*current_batch_inputs)
 
         st.header("📊 Simulation Dashboard")
         st.subheader("📈 Key Financial Indicators (3DCP Fleet Contracting)")
-        kpi_cols = st.columns(5)
-        kpi_cols[0].metric("Annual Net Profit", f"AED {fleet_financials_output['annual_profit_3dcp_fleet_contracting']:,.0f}", help="Total revenue minus total costs for the fleet's contracting operations annually.")
-        kpi_cols[1].metric("Annual ROI", f"{fleet_financials_output['roi_3dcp_fleet_contracting']:.2f}%" if isinstance(fleet_financials_output['roi_3dcp_fleet_contracting'], (int,float)) else "N/A", help="Return on Investment: (Annual Profit / Total Capital Invested) * 100.")
-        kpi_cols[2].metric("NPV (Net Present Value)", f"AED {fleet_financials_output['npv_3dcp_fleet']:,.0f}" if isinstance(fleet_financials_output['npv_3dcp_fleet'], (int, float)) else fleet_financials_output['npv_3dcp_fleet'], help=f"Present value of future cash flows minus initial investment, discounted at {current_global_params_for_calc['discount_rate_for_npv']*100:.0f}%.")
-        kpi_cols[3].metric("IRR (Internal Rate of Return)", f"{fleet_financials_output['irr_3dcp_fleet']:.2f}%" if isinstance(fleet_financials_output['irr_3dcp_fleet'], (int, float)) else fleet_financials_output['irr_3dcp_fleet'], help="Discount rate at which the NPV of all cash flows equals zero. Higher is better.")
-        kpi_cols[4].metric("Break-Even Villas/Year", f"{fleet_financials_output['break_even_villas_fleet']:.1f}" if isinstance(fleet_financials_output['break_even_villas_fleet'], (int, float)) else fleet_financials_output['break_even_villas_fleet'], help="Number of villas the fleet needs to build and sell annually to cover all fixed operational costs.")
+        with app_profiler.stage("render.kpi_metrics"):
+            kpi_cols = st.columns(5)
+            kpi_cols[0].metric("Annual Net Profit", f"AED {dashboard_results['annual_profit_3dcp_fleet_contracting']:,.0f}", help="Total revenue minus total costs for the fleet's contracting operations annually.")
+            kpi_cols[1].metric("Annual ROI", f"{dashboard_results['roi_3dcp_fleet_contracting']:.2f}%" if isinstance(dashboard_results['roi_3dcp_fleet_contracting'], (int,float)) else "N/A", help="Return on Investment: (Annual Profit / Total Capital Invested) * 100.")
+            kpi_cols[2].metric("NPV (Net Present Value)", f"AED {dashboard_results['npv_3dcp_fleet']:,.0f}" if isinstance(dashboard_results['npv_3dcp_fleet'], (int, float)) else dashboard_results['npv_3dcp_fleet'], help=f"Present value of future cash flows minus initial investment, discounted at {current_global_params_for_calc['discount_rate_for_npv']*100:.0f}%.")
+            kpi_cols[3].metric("IRR (Internal Rate of Return)", f"{dashboard_results['irr_3dcp_fleet']:.2f}%" if isinstance(dashboard_results['irr_3dcp_fleet'], (int, float)) else dashboard_results['irr_3dcp_fleet'], help="Discount rate at which the NPV of all cash flows equals zero. Higher is better.")
+            kpi_cols[4].metric("Break-Even Villas/Year", f"{dashboard_results['break_even_villas_fleet']:.1f}" if isinstance(dashboard_results['break_even_villas_fleet'], (int, float)) else dashboard_results['break_even_villas_fleet'], help="Number of villas the fleet needs to build and sell annually to cover all fixed operational costs.")
 
         st.subheader("💰 Financial Performance Comparison")
         fin_cols = st.columns(2)
-        profit_data = pd.DataFrame({
-            'Model': ['3DCP Fleet Contracting', 'Traditional Equivalent Effort'],
-            'Annual Net Profit (AED)': [
-                fleet_financials_output['annual_profit_3dcp_fleet_contracting'],
-                fleet_financials_output['annual_profit_traditional_equivalent_effort']
-            ]})
-        fig_profit = px.bar(profit_data, x='Model', y='Annual Net Profit (AED)', title='Annual Profit Comparison', color='Model', text_auto=True)
-        fig_profit.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-        fin_cols[0].plotly_chart(fig_profit, use_container_width=True)
-
-        cost_comparison_data = pd.DataFrame({
-            'Villa Type': ['3DCP Villa (Avg.)', 'Traditional Villa'],
-            'Total Cost per Villa (AED)': [contracting_villa_details_output['optimized_total_cost_per_3dcp_villa'], current_global_params_for_calc['traditional_villa_cost']]
-        })
-        fig_cost_comp = px.bar(cost_comparison_data, x='Villa Type', y='Total Cost per Villa (AED)', title='Total Cost per Villa Comparison', color='Villa Type', text_auto=True)
-        fig_cost_comp.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-        fin_cols[1].plotly_chart(fig_cost_comp, use_container_width=True)
+        with app_profiler.stage("render.profit_figure"):
+            fin_cols[0].plotly_chart(build_profit_figure(dashboard_results), use_container_width=True)
+        with app_profiler.stage("render.cost_comparison_figure"):
+            fin_cols[1].plotly_chart(build_cost_comparison_figure(dashboard_results, current_global_params_for_calc['traditional_villa_cost']), use_container_width=True)
 
         st.subheader("⏱️ Productivity & Efficiency")
         prod_cols = st.columns(2)
-        villas_data = pd.DataFrame({
-            'Production Method': [f"3DCP Fleet ({st.session_state.num_machines_widget} machines)", f"Traditional Equivalent ({st.session_state.num_machines_widget} teams)"],
-            'Villas per Year': [fleet_financials_output['total_villas_per_year_3dcp_fleet'], fleet_financials_output['total_villas_per_year_traditional_equivalent_effort']]
-        })
-        fig_villas = px.bar(villas_data, x='Production Method', y='Villas per Year', title='Annual Villa Production Capacity', color='Production Method', text_auto=True)
-        fig_villas.update_traces(texttemplate='%{y:.1f}', textposition='outside')
-        prod_cols[0].plotly_chart(fig_villas, use_container_width=True)
-
-        timeline_data = pd.DataFrame({
-            'Method': ['3DCP Villa Cycle', 'Traditional Villa Build'],
-            'Duration (Days)': [fleet_financials_output['villa_total_cycle_days_3dcp'], fleet_financials_output['traditional_villa_build_days']]
-        })
-        fig_timeline = px.bar(timeline_data, y='Method', x='Duration (Days)', title='Project Duration per Villa', orientation='h', color='Method', text_auto=True)
-        fig_timeline.update_traces(texttemplate='%{x:.0f} days', textposition='outside')
-        prod_cols[1].plotly_chart(fig_timeline, use_container_width=True)
+        with app_profiler.stage("render.villas_figure"):
+            prod_cols[0].plotly_chart(build_villas_figure(dashboard_results, len(st.session_state.fleet_params)), use_container_width=True)
+        with app_profiler.stage("render.timeline_figure"):
+            prod_cols[1].plotly_chart(build_timeline_figure(dashboard_results), use_container_width=True)
         
         st.subheader("💸 Savings per Villa (3DCP vs. Traditional)")
         sav_cols = st.columns(2)
-        sav_cols[0].metric("Cost Saving per Villa", f"AED {fleet_financials_output['cost_saving_per_villa_3dcp_vs_traditional']:,.0f}")
-        sav_cols[1].metric("Time Saving per Villa", f"{fleet_financials_output['time_saving_per_villa_3dcp_vs_traditional_days']:.0f} Days")
+        sav_cols[0].metric("Cost Saving per Villa", f"AED {dashboard_results['cost_saving_per_villa_3dcp_vs_traditional']:,.0f}")
+        sav_cols[1].metric("Time Saving per Villa", f"{dashboard_results['time_saving_per_villa_3dcp_vs_traditional_days']:.0f} Days")
 
         st.subheader("🔑 Leasing Model Insights (Representative - First Machine)")
         if active_machine_params_list_for_calc: 
-            rep_machine_params_leasing = active_machine_params_list_for_calc[0]
-            leasing_output_rep = calculate_leasing_model_for_machine(rep_machine_params_leasing, current_global_params_for_calc)
-            st.markdown(f"**For Machine {rep_machine_params_leasing.get('id', 1)}:**") # Use .get for safety
-            lease_cols = st.columns(3)
-            lease_cols[0].metric("Rec. Daily Lease Price", f"AED {leasing_output_rep['recommended_daily_lease_price_per_machine']:,.0f}")
-            lease_cols[1].metric(f"Annual Profit (Leasing, {current_global_params_for_calc['machine_utilization_leasing_days_per_machine']} days util.)", f"AED {leasing_output_rep['annual_profit_lessor_per_machine_at_utilization']:,.0f}")
-            lease_cols[2].metric("Contractor's 3DCP Cost/Villa (via leasing)", f"AED {leasing_output_rep['contractor_3dcp_elements_cost_per_villa_via_leasing']:,.0f}")
+            with app_profiler.stage("render.leasing_insights"):
+                rep_machine_params_leasing = active_machine_params_list_for_calc[0]
+                st.markdown(f"**For Machine {rep_machine_params_leasing.get('id', 1)}:**") # Use .get for safety
+                lease_cols = st.columns(3)
+                lease_cols[0].metric("Rec. Daily Lease Price", f"AED {dashboard_results['recommended_daily_lease_price_per_machine']:,.0f}")
+                lease_cols[1].metric(f"Annual Profit (Leasing, {current_global_params_for_calc['machine_utilization_leasing_days_per_machine']} days util.)", f"AED {dashboard_results['annual_profit_lessor_per_machine_at_utilization']:,.0f}")
+                lease_cols[2].metric("Contractor's 3DCP Cost/Villa (via leasing)", f"AED {dashboard_results['contractor_3dcp_elements_cost_per_villa_via_leasing']:,.0f}")
+
+        mc_job = background_jobs().get("monte_carlo")
+        mc_result = st.session_state.get("mc_result")
+        if (mc_job is not None and mc_job.key == mc_job_key) or (mc_result is not None and mc_result["key"] == mc_job_key):
+            st.subheader("📡 Risk Profile (Monte Carlo)")
+            if mc_job is not None:
+                def render_dashboard_risk_profile(job):
+                    mc_partial = render_monte_carlo_progress(job, mc_settings[1])
+                    if mc_partial is not None:
+                        st.dataframe(summarize_distribution(mc_partial), use_container_width=True)
+                stream_background_job("monte_carlo", render_dashboard_risk_profile, "dashboard_risk")
+            else:
+                st.dataframe(summarize_distribution(mc_result["samples"]), use_container_width=True)
 
 else:
     st.info("Adjust parameters and click 'Run Simulation & Generate Dashboard'.")
 
+with st.expander("🎲 Monte Carlo Risk Simulation"), app_profiler.stage("render.monte_carlo"):
+    st.markdown("Give any global or machine parameter as a distribution (`normal`, `lognormal`, `triangular`, `uniform`, `discrete`). "
+                "Machine entries apply to every machine in the fleet; all other inputs use the values above.")
+    mc_spec_text = st.text_area("Distributions (JSON)", json.dumps(DEFAULT_MC_SPEC, indent=2), height=260, key="mc_spec_text")
+    mc_cols = st.columns(3)
+    mc_num_samples = mc_cols[0].number_input("Number of Draws", 1000, 1000000, DEFAULT_MC_NUM_SAMPLES, 1000, key="mc_num_samples")
+    mc_seed = mc_cols[1].number_input("Random Seed", 0, value=DEFAULT_MC_SEED, step=1, key="mc_seed")
+    mc_background = mc_cols[2].checkbox("Run in Background", True, key="mc_background", help="Streams running percentiles while the draws are evaluated; changing any input cancels the run.")
+    if st.button("🎲 Run Monte Carlo", key="run_mc_button"):
+        try:
+            if mc_background:
+                start_background_job("monte_carlo", mc_job_key, monte_carlo_chunks(mc_spec_text, mc_num_samples, mc_seed))
+            else:
+                with st.spinner(f"Evaluating {mc_num_samples:,} draws..."):
+                    st.session_state.mc_result = {"key": mc_job_key, "samples": pd.concat(monte_carlo_chunks(mc_spec_text, mc_num_samples, mc_seed), ignore_index=True)}
+        except json.JSONDecodeError: st.error("Invalid distribution JSON.")
+        except (KeyError, ValueError) as e: st.error(f"Error in Monte Carlo setup: {e}")
+    if mc_finished_job is not None and mc_finished_job.status == "error":
+        st.error(f"Error in Monte Carlo setup: {mc_finished_job.error}")
+
+    if "monte_carlo" in background_jobs():
+        def render_monte_carlo_partial(job):
+            mc_partial = render_monte_carlo_progress(job, mc_num_samples)
+            if mc_partial is not None:
+                st.dataframe(summarize_distribution(mc_partial), use_container_width=True)
+                st.plotly_chart(build_npv_histogram_figure(mc_partial["npv_3dcp_fleet"].dropna().to_numpy()), use_container_width=True)
+        stream_background_job("monte_carlo", render_monte_carlo_partial, "mc")
+    elif "mc_result" in st.session_state:
+        mc_samples = st.session_state.mc_result["samples"]
+        if st.session_state.mc_result["key"] != mc_job_key:
+            st.caption("These results are from earlier inputs; run again to update them.")
+        st.dataframe(summarize_distribution(mc_samples), use_container_width=True)
+        st.plotly_chart(build_npv_histogram_figure(mc_samples["npv_3dcp_fleet"].dropna().to_numpy()), use_container_width=True)
+
+
+with st.expander("📒 Multi-Year Fleet Cash-Flow Ledger"), app_profiler.stage("render.ledger"):
+    st.markdown("Steps each machine through purchase, depreciation, maintenance, retirement and replacement instead of repeating one year's profit.")
+    ledger_cols = st.columns(4)
+    ledger_horizon_years = ledger_cols[0].number_input("Horizon (Years)", 1, 50, 20, 1, key="ledger_horizon_years")
+    ledger_step = ledger_cols[1].selectbox("Time Step", ["Yearly", "Monthly"], key="ledger_step")
+    ledger_cost_escalation = ledger_cols[2].slider("Cost Escalation (%/yr)", 0.0, 0.15, 0.03, 0.005, format="%.3f", key="ledger_cost_escalation", help="Applied to materials, direct costs, salaries and replacement machine prices.")
+    ledger_price_escalation = ledger_cols[3].slider("Villa Price Escalation (%/yr)", 0.0, 0.15, 0.02, 0.005, format="%.3f", key="ledger_price_escalation")
+    ledger_replace_retired = st.checkbox("Replace machines when they retire", True, key="ledger_replace_retired")
+    if st.button("📒 Build Ledger", key="run_ledger_button"):
+        ledger_steps_per_year = 12 if ledger_step == "Monthly" else 1
+        ledger_global_params = current_global_params
+        ledger_output = simulate_fleet_ledger(ledger_global_params, active_machine_params_list_for_calc, ledger_horizon_years, ledger_steps_per_year,
+                                              ledger_cost_escalation, ledger_price_escalation, ledger_replace_retired)
+        ledger_summary = summarize_ledger(ledger_output, ledger_steps_per_year)
+        ledger_kpi_cols = st.columns(4)
+        ledger_kpi_cols[0].metric("NPV (Ledger)", f"AED {ledger_summary['npv']:,.0f}")
+        ledger_kpi_cols[1].metric("IRR (Ledger)", f"{ledger_summary['irr']:.2f}%" if not np.isnan(ledger_summary['irr']) else "N/A (Check Cash Flows)")
+        ledger_kpi_cols[2].metric("Total Capex", f"AED {ledger_summary['total_capital_expenditure']:,.0f}")
+        ledger_kpi_cols[3].metric("Payback", f"{ledger_summary['payback_year']:.1f} Years" if not np.isnan(ledger_summary['payback_year']) else "Not Reached")
+        fig_ledger = px.line(ledger_output, x="year", y="cumulative_cash_flow", title="Cumulative Net Cash Flow (AED)")
+        st.plotly_chart(fig_ledger, use_container_width=True)
+        st.dataframe(ledger_output, use_container_width=True)
+
+with st.expander("🌪️ Sensitivity (Tornado) Analysis"), app_profiler.stage("render.tornado"):
+    st.markdown("Moves each global and machine parameter down and up by the chosen percentage, one at a time, and ranks the effect.")
+    tornado_cols = st.columns(2)
+    tornado_pct = tornado_cols[0].slider("Perturbation (±%)", 0.01, 0.50, 0.10, 0.01, format="%.2f", key="tornado_pct")
+    tornado_metric_labels = {"npv_3dcp_fleet": "Fleet NPV (AED)", "roi_3dcp_fleet_contracting": "Annual ROI (%)", "profit_per_3dcp_villa": "Profit per Villa (AED)"}
+    tornado_metric = tornado_cols[1].selectbox("Metric", SENSITIVITY_METRICS, format_func=tornado_metric_labels.get, key="tornado_metric")
+    if st.button("🌪️ Run Sensitivity Analysis", key="run_tornado_button"):
+        tornado_global_params = current_global_params
+        tornado_output = sensitivity_analysis(tornado_global_params, active_machine_params_list_for_calc, tornado_pct)
+        tornado_rows = tornado_output[tornado_output["metric"] == tornado_metric]
+        tornado_chart_data = pd.concat([
+            pd.DataFrame({"Parameter": tornado_rows["parameter"], "Case": f"-{tornado_pct:.0%}", "Change vs Base": tornado_rows["low_value"] - tornado_rows["base_value"]}),
+            pd.DataFrame({"Parameter": tornado_rows["parameter"], "Case": f"+{tornado_pct:.0%}", "Change vs Base": tornado_rows["high_value"] - tornado_rows["base_value"]}),
+        ])
+        fig_tornado = px.bar(tornado_chart_data, x="Change vs Base", y="Parameter", color="Case", orientation="h", barmode="overlay",
+                             title=f"Tornado: {tornado_metric_labels[tornado_metric]} (Base {tornado_rows['base_value'].iloc[0]:,.2f})")
+        fig_tornado.update_yaxes(categoryorder="array", categoryarray=list(tornado_rows["parameter"])[::-1])
+        fig_tornado.update_layout(height=max(400, 24 * len(tornado_rows)))
+        st.plotly_chart(fig_tornado, use_container_width=True)
+        st.dataframe(tornado_rows, use_container_width=True)
+
+with st.expander("🗺️ Parameter Grid Explorer"), app_profiler.stage("render.grid_explorer"):
+    st.markdown(f"Evaluates the fleet over every combination of two or three parameters (up to {GRID_MAX_POINTS:,} points). "
+                "Heatmaps are block-averaged on the server before display.")
+    grid_param_options = grid_parameters()
+    grid_metric_labels = {"npv_3dcp_fleet": "Fleet NPV (AED)", "roi_3dcp_fleet_contracting": "Annual ROI (%)", "irr_3dcp_fleet": "IRR (%)", "annual_profit_3dcp_fleet_contracting": "Annual Net Profit (AED)"}
+
+    def grid_axis_inputs(axis_label, default_param, key_prefix, optional=False):
+        axis_cols = st.columns(4)
+        options = (["(none)"] if optional else []) + grid_param_options
+        param = axis_cols[0].selectbox(f"{axis_label} Parameter", options, index=options.index(default_param), key=f"{key_prefix}_param")
+        if param == "(none)":
+            return None, None
+        if param == "num_machines":
+            current_value = float(len(active_machine_params_list_for_calc))
+        elif param in DEFAULT_GLOBAL_PARAMS:
+            current_value = float(current_global_params[param])
+        else:
+            current_value = float(active_machine_params_list_for_calc[0][param]) if active_machine_params_list_for_calc else float(DEFAULT_SINGLE_MACHINE_PARAMS[param])
+        low = axis_cols[1].number_input("Min", value=current_value * 0.5 if param != "num_machines" else 1.0, key=f"{key_prefix}_min_{param}")
+        high = axis_cols[2].number_input("Max", value=current_value * 1.5 if param != "num_machines" else 50.0, key=f"{key_prefix}_max_{param}")
+        points = axis_cols[3].number_input("Points", 2, 1000, 100 if not optional else 10, key=f"{key_prefix}_points_{param}")
+        values = np.linspace(low, high, points)
+        if param in ("num_machines", "machine_lifespan_years"):
+            values = np.unique(np.maximum(np.round(values), 1))
+        return param, values
+
+    grid_x_param, grid_x_values = grid_axis_inputs("X Axis", "villa_printing_days_3dcp", "grid_x")
+    grid_y_param, grid_y_values = grid_axis_inputs("Y Axis", "powder_cost_per_ton", "grid_y")
+    grid_z_param, grid_z_values = grid_axis_inputs("Slice Axis (optional)", "(none)", "grid_z", optional=True)
+    grid_axes = {grid_x_param: grid_x_values, grid_y_param: grid_y_values}
+    if grid_z_param is not None:
+        grid_axes[grid_z_param] = grid_z_values
+    grid_num_points = int(np.prod([len(v) for v in grid_axes.values()]))
+    st.caption(f"{grid_num_points:,} grid points.")
+    grid_background = st.checkbox("Run in Background", True, key="grid_background", help="Fills the heatmap in as chunks of the grid finish; changing any input cancels the run.")
+    grid_job_key = content_hash(current_scenario_key, grid_axes)
+    cancel_stale_background_job("grid", grid_job_key)
+    grid_finished_job = pop_finished_background_job("grid")
+    if grid_finished_job is not None and grid_finished_job.status == "done":
+        st.session_state.grid_result = assemble_grid(st.session_state.grid_job_axes, grid_finished_job.chunks)
+    elif grid_finished_job is not None and grid_finished_job.status == "error":
+        st.error(str(grid_finished_job.error))
+    if st.button("🗺️ Evaluate Grid", key="run_grid_button"):
+        if len(grid_axes) < len([p for p in (grid_x_param, grid_y_param, grid_z_param) if p is not None]):
+            st.error("Pick a different parameter for each axis.")
+        elif not active_machine_params_list_for_calc:
+            st.error("Please configure at least one machine.")
+        else:
+            try:
+                grid_global_params = current_global_params
+                if grid_background:
+                    start_background_job("grid", grid_job_key, iter_grid_chunks(grid_global_params, active_machine_params_list_for_calc, grid_axes, chunk_size=GRID_STREAM_CHUNK_SIZE))
+                    st.session_state.grid_job_axes = grid_axes
+                else:
+                    with st.spinner(f"Evaluating {grid_num_points:,} grid points..."):
+                        st.session_state.grid_result = evaluate_grid(grid_global_params, active_machine_params_list_for_calc, grid_axes)
+            except ValueError as e: st.error(str(e))
+
+    if "grid" in background_jobs():
+        def render_grid_partial(job):
+            grid_partial_chunks = job.snapshot()
+            grid_total_points = int(np.prod([len(v) for v in st.session_state.grid_job_axes.values()]))
+            grid_points_done = sum(len(flat_index) for flat_index, _ in grid_partial_chunks)
+            st.progress(grid_points_done / grid_total_points, text=f"{grid_points_done:,} of {grid_total_points:,} grid points in {job.elapsed_s():.1f} s")
+            if grid_partial_chunks:
+                grid_partial_metric = st.session_state.get("grid_metric", GRID_METRICS[0])
+                grid_partial = assemble_grid(st.session_state.grid_job_axes, grid_partial_chunks)
+                st.plotly_chart(build_grid_figure(grid_partial, grid_partial_metric, grid_metric_labels[grid_partial_metric]), use_container_width=True)
+        stream_background_job("grid", render_grid_partial, "grid")
+    elif "grid_result" in st.session_state:
+        grid_result = st.session_state.grid_result
+        grid_result_params = list(grid_result["axes"])
+        grid_metric = st.selectbox("Metric", GRID_METRICS, format_func=grid_metric_labels.get, key="grid_metric")
+        slice_index = 0
+        if len(grid_result_params) == 3:
+            slice_values = grid_result["axes"][grid_result_params[2]]
+            slice_index = st.select_slider(grid_result_params[2], options=list(range(len(slice_values))), format_func=lambda i: f"{slice_values[i]:,.2f}", key="grid_slice_index")
+        st.plotly_chart(build_grid_figure(grid_result, grid_metric, grid_metric_labels[grid_metric], slice_index), use_container_width=True)
+
+with st.expander("🧮 Fleet Size & Mix Optimizer"), app_profiler.stage("render.optimizer"):
+    st.markdown("Searches how many machines of each configuration above to buy (up to 500 in total) to maximize NPV or IRR "
+                "within a capital budget and the villas the market can absorb per year.")
+    opt_cols = st.columns(4)
+    opt_objective = opt_cols[0].radio("Objective", ["NPV", "IRR"], horizontal=True, key="opt_objective")
+    opt_budget = opt_cols[1].number_input("Capital Budget (AED)", 0, value=20000000, step=1000000, key="opt_budget")
+    opt_demand = opt_cols[2].number_input("Market Demand Cap (Villas/Year)", 1, value=50, step=5, key="opt_demand")
+    opt_max_machines = opt_cols[3].number_input("Max Machines", 1, 500, 500, 10, key="opt_max_machines")
+    if st.button("🧮 Optimize Fleet", key="run_opt_button"):
+        try:
+            opt_global_params = current_global_params
+            opt_machine_types = machine_types_from_fleet(active_machine_params_list_for_calc)
+            opt_output = optimize_fleet(opt_global_params, opt_machine_types, opt_objective.lower(), opt_budget, opt_demand, opt_max_machines)
+            opt_kpi_cols = st.columns(5)
+            opt_kpi_cols[0].metric("Machines", f"{opt_output['num_machines']}")
+            opt_kpi_cols[1].metric("Capital Invested", f"AED {opt_output['total_capital_invested_fleet']:,.0f}")
+            opt_kpi_cols[2].metric("Villas/Year Sold", f"{opt_output['villas_per_year']:.1f}")
+            opt_kpi_cols[3].metric("NPV", f"AED {opt_output['npv']:,.0f}")
+            opt_kpi_cols[4].metric("IRR", f"{opt_output['irr']:.2f}%" if np.isfinite(opt_output['irr']) else "N/A (Check Cash Flows)")
+            st.dataframe(pd.DataFrame([dict(mt, count=n) for mt, n in zip(opt_machine_types, opt_output["counts"])]).drop(columns="id"), use_container_width=True)
+            st.caption(f"{opt_output['evaluations']:,} candidate fleets scored.")
+        except ValueError as e: st.error(str(e))
+
+with st.expander("🏭 Production Scheduler (Discrete-Event)"), app_profiler.stage("render.scheduler"):
+    st.markdown("Schedules a portfolio of villa projects onto the fleet: crews do site prep and finishing, machines are only held while printing. "
+                "Shows what the fleet really delivers once queueing and crew limits are taken into account.")
+    sched_cols = st.columns(5)
+    sched_num_projects = sched_cols[0].number_input("Projects", 1, 100000, 1000, 100, key="sched_num_projects")
+    sched_arrivals = sched_cols[1].number_input("Arrivals/Year (0 = all in backlog)", 0, 100000, 0, 10, key="sched_arrivals")
+    sched_crews = sched_cols[2].number_input("Crews (0 = unlimited)", 0, 10000, 0, 1, key="sched_crews")
+    sched_prep_share = sched_cols[3].slider("Prep Share of Prep/Finish Days", 0.0, 1.0, 0.5, 0.05, key="sched_prep_share")
+    sched_variability = sched_cols[4].slider("Duration Variability (±)", 0.0, 0.5, 0.1, 0.05, key="sched_variability")
+    if st.button("🏭 Run Production Schedule", key="run_sched_button"):
+        if not active_machine_params_list_for_calc:
+            st.error("Please configure at least one machine.")
+        else:
+            sched_global_params = current_global_params
+            sched_portfolio = generate_portfolio(sched_global_params, sched_num_projects, sched_arrivals or None, sched_variability, sched_prep_share, seed=0)
+            sched_output = simulate_production(sched_portfolio, len(active_machine_params_list_for_calc), sched_crews or None)
+            sched_summary = summarize_production(sched_output, sched_global_params["operating_days_per_year"])
+            sched_cycle_days = max(sched_global_params["villa_printing_days_3dcp"] + sched_global_params["villa_additional_prep_finish_days_3dcp"], 1)
+            sched_static_villas = sched_global_params["operating_days_per_year"] / sched_cycle_days * len(active_machine_params_list_for_calc)
+            sched_kpi_cols = st.columns(4)
+            sched_kpi_cols[0].metric("Realized Villas/Year", f"{sched_summary['realized_villas_per_year']:.1f}", f"{sched_summary['realized_villas_per_year'] - sched_static_villas:+.1f} vs static model")
+            sched_kpi_cols[1].metric("Machine Utilization", f"{sched_summary['machine_utilization_mean']:.0%}")
+            sched_kpi_cols[2].metric("Lead Time P50 / P90", f"{sched_summary['lead_time_p50_days']:.0f} / {sched_summary['lead_time_p90_days']:.0f} days")
+            sched_kpi_cols[3].metric("Avg Wait for Machine", f"{sched_summary['machine_wait_mean_days']:.1f} days")
+            sched_by_year = pd.DataFrame({"Year": np.arange(1, len(sched_summary["villas_completed_by_year"]) + 1), "Villas Completed": sched_summary["villas_completed_by_year"]})
+            fig_sched = px.bar(sched_by_year, x="Year", y="Villas Completed", title="Villas Completed per Year", text_auto=True)
+            st.plotly_chart(fig_sched, use_container_width=True)
+            st.dataframe(pd.DataFrame({
+                "Machine": [mp.get("id", i + 1) for i, mp in enumerate(active_machine_params_list_for_calc)],
+                "Utilization": sched_summary["machine_utilization"],
+                "Idle Days": sched_summary["machine_idle_days"],
+            }), use_container_width=True)
+
+with st.expander("🗄️ Scenario Store"), app_profiler.stage("render.scenario_store"):
+    st.markdown(f"Scenarios saved with **💾 Save to Scenario Store** (or `python -m simulator store`) are kept in `{DEFAULT_STORE_PATH}` "
+                "with their results. Filter them by key metrics and load one back into the inputs.")
+    store_cols = st.columns(4)
+    store_min_irr = store_cols[0].number_input("Min IRR (%)", value=0.0, step=5.0, key="store_min_irr")
+    store_max_machines = store_cols[1].number_input("Max Machines (0 = any)", 0, 100000, 0, 1, key="store_max_machines")
+    store_min_npv = store_cols[2].number_input("Min NPV (AED)", value=0.0, step=1000000.0, key="store_min_npv")
+    store_order_by = store_cols[3].selectbox("Sort By", ["npv", "irr", "roi", "annual_profit", "num_machines", "created_at"], key="store_order_by")
+    stored_matches = pd.DataFrame()
+    # Only an existing store is opened here; the file is created by the first save
+    if not os.path.exists(DEFAULT_STORE_PATH):
+        st.caption("No scenarios stored yet.")
+    else:
+        try:
+            with ScenarioStore(DEFAULT_STORE_PATH) as scenario_store:
+                stored_total = len(scenario_store)
+                stored_matches = scenario_store.query(min_irr=store_min_irr or None, max_machines=store_max_machines or None,
+                                                      min_npv=store_min_npv or None, order_by=store_order_by, limit=500)
+        except (sqlite3.Error, pd.errors.DatabaseError) as e: # pandas wraps errors raised by the query
+            st.warning(f"The scenario store at {DEFAULT_STORE_PATH} is unavailable: {e}")
+        else:
+            st.caption(f"{len(stored_matches):,} of {stored_total:,} stored scenarios shown (at most 500).")
+    if not stored_matches.empty:
+        stored_matches["created_at"] = pd.to_datetime(stored_matches["created_at"], unit="s")
+        st.dataframe(stored_matches, use_container_width=True, hide_index=True)
+        store_load_cols = st.columns([3, 1])
+        store_load_id = store_load_cols[0].selectbox("Scenario to Load", stored_matches["id"].tolist(), key="store_load_id",
+                                                     format_func=lambda i: f"#{i} {stored_matches.set_index('id').at[i, 'name'] or ''}")
+        store_load_cols[1].button("📂 Load Scenario", key="load_from_store_button", on_click=load_stored_scenario, args=(store_load_id,))
+
+app_profiler.deactivate()
+with st.expander("⏱️ Performance"):
+    st.markdown("Records wall time and call counts of each calculation and dashboard render stage on every rerun while enabled. "
+                "The trace file opens in chrome://tracing, [Perfetto](https://ui.perfetto.dev) or speedscope.")
+    perf_cols = st.columns(2)
+    perf_cols[0].checkbox("Profile Each Rerun", key="profiling_enabled")
+    perf_cols[1].checkbox("Track Allocations (slower)", key="profiling_allocations", disabled=not st.session_state.get("profiling_enabled", False))
+    if app_profiler.spans:
+        st.caption(f"Last rerun: {app_profiler.elapsed_ms():,.1f} ms in total, {len(app_profiler.spans):,} recorded spans.")
+        perf_summary = pd.DataFrame(app_profiler.summary())
+        perf_columns = ["name", "category", "calls", "total_ms", "mean_ms", "max_ms"]
+        if app_profiler.track_allocations:
+            perf_summary["alloc_kib"] = perf_summary["alloc_bytes"] / 1024
+            perf_summary["peak_alloc_kib"] = perf_summary["peak_alloc_bytes"] / 1024
+            perf_columns += ["alloc_kib", "peak_alloc_kib"]
+        st.dataframe(perf_summary[perf_columns], use_container_width=True, hide_index=True)
+        st.download_button(
+            label="📥 Download Trace (Chrome Trace JSON)",
+            data=json.dumps(app_profiler.chrome_trace()),
+            file_name="3dcp_trace.json",
+            mime="application/json",
+            key="download_trace_button",
+        )
+    elif st.session_state.get("profiling_enabled", False):
+        st.info("Profiling is on; the next rerun will be recorded.")
+
 st.markdown("---")
-st.caption(f"Simulator v3.2: Session State Fixes. Review assumptions carefully.")
+calc_cache_stats = cache_stats()
+st.caption(f"Simulator v3.2: Session State Fixes. Review assumptions carefully. "
+           f"Calculation cache: {calc_cache_stats['hits']} hits / {calc_cache_stats['misses']} misses, {calc_cache_stats['entries']} of {calc_cache_stats['maxsize']} entries.")
@@ -0,0 +1,93 @@
+"""Parity check of the batch engine against the scalar calculation path.
+
+    python benchmarks/batch_parity.py [num_scenarios] [seed]
+
+Evaluates random scenarios (mixed fleets of 1-4 machines, varying lifespans,
+and inputs that drive the "N/A" cases) through ``run_scenario`` one at a time
+and through ``evaluate_scenarios`` in one batch, and compares every result
+key. Numbers must match exactly; where the scalar path returns an "N/A ..."
+string the batch engine must return NaN. Exits non-zero on any mismatch.
+"""
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulator.api import run_scenario  # noqa: E402
+from simulator.batch import evaluate_scenarios  # noqa: E402
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS  # noqa: E402
+from simulator.scenario import get_all_inputs_as_dict  # noqa: E402
+
+# Share of scenarios pushed into each edge case
+EDGE_CASE_SHARE = 0.1
+
+
+def random_scenarios(num_scenarios, seed=0):
+    rng = np.random.default_rng(seed)
+    scenarios = []
+    for _ in range(num_scenarios):
+        g = dict(DEFAULT_GLOBAL_PARAMS)
+        g["powder_cost_per_ton"] = float(rng.uniform(300, 1200))
+        g["villa_printing_days_3dcp"] = int(rng.integers(10, 60))
+        g["villa_additional_prep_finish_days_3dcp"] = int(rng.integers(0, 30))
+        g["market_selling_price_per_villa"] = float(rng.uniform(1.2e6, 3e6))
+        g["discount_rate_for_npv"] = float(rng.uniform(0, 0.25))
+        g["lessor_target_profit_margin"] = float(rng.uniform(0, 0.9))
+        edge = rng.random()
+        if edge < EDGE_CASE_SHARE:
+            # Selling below the variable cost: no break-even and no IRR
+            g["market_selling_price_per_villa"] = float(rng.uniform(0, 5e5))
+        elif edge < 2 * EDGE_CASE_SHARE:
+            # Zero-day cycles and a 100% lessor margin hit the scalar path's guards
+            g["villa_printing_days_3dcp"] = 0
+            g["villa_additional_prep_finish_days_3dcp"] = 0
+            g["lessor_target_profit_margin"] = 1.0
+        elif edge < 3 * EDGE_CASE_SHARE:
+            # Profit close to zero: IRR near -100% or with no sign change
+            g["market_selling_price_per_villa"] = float(rng.uniform(6e5, 9e5))
+        machines = [
+            {
+                "id": i + 1,
+                "machine_cost": float(rng.uniform(2e5, 5e6)),
+                "machine_lifespan_years": int(rng.integers(1, 16)),
+                "annual_maintenance_cost_pct": float(rng.uniform(0.01, 0.3)),
+                "engineer_monthly_salary": float(rng.uniform(0, 20000)),
+            }
+            for i in range(int(rng.integers(1, 5)))
+        ]
+        scenarios.append(get_all_inputs_as_dict(g, machines))
+    return scenarios
+
+def compare(scenarios):
+    """``(num_values_compared, mismatches)``; each mismatch is ``(row, key, scalar, batch)``."""
+    batch = evaluate_scenarios(scenarios)
+    num_compared = 0
+    mismatches = []
+    for row, scenario in enumerate(scenarios):
+        for key, expected in run_scenario(scenario).items():
+            actual = batch.at[row, key]
+            num_compared += 1
+            if isinstance(expected, str):
+                matched = isinstance(actual, float) and math.isnan(actual)
+            else:
+                matched = actual == expected or (math.isnan(actual) and math.isnan(expected))
+            if not matched:
+                mismatches.append((row, key, expected, actual))
+    return num_compared, mismatches
+
+def main(num_scenarios=500, seed=0):
+    scenarios = random_scenarios(num_scenarios, seed)
+    num_compared, mismatches = compare(scenarios)
+    num_na = sum(isinstance(v, str) for s in scenarios for v in run_scenario(s).values())
+    print(f"scenarios:          {num_scenarios:,} (seed {seed})")
+    print(f"values compared:    {num_compared:,} ({num_na:,} N/A)")
+    print(f"mismatches:         {len(mismatches)}")
+    for row, key, expected, actual in mismatches[:20]:
+        print(f"  scenario {row} {key}: scalar {expected!r}, batch {actual!r}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:3])))
@@ -0,0 +1,55 @@
+"""Benchmark and accuracy check of simulator.irr against per-vector npf.irr.
+
+    python benchmarks/irr_benchmark.py [num_vectors]
+
+Exits non-zero if any IRR differs from numpy-financial by more than 1e-8.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import numpy_financial as npf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulator.irr import IRR_OK, irr  # noqa: E402
+
+ACCURACY = 1e-8
+
+
+def random_cash_flows(num_vectors, max_years=20, seed=0):
+    rng = np.random.default_rng(seed)
+    lifespans = rng.integers(1, max_years + 1, num_vectors)
+    cash_flows = np.zeros((num_vectors, max_years + 1))
+    cash_flows[:, 0] = -rng.uniform(1e5, 1e7, num_vectors)
+    annual = rng.uniform(-2e5, 5e6, num_vectors)[:, None] * rng.uniform(0.5, 1.5, (num_vectors, max_years))
+    cash_flows[:, 1:] = np.where(np.arange(1, max_years + 1) <= lifespans[:, None], annual, 0.0)
+    return cash_flows, lifespans
+
+def main(num_vectors=20000):
+    cash_flows, lifespans = random_cash_flows(num_vectors)
+
+    start = time.perf_counter()
+    rates, status = irr(cash_flows)
+    vectorized_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = np.array([npf.irr(row[:years + 1]) for row, years in zip(cash_flows, lifespans)])
+    reference_seconds = time.perf_counter() - start
+
+    solved = status == IRR_OK
+    both = solved & ~np.isnan(reference)
+    max_error = np.abs(rates[both] - reference[both]).max() if both.any() else 0.0
+    status_mismatches = int((solved != ~np.isnan(reference)).sum())
+
+    print(f"vectors:            {num_vectors:,}")
+    print(f"simulator.irr:      {vectorized_seconds:.3f} s ({num_vectors / vectorized_seconds:,.0f} IRR/s)")
+    print(f"npf.irr loop:       {reference_seconds:.3f} s ({num_vectors / reference_seconds:,.0f} IRR/s)")
+    print(f"speedup:            {reference_seconds / vectorized_seconds:.1f}x")
+    print(f"max |error|:        {max_error:.2e}")
+    print(f"status mismatches:  {status_mismatches}")
+    return 0 if max_error <= ACCURACY and status_mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,184 @@
+"""Benchmark suite for the financial engine, with JSON baselines and a regression gate.
+
+    python benchmarks/suite.py [-k PATTERN] [--save baseline.json] [--compare baseline.json] [--threshold 0.15]
+
+Each benchmark calls its function repeatedly for ``--min-time`` seconds and
+reports throughput, latency percentiles (per call) and the peak memory
+allocated by one call (measured separately under ``tracemalloc``, so the
+timings are not slowed by it). ``--compare`` exits non-zero if any
+benchmark's median latency or peak memory grew by more than ``--threshold``
+against the baseline.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulator.api import run_scenario_parts  # noqa: E402
+from simulator.batch import evaluate_scenarios  # noqa: E402
+from simulator.calculations import (  # noqa: E402
+    DEFAULT_GLOBAL_PARAMS,
+    DEFAULT_SINGLE_MACHINE_PARAMS,
+    calculate_contracting_model_per_villa,
+    calculate_fleet_contracting_financials,
+    calculate_leasing_model_for_machine,
+    calculate_machine_operational_costs,
+)
+from simulator.irr import irr  # noqa: E402
+from simulator.params import ScenarioParams  # noqa: E402
+from simulator.scenario import get_all_inputs_as_dict, load_scenario_file, normalize_scenario, save_scenario_file  # noqa: E402
+
+FLEET_SIZES = (1, 10, 100, 1000)
+# Peak memory below this many bytes is noise and never flagged
+MEMORY_SLACK_BYTES = 64 * 1024
+
+
+def _fleet(num_machines):
+    return [dict(DEFAULT_SINGLE_MACHINE_PARAMS, id=i + 1, machine_cost=1000000 + 1000 * i) for i in range(num_machines)]
+
+def _irr_cash_flows(num_vectors, years=20, seed=0):
+    rng = np.random.default_rng(seed)
+    cash_flows = rng.uniform(1e5, 5e6, (num_vectors, years + 1))
+    cash_flows[:, 0] = -rng.uniform(1e6, 1e7, num_vectors)
+    return cash_flows
+
+def build_benchmarks(scratch_dir):
+    """``{name: (function, items_per_call)}`` for every benchmark."""
+    g = dict(DEFAULT_GLOBAL_PARAMS)
+    machine = dict(DEFAULT_SINGLE_MACHINE_PARAMS)
+    daily_op_cost = calculate_machine_operational_costs(machine, g)[1]
+    villa_details = calculate_contracting_model_per_villa(daily_op_cost, g)
+    benchmarks = {
+        "calc.machine_operational_costs": (lambda: calculate_machine_operational_costs(machine, g), 1),
+        "calc.leasing_model_for_machine": (lambda: calculate_leasing_model_for_machine(machine, g), 1),
+        "calc.contracting_model_per_villa": (lambda: calculate_contracting_model_per_villa(daily_op_cost, g), 1),
+        "calc.fleet_contracting_financials": (lambda: calculate_fleet_contracting_financials(1, [machine], g, villa_details), 1),
+    }
+    for size in FLEET_SIZES:
+        scenario = get_all_inputs_as_dict(g, _fleet(size))
+        benchmarks[f"fleet.scenario.{size}"] = (lambda s=scenario: run_scenario_parts(s), 1)
+        benchmarks[f"fleet.batch.{size}"] = (lambda s=scenario: evaluate_scenarios([s]), 1)
+        benchmarks[f"fleet.params.{size}"] = (lambda p=ScenarioParams.from_dict(scenario): p.evaluate(), 1)
+
+    single = _irr_cash_flows(1)[0]
+    many = _irr_cash_flows(10000)
+    benchmarks["irr.single"] = (lambda: irr(single), 1)
+    benchmarks["irr.vectorized.10000"] = (lambda: irr(many), len(many))
+
+    # JSON round trip of a 10-machine scenario, as the dashboard's save/load does
+    scenario = get_all_inputs_as_dict(g, _fleet(10))
+    path = os.path.join(scratch_dir, "scenario.json")
+    save_scenario_file(path, scenario)
+    benchmarks["scenario.save"] = (lambda: save_scenario_file(path, get_all_inputs_as_dict(g, scenario["machine_params_list"])), 1)
+    benchmarks["scenario.load"] = (lambda: normalize_scenario(load_scenario_file(path)), 1)
+    benchmarks["scenario.json_roundtrip"] = (lambda: normalize_scenario(json.loads(json.dumps(scenario, indent=2))), 1)
+    return benchmarks
+
+def measure(func, items_per_call=1, min_time=0.2, min_calls=5, warmup=2):
+    for _ in range(warmup):
+        func()
+    latencies = []
+    deadline = time.perf_counter() + min_time
+    while len(latencies) < min_calls or time.perf_counter() < deadline:
+        start = time.perf_counter_ns()
+        func()
+        latencies.append(time.perf_counter_ns() - start)
+    latencies = np.asarray(latencies, dtype=float) / 1e9
+
+    tracemalloc.start()
+    func()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "calls": len(latencies),
+        "items_per_call": items_per_call,
+        "throughput_per_s": items_per_call * len(latencies) / latencies.sum(),
+        "mean_s": float(latencies.mean()),
+        "p50_s": float(np.percentile(latencies, 50)),
+        "p90_s": float(np.percentile(latencies, 90)),
+        "p99_s": float(np.percentile(latencies, 99)),
+        "peak_memory_bytes": int(peak_bytes),
+    }
+
+def run_suite(pattern="*", min_time=0.2, progress=None):
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        benchmarks = build_benchmarks(scratch_dir)
+        results = {}
+        for name, (func, items_per_call) in benchmarks.items():
+            if not fnmatch.fnmatch(name, pattern):
+                continue
+            results[name] = measure(func, items_per_call, min_time)
+            if progress:
+                progress(name, results[name])
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        },
+        "benchmarks": results,
+    }
+
+def compare(current, baseline, threshold=0.15):
+    """Rows of ``(name, metric, baseline, current, ratio, regressed)`` for benchmarks in both runs."""
+    rows = []
+    for name, result in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            continue
+        for metric in ("p50_s", "peak_memory_bytes"):
+            ratio = result[metric] / base[metric] if base[metric] else 1.0
+            regressed = ratio > 1 + threshold
+            if metric == "peak_memory_bytes":
+                regressed &= result[metric] - base[metric] > MEMORY_SLACK_BYTES
+            rows.append((name, metric, base[metric], result[metric], ratio, regressed))
+    return rows
+
+def _format_result(name, result):
+    return (
+        f"{name:<36} {result['throughput_per_s']:>14,.0f}/s  p50 {result['p50_s'] * 1e6:>10.1f} us  "
+        f"p90 {result['p90_s'] * 1e6:>10.1f} us  p99 {result['p99_s'] * 1e6:>10.1f} us  "
+        f"peak {result['peak_memory_bytes'] / 1024:>9.1f} KiB"
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", "--filter", default="*", help="Only run benchmarks whose name matches this glob.")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds to spend timing each benchmark (default: 0.2).")
+    parser.add_argument("--save", help="Write the results to this JSON baseline file.")
+    parser.add_argument("--compare", help="Compare against this JSON baseline and fail on regressions.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown/memory growth as a fraction (default: 0.15).")
+    args = parser.parse_args(argv)
+
+    current = run_suite(args.filter, args.min_time, progress=lambda name, result: print(_format_result(name, result)))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+    if not args.compare:
+        return 0
+
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, args.threshold)
+    print(f"\nagainst {args.compare} (threshold {args.threshold:.0%}):")
+    for name, metric, base, value, ratio, regressed in rows:
+        if regressed or ratio < 1 - args.threshold:
+            label = "REGRESSION" if regressed else "improved"
+            print(f"  {label:<10} {name:<36} {metric:<18} {base:.4g} -> {value:.4g} ({ratio:.2f}x)")
+    num_regressions = sum(row[-1] for row in rows)
+    print(f"  {num_regressions} regression(s) in {len(rows)} comparisons")
+    return 1 if num_regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Calculation engine for the 3DCP business simulator."""
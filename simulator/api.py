@@ -0,0 +1,106 @@
+"""Headless Python API for running scenarios without the Streamlit dashboard."""
+import json
+import os
+
+from simulator.batch import evaluate_scenarios
+from simulator.calculations import (
+    calculate_machine_operational_costs,
+    calculate_leasing_model_for_machine,
+    calculate_contracting_model_per_villa,
+    calculate_fleet_contracting_financials,
+)
+from simulator.params import ScenarioParams
+from simulator.profiling import profiled
+from simulator.sensitivity import SENSITIVITY_METRICS, sensitivity_analysis
+from simulator.scenario import find_scenario_files, load_scenario_file, normalize_scenario
+
+OUTPUT_FORMATS = ("json", "csv", "parquet")
+
+# Raised for a scenario file that cannot be read or is not a valid scenario
+SCENARIO_FILE_ERRORS = (OSError, ValueError, TypeError, AttributeError, KeyError)
+
+
+@profiled
+def run_scenario_parts(scenario_data):
+    """Evaluate one scenario exactly as "Run Simulation & Generate Dashboard" does.
+
+    Returns ``(avg_daily_op_cost_fleet, contracting_villa_details, fleet_financials, leasing_first_machine)``.
+    """
+    scenario = normalize_scenario(scenario_data)
+    global_params = scenario["global_params"]
+    machine_params_list = scenario["machine_params_list"]
+    if not machine_params_list:
+        raise ValueError("Please configure at least one machine.")
+    avg_daily_op_cost_fleet = sum(calculate_machine_operational_costs(mp, global_params)[1] for mp in machine_params_list) / len(machine_params_list)
+    contracting_villa_details = calculate_contracting_model_per_villa(avg_daily_op_cost_fleet, global_params)
+    fleet_financials = calculate_fleet_contracting_financials(scenario["num_machines"], machine_params_list, global_params, contracting_villa_details)
+    leasing = calculate_leasing_model_for_machine(machine_params_list[0], global_params)
+    return avg_daily_op_cost_fleet, contracting_villa_details, fleet_financials, leasing
+
+def run_scenario(scenario_data):
+    """Evaluate one scenario; returns the dashboard's results as one flat dict."""
+    avg_daily_op_cost_fleet, contracting_villa_details, fleet_financials, leasing = run_scenario_parts(scenario_data)
+    return {"avg_daily_op_cost_fleet": avg_daily_op_cost_fleet, **leasing, **contracting_villa_details, **fleet_financials}
+
+def run_scenarios(scenarios):
+    """Evaluate a list of scenario dicts in one vectorized pass; returns a DataFrame."""
+    return evaluate_scenarios(scenarios)
+
+def load_checked_scenario(path):
+    """Load a scenario file and validate it as the dashboard does on load; raises one of ``SCENARIO_FILE_ERRORS``."""
+    scenario_data = load_scenario_file(path)
+    if not len(ScenarioParams.from_dict(scenario_data).fleet):
+        raise ValueError("Scenario has no machines.")
+    return scenario_data
+
+def run_scenario_files(inputs):
+    """Evaluate scenario JSON files given as paths, directories or globs; adds ``scenario_file`` and ``error`` columns.
+
+    A file that cannot be loaded keeps its row, with the reason in ``error`` and NaN results.
+    """
+    paths = find_scenario_files(inputs)
+    scenarios, errors = [], []
+    for path in paths:
+        try:
+            scenarios.append(load_checked_scenario(path))
+            errors.append(None)
+        except SCENARIO_FILE_ERRORS as e:
+            scenarios.append(None)
+            errors.append(str(e))
+    loaded = [i for i, scenario in enumerate(scenarios) if scenario is not None]
+    results = run_scenarios([scenarios[i] for i in loaded])
+    results.index = loaded
+    results = results.reindex(range(len(paths)))
+    results.insert(0, "scenario_file", paths)
+    results["error"] = errors
+    return results
+
+def run_sensitivity(scenario_data, pct=0.10, metrics=SENSITIVITY_METRICS):
+    """Tornado table for one scenario: each parameter moved by ±``pct``, ranked by effect on each metric."""
+    scenario = normalize_scenario(scenario_data)
+    return sensitivity_analysis(scenario["global_params"], scenario["machine_params_list"], pct, metrics=metrics)
+
+def output_format_for(path, fmt=None):
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path or "")[1].lstrip(".").lower()
+    return extension if extension in OUTPUT_FORMATS else "json"
+
+def write_results(results, path=None, fmt=None):
+    """Write a results frame as JSON records, CSV or Parquet; ``path=None`` returns the text instead."""
+    fmt = output_format_for(path, fmt)
+    if fmt == "json":
+        records = results.astype(object).where(results.notna(), None).to_dict(orient="records")
+        text = json.dumps(records, indent=2)
+        if path is None:
+            return text
+        with open(path, "w") as f:
+            f.write(text)
+        return None
+    if fmt == "csv":
+        return results.to_csv(path, index=False)
+    if fmt == "parquet":
+        if path is None:
+            raise ValueError("Parquet output needs an output file.")
+        return results.to_parquet(path, index=False)
+    raise ValueError(f"Unknown output format '{fmt}', expected one of {', '.join(OUTPUT_FORMATS)}")
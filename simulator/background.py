@@ -0,0 +1,109 @@
+"""Background evaluation of chunked analyses, with streamed partial results and cancellation.
+
+One daemon thread runs an asyncio event loop shared by every caller (and
+every Streamlit session). ``submit_job`` schedules a job on it; the job pulls
+chunks from an ordinary iterator, e.g. ``iter_monte_carlo`` or
+``iter_grid_chunks``, evaluating each one in a worker thread through
+``run_in_executor`` so the loop stays free to start and cancel other jobs.
+Every finished chunk is appended to ``job.chunks`` straight away, which is
+what a dashboard polls to draw partial results.
+
+``job.cancel()`` stops a job before its next chunk; a chunk already being
+evaluated runs to completion and is discarded. Workers are threads rather
+than processes: the chunks are NumPy-bound and would otherwise have to be
+pickled back to the dashboard.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKGROUND_WORKERS = 2
+
+_loop = [None]
+_loop_lock = threading.Lock()
+_executor = ThreadPoolExecutor(BACKGROUND_WORKERS, thread_name_prefix="3dcp-background")
+_EXHAUSTED = object()
+
+
+def _event_loop():
+    with _loop_lock:
+        if _loop[0] is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="3dcp-background-loop", daemon=True).start()
+            _loop[0] = loop
+    return _loop[0]
+
+
+class BackgroundJob:
+    """A submitted job: ``status`` is "running", "done", "cancelled" or "error" (see ``error``)."""
+
+    def __init__(self, key):
+        self.key = key
+        self.chunks = []
+        self.status = "running"
+        self.error = None
+        self._started = time.perf_counter()
+        self._finished = None
+        self._lock = threading.Lock()
+        self._future = None
+
+    @property
+    def running(self):
+        return self.status == "running"
+
+    def snapshot(self):
+        """The chunks finished so far (a copy, safe to use while the job runs)."""
+        with self._lock:
+            return list(self.chunks)
+
+    def elapsed_s(self):
+        return (self._finished or time.perf_counter()) - self._started
+
+    def cancel(self):
+        with self._lock:
+            if self.status != "running":
+                return
+            self.status = "cancelled"
+            self._finished = time.perf_counter()
+        self._future.cancel()
+
+    def wait(self, timeout=None):
+        """Block until the job stops; returns its status."""
+        try:
+            self._future.result(timeout)
+        except (Exception, asyncio.CancelledError):
+            pass  # the outcome is kept on status and error
+        return self.status
+
+    def _finish(self, status, error=None):
+        with self._lock:
+            if self.status == "running":
+                self.status = status
+                self.error = error
+                self._finished = time.perf_counter()
+
+
+async def _run(job, chunks):
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(_executor, next, chunks, _EXHAUSTED)
+            if chunk is _EXHAUSTED:
+                break
+            with job._lock:
+                if job.status != "running":
+                    return
+                job.chunks.append(chunk)
+        job._finish("done")
+    except asyncio.CancelledError:
+        job._finish("cancelled")
+        raise
+    except Exception as e:
+        job._finish("error", e)
+
+def submit_job(key, chunks):
+    """Start evaluating the iterable ``chunks`` in the background; ``key`` identifies the inputs it was built from."""
+    job = BackgroundJob(key)
+    job._future = asyncio.run_coroutine_threadsafe(_run(job, iter(chunks)), _event_loop())
+    return job
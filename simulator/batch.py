@@ -0,0 +1,274 @@
+"""Columnar batch evaluation of the calculation functions.
+
+Each row of the input is one scenario. The results frame carries the same keys
+as the dicts returned by the scalar functions in ``simulator.calculations``;
+values the scalar path reports as "N/A ..." strings come back as NaN (for the
+IRR, ``irr_3dcp_fleet_status`` carries the ``simulator.irr`` status code).
+"""
+import numpy as np
+import pandas as pd
+
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+from simulator.irr import irr, npv
+from simulator.profiling import profiled
+from simulator.scenario import normalize_scenario
+
+MACHINE_PARAM_KEYS = (
+    "machine_cost",
+    "machine_lifespan_years",
+    "annual_maintenance_cost_pct",
+    "engineer_monthly_salary",
+)
+
+
+# --- INPUT NORMALIZATION ---
+def _num_rows(data, machines=None):
+    if isinstance(data, pd.DataFrame):
+        n = len(data)
+    else:
+        lengths = [np.size(v) for v in data.values() if np.ndim(v) > 0]
+        n = max(lengths) if lengths else 1
+    # Scalar globals with a long machines table cover every scenario it refers to
+    if machines is not None and len(machines["scenario"]):
+        n = max(n, int(np.max(machines["scenario"])) + 1)
+    return n
+
+def _column(data, key, default, n):
+    if key not in data:
+        return np.full(n, default, dtype=float)
+    return np.broadcast_to(np.asarray(data[key], dtype=float), (n,))
+
+def global_columns(scenarios, n=None):
+    n = _num_rows(scenarios) if n is None else n
+    return {k: _column(scenarios, k, v, n) for k, v in DEFAULT_GLOBAL_PARAMS.items()}
+
+def fleet_columns(scenarios, machines=None, n=None):
+    """Aggregate per-machine inputs into per-scenario fleet columns.
+
+    Without ``machines`` every scenario is a homogeneous fleet of ``num_machines``
+    copies of the machine columns found in ``scenarios``. With ``machines`` (long
+    format, one row per machine, ``scenario`` holding the row position of its
+    scenario) fleets may be mixed; machines are taken in their given order.
+    """
+    n = _num_rows(scenarios, machines) if n is None else n
+    g = global_columns(scenarios, n)
+    if machines is None:
+        num_machines = _column(scenarios, "num_machines", 1, n)
+        m = {k: _column(scenarios, k, DEFAULT_SINGLE_MACHINE_PARAMS[k], n) for k in MACHINE_PARAM_KEYS}
+        total_annual_op_cost, daily_op_cost = machine_operational_costs(m, g)
+        # Repeated addition keeps the float results identical to sum() over a list
+        max_count = int(num_machines.max()) if n else 0
+        total_capital = np.zeros(n)
+        total_annual_fleet_op_costs = np.zeros(n)
+        daily_sum = np.zeros(n)
+        for i in range(max_count):
+            active = num_machines > i
+            total_capital = np.where(active, total_capital + m["machine_cost"], total_capital)
+            total_annual_fleet_op_costs = np.where(active, total_annual_fleet_op_costs + total_annual_op_cost, total_annual_fleet_op_costs)
+            daily_sum = np.where(active, daily_sum + daily_op_cost, daily_sum)
+        return {
+            "num_machines": num_machines,
+            "total_capital_invested_fleet": total_capital,
+            "total_annual_fleet_machine_op_costs": total_annual_fleet_op_costs,
+            "avg_daily_op_cost_fleet": daily_sum / num_machines,
+            "max_machine_lifespan_years": np.where(num_machines > 0, m["machine_lifespan_years"], 1),
+            "first_machine": m,
+        }
+
+    scenario_idx = np.asarray(machines["scenario"], dtype=np.intp)
+    n_machines = len(scenario_idx)
+    m = {k: _column(machines, k, DEFAULT_SINGLE_MACHINE_PARAMS[k], n_machines) for k in MACHINE_PARAM_KEYS}
+    g_per_machine = {k: v[scenario_idx] for k, v in g.items()}
+    total_annual_op_cost, daily_op_cost = machine_operational_costs(m, g_per_machine)
+    counts = np.bincount(scenario_idx, minlength=n)
+    max_lifespan = np.ones(n)
+    first_row = np.full(n, -1, dtype=np.intp)
+    if n_machines:
+        order = np.argsort(scenario_idx, kind="stable")
+        starts = np.flatnonzero(np.r_[True, np.diff(scenario_idx[order]) != 0])
+        present = scenario_idx[order][starts]
+        max_lifespan[present] = np.maximum.reduceat(m["machine_lifespan_years"][order], starts)
+        first_row[present] = order[starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_daily = np.bincount(scenario_idx, weights=daily_op_cost, minlength=n) / counts
+    first_machine = {k: np.where(first_row >= 0, v[first_row], DEFAULT_SINGLE_MACHINE_PARAMS[k]) for k, v in m.items()}
+    return {
+        "num_machines": _column(scenarios, "num_machines", 0, n) if "num_machines" in scenarios else counts.astype(float),
+        "total_capital_invested_fleet": np.bincount(scenario_idx, weights=m["machine_cost"], minlength=n),
+        "total_annual_fleet_machine_op_costs": np.bincount(scenario_idx, weights=total_annual_op_cost, minlength=n),
+        "avg_daily_op_cost_fleet": avg_daily,
+        "max_machine_lifespan_years": max_lifespan,
+        "first_machine": first_machine,
+    }
+
+def frames_from_scenarios(scenarios):
+    """Turn a list of scenario dicts (``get_all_inputs_as_dict`` format) into (scenarios, machines) frames."""
+    global_rows = []
+    machine_rows = []
+    for idx, scenario_data in enumerate(scenarios):
+        scenario = normalize_scenario(scenario_data)
+        global_rows.append(dict(scenario["global_params"], num_machines=scenario["num_machines"]))
+        for machine in scenario["machine_params_list"]:
+            machine_rows.append(dict(machine, scenario=idx))
+    scenario_frame = pd.DataFrame(global_rows, columns=list(DEFAULT_GLOBAL_PARAMS) + ["num_machines"])
+    machine_frame = pd.DataFrame(machine_rows, columns=["scenario", *MACHINE_PARAM_KEYS])
+    return scenario_frame, machine_frame
+
+
+# --- VECTORIZED CALCULATION FUNCTIONS ---
+def machine_operational_costs(m, g):
+    annual_capital_recovery = m["machine_cost"] / m["machine_lifespan_years"]
+    annual_maintenance = m["machine_cost"] * m["annual_maintenance_cost_pct"]
+    annual_engineer_cost = m["engineer_monthly_salary"] * 12
+    total_annual_op_cost = annual_capital_recovery + annual_maintenance + annual_engineer_cost
+    daily_op_cost = total_annual_op_cost / g["operating_days_per_year"]
+    return total_annual_op_cost, daily_op_cost
+
+def leasing_model_for_machine(m, g):
+    results = {}
+    total_annual_op_cost, daily_op_cost = machine_operational_costs(m, g)
+    results["total_annual_lessor_cost_per_machine"] = total_annual_op_cost
+    results["daily_lessor_cost_basis_per_machine"] = daily_op_cost
+    profit_margin_divisor = 1 - g["lessor_target_profit_margin"]
+    profit_margin_divisor = np.where(profit_margin_divisor <= 0, 0.001, profit_margin_divisor)
+    recommended_daily_lease_price = daily_op_cost / profit_margin_divisor
+    results["recommended_daily_lease_price_per_machine"] = recommended_daily_lease_price
+    daily_profit_lessor = recommended_daily_lease_price - daily_op_cost
+    results["annual_profit_lessor_per_machine_at_utilization"] = daily_profit_lessor * g["machine_utilization_leasing_days_per_machine"]
+    lease_cost_for_villa = recommended_daily_lease_price * g["villa_printing_days_3dcp"]
+    powder_cost_for_villa_lease = g["powder_cost_per_ton"] * g["powder_tons_per_villa"]
+    results["contractor_3dcp_elements_cost_per_villa_via_leasing"] = (
+        lease_cost_for_villa + powder_cost_for_villa_lease + g["steel_cables_cost_per_villa"]
+    )
+    return results
+
+def contracting_model_per_villa(machine_daily_op_cost, g):
+    results = {}
+    machine_op_cost_for_project_per_villa = machine_daily_op_cost * g["villa_printing_days_3dcp"]
+    results["machine_op_cost_for_project_per_villa"] = machine_op_cost_for_project_per_villa
+    powder_cost_for_villa = g["powder_cost_per_ton"] * g["powder_tons_per_villa"]
+    total_3dcp_shell_process_cost = machine_op_cost_for_project_per_villa + powder_cost_for_villa + g["steel_cables_cost_per_villa"]
+    results["total_3dcp_shell_process_cost_per_villa"] = total_3dcp_shell_process_cost
+    other_direct_costs_3dcp = (
+        g["cost_foundation_per_villa_3dcp"] +
+        g["cost_roofing_per_villa_3dcp"] +
+        g["cost_mep_per_villa_3dcp"] +
+        g["cost_finishes_per_villa_3dcp"] +
+        g["cost_site_prep_approvals_design_3dcp"]
+    )
+    results["other_direct_costs_per_villa_3dcp"] = other_direct_costs_3dcp
+    optimized_total_cost_per_3dcp_villa = total_3dcp_shell_process_cost + other_direct_costs_3dcp
+    results["optimized_total_cost_per_3dcp_villa"] = optimized_total_cost_per_3dcp_villa
+    results["profit_per_3dcp_villa"] = g["market_selling_price_per_villa"] - optimized_total_cost_per_3dcp_villa
+    return results
+
+def _npv_flat_annuity(rate, capital, annual_profit, lifespan):
+    # Grouped by lifespan so each row is summed exactly as npf.npv sums one cash-flow vector;
+    # a lifespan below one year adds no profit years, as in the scalar loop
+    lifespan = np.maximum(lifespan, 0)
+    result = np.empty(len(capital))
+    for years in np.unique(lifespan):
+        rows = np.flatnonzero(lifespan == years)
+        cash_flows = np.empty((len(rows), years + 1))
+        cash_flows[:, 0] = -capital[rows]
+        cash_flows[:, 1:] = annual_profit[rows, None]
+        result[rows] = npv(rate[rows], cash_flows)
+    return result
+
+def _irr_flat_annuity(capital, annual_profit, lifespan):
+    # Zero padding past each row's lifespan leaves the IRR polynomial unchanged
+    lifespan = np.maximum(lifespan, 0)
+    periods = np.arange(int(lifespan.max(initial=0)) + 1)
+    cash_flows = np.where(periods <= lifespan[:, None], annual_profit[:, None], 0.0)
+    cash_flows[:, 0] = -capital
+    rates, status = irr(cash_flows)
+    return rates * 100, status
+
+def fleet_contracting_financials(fleet, g, contracting_villa_details):
+    results = {}
+    num_machines = fleet["num_machines"]
+    villa_total_cycle_days_3dcp = g["villa_printing_days_3dcp"] + g["villa_additional_prep_finish_days_3dcp"]
+    villa_total_cycle_days_3dcp = np.where(villa_total_cycle_days_3dcp == 0, 1, villa_total_cycle_days_3dcp)
+    villas_per_year_per_active_3dcp_machine = g["operating_days_per_year"] / villa_total_cycle_days_3dcp
+    total_villas_per_year_3dcp_fleet = villas_per_year_per_active_3dcp_machine * num_machines
+    results["villa_total_cycle_days_3dcp"] = villa_total_cycle_days_3dcp
+    results["villas_per_year_per_active_3dcp_machine"] = villas_per_year_per_active_3dcp_machine
+    results["total_villas_per_year_3dcp_fleet"] = total_villas_per_year_3dcp_fleet
+
+    annual_revenue_3dcp_fleet = total_villas_per_year_3dcp_fleet * g["market_selling_price_per_villa"]
+    results["annual_revenue_3dcp_fleet"] = annual_revenue_3dcp_fleet
+    total_capital_invested_fleet = fleet["total_capital_invested_fleet"]
+    results["total_capital_invested_fleet"] = total_capital_invested_fleet
+    total_annual_fleet_machine_op_costs = fleet["total_annual_fleet_machine_op_costs"]
+
+    variable_shell_material_cost_per_villa = (g["powder_cost_per_ton"] * g["powder_tons_per_villa"] +
+                                             g["steel_cables_cost_per_villa"])
+    total_annual_variable_shell_material_costs_fleet = variable_shell_material_cost_per_villa * total_villas_per_year_3dcp_fleet
+    variable_other_direct_costs_per_villa = contracting_villa_details["other_direct_costs_per_villa_3dcp"]
+    total_annual_other_direct_costs_fleet = variable_other_direct_costs_per_villa * total_villas_per_year_3dcp_fleet
+    total_annual_cost_3dcp_fleet_contracting = (total_annual_fleet_machine_op_costs +
+                                                total_annual_variable_shell_material_costs_fleet +
+                                                total_annual_other_direct_costs_fleet)
+    results["total_annual_cost_3dcp_fleet_contracting"] = total_annual_cost_3dcp_fleet_contracting
+    annual_profit_3dcp_fleet_contracting = annual_revenue_3dcp_fleet - total_annual_cost_3dcp_fleet_contracting
+    results["annual_profit_3dcp_fleet_contracting"] = annual_profit_3dcp_fleet_contracting
+    results["profit_per_3dcp_villa_fleet_avg"] = contracting_villa_details["profit_per_3dcp_villa"]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        roi = annual_profit_3dcp_fleet_contracting / total_capital_invested_fleet * 100
+    results["roi_3dcp_fleet_contracting"] = np.where(total_capital_invested_fleet > 0, roi, 0)
+
+    machine_lifespan_for_npv = fleet["max_machine_lifespan_years"].astype(np.int64)
+    results["npv_3dcp_fleet"] = _npv_flat_annuity(g["discount_rate_for_npv"], total_capital_invested_fleet,
+                                                  annual_profit_3dcp_fleet_contracting, machine_lifespan_for_npv)
+    results["irr_3dcp_fleet"], results["irr_3dcp_fleet_status"] = _irr_flat_annuity(
+        total_capital_invested_fleet, annual_profit_3dcp_fleet_contracting, machine_lifespan_for_npv)
+
+    traditional_villa_build_days = g["traditional_villa_build_months"] * 30
+    traditional_villa_build_days = np.where(traditional_villa_build_days == 0, 1, traditional_villa_build_days)
+    villas_per_year_traditional_setup = g["operating_days_per_year"] / traditional_villa_build_days
+    total_villas_per_year_traditional_equivalent_effort = villas_per_year_traditional_setup * num_machines
+    results["traditional_villa_build_days"] = traditional_villa_build_days
+    results["villas_per_year_per_traditional_setup"] = villas_per_year_traditional_setup
+    results["total_villas_per_year_traditional_equivalent_effort"] = total_villas_per_year_traditional_equivalent_effort
+    annual_revenue_traditional_equivalent = total_villas_per_year_traditional_equivalent_effort * g["market_selling_price_per_villa"]
+    results["annual_revenue_traditional_equivalent"] = annual_revenue_traditional_equivalent
+    total_cost_traditional_equivalent = total_villas_per_year_traditional_equivalent_effort * g["traditional_villa_cost"]
+    results["annual_profit_traditional_equivalent_effort"] = annual_revenue_traditional_equivalent - total_cost_traditional_equivalent
+
+    results["cost_saving_per_villa_3dcp_vs_traditional"] = g["traditional_villa_cost"] - contracting_villa_details["optimized_total_cost_per_3dcp_villa"]
+    results["time_saving_per_villa_3dcp_vs_traditional_days"] = traditional_villa_build_days - villa_total_cycle_days_3dcp
+
+    total_variable_costs_per_villa = variable_shell_material_cost_per_villa + variable_other_direct_costs_per_villa
+    contribution_margin_per_villa = g["market_selling_price_per_villa"] - total_variable_costs_per_villa
+    with np.errstate(invalid="ignore", divide="ignore"):
+        break_even = total_annual_fleet_machine_op_costs / contribution_margin_per_villa
+    results["break_even_villas_fleet"] = np.where(contribution_margin_per_villa > 0, break_even, np.nan)
+    return results
+
+
+# --- BATCH ENTRY POINT ---
+@profiled
+def evaluate_batch(scenarios, machines=None):
+    """Run the full "Run Simulation" pipeline for every scenario row.
+
+    ``scenarios`` is a DataFrame or a mapping of equal-length arrays/scalars holding
+    any of the ``DEFAULT_GLOBAL_PARAMS`` keys (missing keys take their defaults),
+    plus ``num_machines`` and, for homogeneous fleets, the machine parameter keys.
+    See ``fleet_columns`` for mixed fleets via ``machines``.
+    """
+    n = _num_rows(scenarios, machines)
+    g = global_columns(scenarios, n)
+    fleet = fleet_columns(scenarios, machines, n)
+    columns = {"avg_daily_op_cost_fleet": fleet["avg_daily_op_cost_fleet"]}
+    columns.update(leasing_model_for_machine(fleet["first_machine"], g))
+    villa_details = contracting_model_per_villa(fleet["avg_daily_op_cost_fleet"], g)
+    columns.update(villa_details)
+    columns.update(fleet_contracting_financials(fleet, g, villa_details))
+    index = scenarios.index if isinstance(scenarios, pd.DataFrame) else None
+    return pd.DataFrame({k: np.broadcast_to(v, (n,)) for k, v in columns.items()}, index=index)
+
+def evaluate_scenarios(scenarios):
+    """Batch-evaluate a list of scenario dicts as saved by the dashboard."""
+    scenario_frame, machine_frame = frames_from_scenarios(scenarios)
+    return evaluate_batch(scenario_frame, machine_frame)
@@ -0,0 +1,112 @@
+"""Content-hash keyed LRU cache for calculation results and dashboard builders.
+
+Keys are a hash of the function name and its normalized arguments: numbers
+hash by value (``700`` and ``700.0`` are the same key), dict keys are
+sorted, NumPy arrays hash by dtype, shape and raw bytes, and DataFrames
+hash by content. Cached objects are shared between
+callers, so treat return values as read-only.
+
+The cache lives at module level, so it survives Streamlit reruns (the
+script is re-executed, imported modules are not).
+"""
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from numbers import Number
+
+
+def _normalize(value):
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, Number):
+        return float(value)
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if hasattr(value, "to_numpy") and hasattr(value, "columns"):
+        import pandas as pd
+
+        return {"columns": [str(c) for c in value.columns], "rows": int(pd.util.hash_pandas_object(value, index=True).sum())}
+    if hasattr(value, "tobytes") and hasattr(value, "shape"):
+        # Hashing the buffer skips converting every element of a large fleet's columns to Python
+        digest = hashlib.blake2b(value.tobytes(), digest_size=16).hexdigest()
+        return {"dtype": str(value.dtype), "shape": list(value.shape), "bytes": digest}
+    if hasattr(value, "tolist"):
+        return _normalize(value.tolist())
+    raise TypeError(f"Cannot build a cache key from {type(value).__name__}")
+
+def content_hash(*args, **kwargs):
+    payload = json.dumps([_normalize(list(args)), _normalize(kwargs)], sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+DEFAULT_CACHE = LRUCache()
+_MISSING = object()
+
+
+def memoized(func=None, cache=None):
+    """Decorator caching ``func`` in ``cache`` (default ``DEFAULT_CACHE``) by argument content."""
+    if func is None:
+        return functools.partial(memoized, cache=cache)
+    target = cache if cache is not None else DEFAULT_CACHE
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = content_hash(name, *args, **kwargs)
+        result = target.get(key, _MISSING)
+        if result is _MISSING:
+            result = func(*args, **kwargs)
+            target.put(key, result)
+        return result
+
+    wrapper.cache = target
+    return wrapper
+
+def cache_stats(cache=None):
+    return (cache if cache is not None else DEFAULT_CACHE).stats()
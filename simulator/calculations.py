@@ -0,0 +1,183 @@
+import numpy_financial as npf # For IRR/NPV (pip install numpy-financial)
+
+from simulator.irr import IRR_ERROR, IRR_OK, IRR_STATUS_LABELS, irr as solve_irr
+from simulator.profiling import profiled
+
+# --- DEFAULT PARAMETERS ---
+DEFAULT_SINGLE_MACHINE_PARAMS = {
+    "id": 1,
+    "machine_cost": 1000000,
+    "machine_lifespan_years": 4,
+    "annual_maintenance_cost_pct": 0.10,
+    "engineer_monthly_salary": 7000,
+}
+
+DEFAULT_GLOBAL_PARAMS = {
+    "operating_days_per_year": 250,
+    "discount_rate_for_npv": 0.10, # 10% discount rate
+    # Leasing
+    "lessor_target_profit_margin": 0.40,
+    "machine_utilization_leasing_days_per_machine": 200,
+    # Villa & Material (3DCP)
+    "powder_cost_per_ton": 700,
+    "powder_tons_per_villa": 100,
+    "steel_cables_cost_per_villa": 25000,
+    "villa_printing_days_3dcp": 30,
+    "villa_additional_prep_finish_days_3dcp": 15,
+    "market_selling_price_per_villa": 2200000,
+    # Detailed 3DCP Villa Costs (Excluding 3DCP Shell Process itself)
+    "cost_foundation_per_villa_3dcp": 80000,
+    "cost_roofing_per_villa_3dcp": 100000,
+    "cost_mep_per_villa_3dcp": 120000,
+    "cost_finishes_per_villa_3dcp": 150000,
+    "cost_site_prep_approvals_design_3dcp": 50000,
+    # Traditional Model
+    "traditional_villa_build_months": 9,
+    "traditional_villa_cost": 1300000, # This is the all-in cost for comparison
+}
+
+# --- CALCULATION FUNCTIONS ---
+@profiled
+def calculate_machine_operational_costs(machine_params, global_params):
+    annual_capital_recovery = machine_params["machine_cost"] / machine_params["machine_lifespan_years"]
+    annual_maintenance = machine_params["machine_cost"] * machine_params["annual_maintenance_cost_pct"]
+    annual_engineer_cost = machine_params["engineer_monthly_salary"] * 12
+    total_annual_op_cost = annual_capital_recovery + annual_maintenance + annual_engineer_cost
+    daily_op_cost = total_annual_op_cost / global_params["operating_days_per_year"]
+    return total_annual_op_cost, daily_op_cost
+
+@profiled
+def calculate_leasing_model_for_machine(machine_params, global_params):
+    results = {}
+    total_annual_op_cost, daily_op_cost = calculate_machine_operational_costs(machine_params, global_params)
+    results["total_annual_lessor_cost_per_machine"] = total_annual_op_cost
+    results["daily_lessor_cost_basis_per_machine"] = daily_op_cost
+    profit_margin_divisor = 1 - global_params["lessor_target_profit_margin"]
+    if profit_margin_divisor <= 0: profit_margin_divisor = 0.001
+    recommended_daily_lease_price = daily_op_cost / profit_margin_divisor
+    results["recommended_daily_lease_price_per_machine"] = recommended_daily_lease_price
+    daily_profit_lessor = recommended_daily_lease_price - daily_op_cost
+    annual_profit_lessor = daily_profit_lessor * global_params["machine_utilization_leasing_days_per_machine"]
+    results["annual_profit_lessor_per_machine_at_utilization"] = annual_profit_lessor
+    lease_cost_for_villa = recommended_daily_lease_price * global_params["villa_printing_days_3dcp"]
+    powder_cost_for_villa_lease = global_params["powder_cost_per_ton"] * global_params["powder_tons_per_villa"]
+    results["contractor_3dcp_elements_cost_per_villa_via_leasing"] = (
+        lease_cost_for_villa + powder_cost_for_villa_lease + global_params["steel_cables_cost_per_villa"]
+    )
+    return results
+
+
+@profiled
+def calculate_contracting_model_per_villa(machine_daily_op_cost, global_params):
+    results = {}
+    # 3DCP Shell Process Costs (Machine part + materials for shell)
+    machine_op_cost_for_project_per_villa = machine_daily_op_cost * global_params["villa_printing_days_3dcp"]
+    results["machine_op_cost_for_project_per_villa"] = machine_op_cost_for_project_per_villa 
+
+    powder_cost_for_villa = global_params["powder_cost_per_ton"] * global_params["powder_tons_per_villa"]
+    steel_cables_cost = global_params["steel_cables_cost_per_villa"]
+    total_3dcp_shell_process_cost = machine_op_cost_for_project_per_villa + powder_cost_for_villa + steel_cables_cost
+    results["total_3dcp_shell_process_cost_per_villa"] = total_3dcp_shell_process_cost
+
+    # Other Direct Villa Costs (3DCP) - Foundation, Roofing, MEP, Finishes, Site Prep/Design
+    other_direct_costs_3dcp = (
+        global_params["cost_foundation_per_villa_3dcp"] +
+        global_params["cost_roofing_per_villa_3dcp"] +
+        global_params["cost_mep_per_villa_3dcp"] +
+        global_params["cost_finishes_per_villa_3dcp"] +
+        global_params["cost_site_prep_approvals_design_3dcp"]
+    )
+    results["other_direct_costs_per_villa_3dcp"] = other_direct_costs_3dcp
+    
+    optimized_total_cost_per_3dcp_villa = total_3dcp_shell_process_cost + other_direct_costs_3dcp
+    results["optimized_total_cost_per_3dcp_villa"] = optimized_total_cost_per_3dcp_villa
+    
+    profit_per_3dcp_villa = global_params["market_selling_price_per_villa"] - optimized_total_cost_per_3dcp_villa
+    results["profit_per_3dcp_villa"] = profit_per_3dcp_villa
+    return results
+
+@profiled
+def calculate_fleet_contracting_financials(num_machines, list_of_machine_params, global_params, contracting_villa_details):
+    results = {} 
+    
+    villa_total_cycle_days_3dcp = global_params["villa_printing_days_3dcp"] + global_params["villa_additional_prep_finish_days_3dcp"]
+    if villa_total_cycle_days_3dcp == 0: villa_total_cycle_days_3dcp = 1 
+    villas_per_year_per_active_3dcp_machine = global_params["operating_days_per_year"] / villa_total_cycle_days_3dcp
+    total_villas_per_year_3dcp_fleet = villas_per_year_per_active_3dcp_machine * num_machines
+    results["villa_total_cycle_days_3dcp"] = villa_total_cycle_days_3dcp
+    results["villas_per_year_per_active_3dcp_machine"] = villas_per_year_per_active_3dcp_machine
+    results["total_villas_per_year_3dcp_fleet"] = total_villas_per_year_3dcp_fleet
+
+    annual_revenue_3dcp_fleet = total_villas_per_year_3dcp_fleet * global_params["market_selling_price_per_villa"]
+    results["annual_revenue_3dcp_fleet"] = annual_revenue_3dcp_fleet
+    
+    total_capital_invested_fleet = sum(mp["machine_cost"] for mp in list_of_machine_params)
+    results["total_capital_invested_fleet"] = total_capital_invested_fleet
+
+    total_annual_fleet_machine_op_costs = sum(calculate_machine_operational_costs(mp, global_params)[0] for mp in list_of_machine_params)
+    
+    variable_shell_material_cost_per_villa = (global_params["powder_cost_per_ton"] * global_params["powder_tons_per_villa"] +
+                                             global_params["steel_cables_cost_per_villa"])
+    total_annual_variable_shell_material_costs_fleet = variable_shell_material_cost_per_villa * total_villas_per_year_3dcp_fleet
+
+    variable_other_direct_costs_per_villa = contracting_villa_details["other_direct_costs_per_villa_3dcp"]
+    total_annual_other_direct_costs_fleet = variable_other_direct_costs_per_villa * total_villas_per_year_3dcp_fleet
+    
+    total_annual_cost_3dcp_fleet_contracting = (total_annual_fleet_machine_op_costs + 
+                                                total_annual_variable_shell_material_costs_fleet + 
+                                                total_annual_other_direct_costs_fleet)
+    results["total_annual_cost_3dcp_fleet_contracting"] = total_annual_cost_3dcp_fleet_contracting
+    
+    annual_profit_3dcp_fleet_contracting = annual_revenue_3dcp_fleet - total_annual_cost_3dcp_fleet_contracting
+    results["annual_profit_3dcp_fleet_contracting"] = annual_profit_3dcp_fleet_contracting
+    results["profit_per_3dcp_villa_fleet_avg"] = contracting_villa_details.get("profit_per_3dcp_villa", 0) 
+    
+    if total_capital_invested_fleet > 0:
+        results["roi_3dcp_fleet_contracting"] = (annual_profit_3dcp_fleet_contracting / total_capital_invested_fleet) * 100
+    else:
+        results["roi_3dcp_fleet_contracting"] = 0
+
+    cash_flows = [-total_capital_invested_fleet] 
+    machine_lifespan_for_npv = int(max(mp["machine_lifespan_years"] for mp in list_of_machine_params) if list_of_machine_params else 1)
+
+    for _ in range(machine_lifespan_for_npv): 
+        cash_flows.append(annual_profit_3dcp_fleet_contracting)
+    
+    try:
+        results["npv_3dcp_fleet"] = npf.npv(global_params["discount_rate_for_npv"], cash_flows)
+        irr_rates, irr_status = solve_irr(cash_flows)
+        results["irr_3dcp_fleet"] = float(irr_rates[0]) * 100 if irr_status[0] == IRR_OK else IRR_STATUS_LABELS[irr_status[0]]
+        results["irr_3dcp_fleet_status"] = int(irr_status[0])
+    except Exception as e: 
+        results["npv_3dcp_fleet"] = "N/A"
+        results["irr_3dcp_fleet"] = IRR_STATUS_LABELS[IRR_ERROR]
+        results["irr_3dcp_fleet_status"] = IRR_ERROR
+
+    traditional_villa_build_days = global_params["traditional_villa_build_months"] * 30
+    if traditional_villa_build_days == 0: traditional_villa_build_days = 1
+    villas_per_year_traditional_setup = global_params["operating_days_per_year"] / traditional_villa_build_days
+    total_villas_per_year_traditional_equivalent_effort = villas_per_year_traditional_setup * num_machines
+    results["traditional_villa_build_days"] = traditional_villa_build_days
+    results["villas_per_year_per_traditional_setup"] = villas_per_year_traditional_setup
+    results["total_villas_per_year_traditional_equivalent_effort"] = total_villas_per_year_traditional_equivalent_effort
+    annual_revenue_traditional_equivalent = total_villas_per_year_traditional_equivalent_effort * global_params["market_selling_price_per_villa"]
+    results["annual_revenue_traditional_equivalent"] = annual_revenue_traditional_equivalent
+    total_cost_traditional_equivalent = total_villas_per_year_traditional_equivalent_effort * global_params["traditional_villa_cost"]
+    annual_profit_traditional_equivalent = annual_revenue_traditional_equivalent - total_cost_traditional_equivalent
+    results["annual_profit_traditional_equivalent_effort"] = annual_profit_traditional_equivalent
+    
+    cost_saving_per_villa_3dcp = global_params["traditional_villa_cost"] - contracting_villa_details.get("optimized_total_cost_per_3dcp_villa", global_params["traditional_villa_cost"])
+    time_saving_per_villa_3dcp_days = traditional_villa_build_days - villa_total_cycle_days_3dcp
+    results["cost_saving_per_villa_3dcp_vs_traditional"] = cost_saving_per_villa_3dcp
+    results["time_saving_per_villa_3dcp_vs_traditional_days"] = time_saving_per_villa_3dcp_days
+
+    fixed_costs_fleet = total_annual_fleet_machine_op_costs 
+    total_variable_costs_per_villa = variable_shell_material_cost_per_villa + variable_other_direct_costs_per_villa
+    contribution_margin_per_villa = (global_params["market_selling_price_per_villa"] - total_variable_costs_per_villa)
+                                     
+    if contribution_margin_per_villa > 0:
+        results["break_even_villas_fleet"] = fixed_costs_fleet / contribution_margin_per_villa
+    else:
+        results["break_even_villas_fleet"] = "N/A (CM <= 0)" 
+        
+    return results
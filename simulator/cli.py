@@ -0,0 +1,121 @@
+"""Command-line entry point: ``python -m simulator <command> ...``.
+
+Heavy modules are imported inside the command handlers so that start-up
+stays fast; nothing here imports streamlit or plotly.
+"""
+import argparse
+import sqlite3
+import sys
+
+
+def cmd_run(args):
+    from simulator.api import run_scenario_files, write_results
+    from simulator.profiling import Profiler
+
+    with Profiler() as profiler:
+        results = run_scenario_files(args.inputs)
+    if args.trace:
+        profiler.write_chrome_trace(args.trace)
+    if results.empty:
+        print("No scenario files found.", file=sys.stderr)
+        return 1
+    text = write_results(results, args.output, args.format)
+    if text is not None:
+        sys.stdout.write(text + ("\n" if not text.endswith("\n") else ""))
+    failed = results[results["error"].notna()]
+    for path, error in zip(failed["scenario_file"], failed["error"]):
+        print(f"error: {path}: {error}", file=sys.stderr)
+    return 1 if len(failed) else 0
+
+def cmd_sweep(args):
+    from simulator.sweep import combine_parts, run_sweep
+
+    summary = run_sweep(args.inputs, args.output_dir, args.workers, args.chunk_size, args.format, args.restart)
+    print(
+        f"{summary['num_files']:,} scenarios in {summary['num_chunks']} chunks "
+        f"({summary['resumed_chunks']} resumed, {summary['failed_files']} failed files), "
+        f"{summary['seconds']:.1f} s",
+        file=sys.stderr,
+    )
+    if args.combine:
+        from simulator.api import write_results
+
+        write_results(combine_parts(args.output_dir, args.format), args.combine)
+    return 0
+
+def cmd_store(args):
+    from simulator.scenario import find_scenario_files, load_scenario_file
+    from simulator.store import ScenarioStore
+
+    paths = find_scenario_files(args.inputs)
+    with ScenarioStore(args.db) as store:
+        counts = store.add_scenarios([load_scenario_file(path) for path in paths], names=paths)
+        total = len(store)
+    print(f"{counts['inserted']:,} stored, {counts['duplicates']:,} already in {args.db} ({total:,} total)", file=sys.stderr)
+    return 0
+
+def cmd_query(args):
+    from simulator.api import write_results
+    from simulator.store import ScenarioStore
+
+    with ScenarioStore(args.db) as store:
+        results = store.query(
+            min_irr=args.min_irr, max_irr=args.max_irr, min_npv=args.min_npv, min_roi=args.min_roi,
+            min_machines=args.min_machines, max_machines=args.max_machines, name_contains=args.name,
+            order_by=args.order_by, descending=not args.ascending, limit=args.limit,
+        )
+    text = write_results(results, args.output, args.format)
+    if text is not None:
+        sys.stdout.write(text + ("\n" if not text.endswith("\n") else ""))
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m simulator", description="Headless 3DCP business simulator.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Evaluate scenario JSON files saved from the dashboard.")
+    run.add_argument("inputs", nargs="+", help="Scenario files, directories of *.json files, or glob patterns.")
+    run.add_argument("-o", "--output", help="Output file; format follows the extension (default: JSON to stdout).")
+    run.add_argument("-f", "--format", choices=("json", "csv", "parquet"), help="Output format, overriding the extension.")
+    run.add_argument("--trace", help="Write a Chrome trace (JSON) of the calculation timings to this file.")
+    run.set_defaults(handler=cmd_run)
+
+    sweep = commands.add_parser("sweep", help="Evaluate many scenario files in parallel, resuming from finished chunks.")
+    sweep.add_argument("inputs", nargs="+", help="Scenario files, directories of *.json files, or glob patterns.")
+    sweep.add_argument("-d", "--output-dir", required=True, help="Directory for part files and the sweep manifest.")
+    sweep.add_argument("-w", "--workers", type=int, help="Worker processes (default: one per CPU).")
+    sweep.add_argument("-c", "--chunk-size", type=int, default=2000, help="Scenarios per chunk (default: 2000).")
+    sweep.add_argument("-f", "--format", choices=("csv", "parquet", "json"), default="csv", help="Part file format (default: csv).")
+    sweep.add_argument("--restart", action="store_true", help="Discard finished chunks and start over.")
+    sweep.add_argument("--combine", help="After the sweep, write all parts into this single file.")
+    sweep.set_defaults(handler=cmd_sweep)
+
+    store = commands.add_parser("store", help="Evaluate scenario files and save inputs and results in a scenario store.")
+    store.add_argument("inputs", nargs="+", help="Scenario files, directories of *.json files, or glob patterns.")
+    store.add_argument("--db", default="3dcp_scenarios.db", help="SQLite store file (default: 3dcp_scenarios.db).")
+    store.set_defaults(handler=cmd_store)
+
+    query = commands.add_parser("query", help="List stored scenarios matching metric filters.")
+    query.add_argument("--db", default="3dcp_scenarios.db", help="SQLite store file (default: 3dcp_scenarios.db).")
+    query.add_argument("--min-irr", type=float, help="Only scenarios with IRR above this (percent).")
+    query.add_argument("--max-irr", type=float, help="Only scenarios with IRR at most this (percent).")
+    query.add_argument("--min-npv", type=float, help="Only scenarios with fleet NPV above this (AED).")
+    query.add_argument("--min-roi", type=float, help="Only scenarios with annual ROI above this (percent).")
+    query.add_argument("--min-machines", type=int, help="Only fleets with at least this many machines.")
+    query.add_argument("--max-machines", type=int, help="Only fleets with at most this many machines.")
+    query.add_argument("--name", help="Only scenarios whose name contains this text.")
+    query.add_argument("--order-by", default="npv", help="Column to sort by (default: npv).")
+    query.add_argument("--ascending", action="store_true", help="Sort ascending instead of descending.")
+    query.add_argument("-n", "--limit", type=int, default=1000, help="Maximum rows (default: 1000).")
+    query.add_argument("-o", "--output", help="Output file; format follows the extension (default: JSON to stdout).")
+    query.add_argument("-f", "--format", choices=("json", "csv", "parquet"), help="Output format, overriding the extension.")
+    query.set_defaults(handler=cmd_query)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, ValueError, ImportError, sqlite3.Error) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
@@ -0,0 +1,123 @@
+"""Fleet financials over a full Cartesian grid of two or three parameters.
+
+Axes may be any global parameter, any machine parameter (set on every
+machine, the fleet's other parameters unchanged) or ``num_machines``
+(copies of the first machine). The grid is flattened from broadcast index
+arrays and evaluated in chunks through the batch engine; results come back
+reshaped to the grid. ``downsample_grid``
+block-averages a result so a dashboard never ships a million-cell figure.
+``iter_grid_chunks`` and ``assemble_grid`` expose the chunks, so a partly
+evaluated grid can be shown while the rest is still being computed.
+"""
+import warnings
+
+import numpy as np
+
+from simulator.batch import MACHINE_PARAM_KEYS, evaluate_batch
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+
+GRID_MAX_POINTS = 1_000_000
+GRID_METRICS = (
+    "npv_3dcp_fleet",
+    "roi_3dcp_fleet_contracting",
+    "irr_3dcp_fleet",
+    "annual_profit_3dcp_fleet_contracting",
+)
+
+
+def grid_parameters():
+    return list(DEFAULT_GLOBAL_PARAMS) + list(MACHINE_PARAM_KEYS) + ["num_machines"]
+
+def _homogeneous(machine_params_list):
+    first = machine_params_list[0]
+    return all(all(mp.get(k) == first.get(k) for k in MACHINE_PARAM_KEYS) for mp in machine_params_list[1:])
+
+def _chunk_inputs(global_params, machine_params_list, axes, flat_index, shape):
+    values = dict(zip(axes, (np.asarray(v, dtype=float)[i] for v, i in zip(axes.values(), np.unravel_index(flat_index, shape)))))
+    scenarios = {k: values.get(k, global_params.get(k, v)) for k, v in DEFAULT_GLOBAL_PARAMS.items()}
+    if "num_machines" in axes or _homogeneous(machine_params_list):
+        # One template machine per point, repeated num_machines times
+        template = machine_params_list[0]
+        scenarios["num_machines"] = values.get("num_machines", len(machine_params_list))
+        for key in MACHINE_PARAM_KEYS:
+            scenarios[key] = values.get(key, template.get(key, DEFAULT_SINGLE_MACHINE_PARAMS[key]))
+        return scenarios, None
+    size = len(flat_index)
+    # Every global gets one entry per point, matching the machines table below
+    scenarios = {k: np.broadcast_to(np.asarray(v, dtype=float), (size,)) for k, v in scenarios.items()}
+    scenarios["num_machines"] = np.full(size, len(machine_params_list))
+    machines = {"scenario": np.repeat(np.arange(size), len(machine_params_list))}
+    for key in MACHINE_PARAM_KEYS:
+        if key in values:
+            # A machine-parameter axis overrides that parameter on every machine; the rest keep their own values
+            machines[key] = np.repeat(values[key], len(machine_params_list))
+            continue
+        fleet_values = np.asarray([mp.get(key, DEFAULT_SINGLE_MACHINE_PARAMS[key]) for mp in machine_params_list], dtype=float)
+        machines[key] = np.tile(fleet_values, size)
+    return scenarios, machines
+
+def _grid_shape(machine_params_list, axes):
+    if not machine_params_list:
+        raise ValueError("Grid exploration needs at least one machine.")
+    unknown = [k for k in axes if k not in grid_parameters()]
+    if unknown:
+        raise ValueError(f"Unknown grid parameter(s): {', '.join(unknown)}")
+    shape = tuple(len(v) for v in axes.values())
+    num_points = int(np.prod(shape))
+    if num_points > GRID_MAX_POINTS:
+        raise ValueError(f"Grid has {num_points:,} points; the limit is {GRID_MAX_POINTS:,}.")
+    return shape
+
+def iter_grid_chunks(global_params, machine_params_list, axes, metrics=GRID_METRICS, chunk_size=200_000):
+    """Yield ``(flat_index, {metric: values})`` per evaluated chunk of the grid; the inputs are checked up front."""
+    shape = _grid_shape(machine_params_list, axes)
+    num_points = int(np.prod(shape))
+    return (_grid_chunk(global_params, machine_params_list, axes, np.arange(start, min(start + chunk_size, num_points)), shape, metrics)
+            for start in range(0, num_points, chunk_size))
+
+def _grid_chunk(global_params, machine_params_list, axes, flat_index, shape, metrics):
+    scenarios, machines = _chunk_inputs(global_params, machine_params_list, axes, flat_index, shape)
+    results = evaluate_batch(scenarios, machines)
+    return flat_index, {metric: results[metric].to_numpy(dtype=float) for metric in metrics}
+
+def assemble_grid(axes, chunks, metrics=GRID_METRICS):
+    """The ``evaluate_grid`` result from (some of) its chunks; points not yet evaluated are NaN."""
+    shape = tuple(len(v) for v in axes.values())
+    out = {metric: np.full(int(np.prod(shape)), np.nan) for metric in metrics}
+    for flat_index, values in chunks:
+        for metric in metrics:
+            out[metric][flat_index] = values[metric]
+    return {
+        "axes": {k: np.asarray(v, dtype=float) for k, v in axes.items()},
+        "metrics": {metric: values.reshape(shape) for metric, values in out.items()},
+    }
+
+def evaluate_grid(global_params, machine_params_list, axes, metrics=GRID_METRICS, chunk_size=200_000):
+    """Evaluate ``metrics`` on the grid spanned by ``axes`` (an ordered ``{parameter: values}`` dict).
+
+    Returns ``{"axes": {parameter: values}, "metrics": {metric: ndarray shaped like the grid}}``.
+    """
+    return assemble_grid(axes, iter_grid_chunks(global_params, machine_params_list, axes, metrics, chunk_size), metrics)
+
+def _block_mean(values, factor, axis):
+    if factor <= 1:
+        return values
+    length = values.shape[axis]
+    pad = (-length) % factor
+    if pad:
+        pad_width = [(0, 0)] * values.ndim
+        pad_width[axis] = (0, pad)
+        values = np.pad(values, pad_width, constant_values=np.nan)
+    new_shape = values.shape[:axis] + (values.shape[axis] // factor, factor) + values.shape[axis + 1:]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN blocks stay NaN
+        return np.nanmean(values.reshape(new_shape), axis=axis + 1)
+
+def downsample_grid(axis_values, values, max_cells_per_axis=200):
+    """Block-average ``values`` (and the matching axis coordinates) to at most ``max_cells_per_axis`` per axis."""
+    axis_values = list(axis_values)
+    for axis, coords in enumerate(axis_values):
+        factor = -(-len(coords) // max_cells_per_axis)
+        values = _block_mean(values, factor, axis)
+        axis_values[axis] = _block_mean(np.asarray(coords, dtype=float), factor, 0)
+    return axis_values, values
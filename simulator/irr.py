@@ -0,0 +1,192 @@
+"""Vectorized NPV/IRR over many cash-flow vectors at once.
+
+Cash flows are a 2D array, one row per vector and one column per period
+(period 0 first). Rows of different length can be right-padded with zeros:
+trailing zeros change neither the NPV nor the IRR.
+
+The IRR is solved on the NPV polynomial in the discount factor
+``x = 1 / (1 + r)``. Each row is first bracketed by stepping outward from
+``r = 0`` in powers of two, then refined with Newton steps that fall back to
+bisection whenever a step would leave the bracket. Rows without an IRR get
+NaN plus one of the status codes below instead of raising.
+
+A single vector (the dashboard's scalar path) is solved by ``_irr_one``, the
+same steps on Python floats, which gives bit-identical rates without the
+per-step NumPy overhead.
+"""
+import math
+
+import numpy as np
+
+from simulator.profiling import profiled
+
+IRR_OK = 0
+IRR_NO_SIGN_CHANGE = 1  # all non-zero flows share one sign, so NPV never crosses zero
+IRR_TOO_FEW_FLOWS = 2
+IRR_NOT_BRACKETED = 3  # no root for -1 + 2**-max_power < r < 2**max_power - 1
+IRR_NOT_CONVERGED = 4
+IRR_ERROR = 5  # set by callers whose NPV/IRR calculation raised
+
+IRR_STATUS_LABELS = {
+    IRR_OK: "OK",
+    IRR_NO_SIGN_CHANGE: "N/A (Check Cash Flows)",
+    IRR_TOO_FEW_FLOWS: "N/A (Check Cash Flows)",
+    IRR_NOT_BRACKETED: "N/A (No IRR in Range)",
+    IRR_NOT_CONVERGED: "N/A (Not Converged)",
+    IRR_ERROR: "N/A (Error)",
+}
+
+
+def npv(rates, cash_flows):
+    """Row-wise ``npf.npv``: same arithmetic, one rate per row (or a scalar)."""
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=float))
+    rates = np.broadcast_to(np.asarray(rates, dtype=float), (cash_flows.shape[0],))
+    return (cash_flows / (1 + rates[:, None]) ** np.arange(cash_flows.shape[1])).sum(axis=1)
+
+def _polyval(cash_flows, x):
+    # Horner from the last period down; returns NPV(x) and dNPV/dx
+    value = np.zeros(len(x))
+    slope = np.zeros(len(x))
+    for t in range(cash_flows.shape[1] - 1, -1, -1):
+        slope = slope * x + value
+        value = value * x + cash_flows[:, t]
+    return value, slope
+
+def _sign(value):
+    # np.sign on a Python float, NaN included
+    return value if value != value else (value > 0) - (value < 0)
+
+def _polyval_one(flows, x):
+    value = slope = 0.0
+    for cash_flow in reversed(flows):
+        slope = slope * x + value
+        value = value * x + cash_flow
+    return value, slope
+
+def _irr_one(flows, max_power, tol, maxiter):
+    # irr() for one vector, step for step, so the results match the vectorized path exactly
+    if len(flows) < 2:
+        return math.nan, IRR_TOO_FEW_FLOWS
+    if not (any(f > 0 for f in flows) and any(f < 0 for f in flows)):
+        return math.nan, IRR_NO_SIGN_CHANGE
+    f_one = _polyval_one(flows, 1.0)[0]
+    if f_one == 0:
+        a = b = 1.0
+    else:
+        a = None
+        f_up = f_down = f_one
+        for k in range(1, max_power + 1):
+            x_down = 2.0 ** -k
+            x_up = 2.0 ** k
+            f_down_next = _polyval_one(flows, x_down)[0]
+            f_up_next = _polyval_one(flows, x_up)[0]
+            if _sign(f_down_next) != _sign(f_down):
+                a, b = x_down, 2 * x_down
+                break
+            if _sign(f_up_next) != _sign(f_up):
+                a, b = x_up / 2, x_up
+                break
+            f_down, f_up = f_down_next, f_up_next
+        if a is None:
+            return math.nan, IRR_NOT_BRACKETED
+
+    f_a = _polyval_one(flows, a)[0]
+    x = a if a == b else (a + b) / 2
+    done = a == b
+    for _ in range(maxiter):
+        if done:
+            break
+        f, df = _polyval_one(flows, x)
+        if _sign(f) == _sign(f_a):
+            a, f_a = x, f
+        else:
+            b = x
+        step = f / df if df != 0 else math.copysign(math.inf, f) if f != 0 else math.nan
+        x_newton = x - step
+        small_step = abs(step) <= tol * abs(x)
+        x_next = x_newton if small_step or min(a, b) < x_newton < max(a, b) else (a + b) / 2
+        done = f == 0 or small_step or abs(x_next - x) <= tol * abs(x) or abs(b - a) <= tol * abs(x)
+        if f != 0:
+            x = x_next
+    if not done:
+        return math.nan, IRR_NOT_CONVERGED
+    return 1 / x - 1, IRR_OK
+
+@profiled
+def irr(cash_flows, max_power=40, tol=1e-15, maxiter=100):
+    """Return ``(rates, status)`` for each row of ``cash_flows``; rates are fractions, not percent."""
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=float))
+    n = cash_flows.shape[0]
+    if n == 1:
+        rate, code = _irr_one(cash_flows[0].tolist(), max_power, tol, maxiter)
+        return np.array([rate]), np.array([code], dtype=np.int8)
+    rates = np.full(n, np.nan)
+    status = np.full(n, IRR_OK, dtype=np.int8)
+    if cash_flows.shape[1] < 2:
+        status[:] = IRR_TOO_FEW_FLOWS
+        return rates, status
+    has_positive = (cash_flows > 0).any(axis=1)
+    has_negative = (cash_flows < 0).any(axis=1)
+    status[~(has_positive & has_negative)] = IRR_NO_SIGN_CHANGE
+
+    # Bracket: walk x = 2**k and x = 2**-k outward from x = 1 (r = 0)
+    rows = np.flatnonzero(status == IRR_OK)
+    lo = np.full(n, np.nan)
+    hi = np.full(n, np.nan)
+    f_one, _ = _polyval(cash_flows[rows], np.ones(len(rows)))
+    root_at_one = f_one == 0
+    lo[rows[root_at_one]] = hi[rows[root_at_one]] = 1.0
+    rows = rows[~root_at_one]
+    f_up = f_down = f_one[~root_at_one]
+    for k in range(1, max_power + 1):
+        if not len(rows):
+            break
+        flows = cash_flows[rows]
+        x_down = np.full(len(rows), 2.0 ** -k)
+        x_up = np.full(len(rows), 2.0 ** k)
+        f_down_next, _ = _polyval(flows, x_down)
+        f_up_next, _ = _polyval(flows, x_up)
+        # Positive rates (x < 1) are tried first at each step
+        found_down = np.sign(f_down_next) != np.sign(f_down)
+        found_up = ~found_down & (np.sign(f_up_next) != np.sign(f_up))
+        lo[rows[found_down]] = x_down[found_down]
+        hi[rows[found_down]] = 2 * x_down[found_down]
+        lo[rows[found_up]] = x_up[found_up] / 2
+        hi[rows[found_up]] = x_up[found_up]
+        keep = ~(found_down | found_up)
+        rows, f_down, f_up = rows[keep], f_down_next[keep], f_up_next[keep]
+    status[rows] = IRR_NOT_BRACKETED
+
+    # Refine: safeguarded Newton inside [lo, hi]
+    rows = np.flatnonzero(status == IRR_OK)
+    flows = cash_flows[rows]
+    a, b = lo[rows], hi[rows]
+    f_a, _ = _polyval(flows, a)
+    x = (a + b) / 2
+    done = a == b
+    x[done] = a[done]
+    for _ in range(maxiter):
+        active = np.flatnonzero(~done)
+        if not len(active):
+            break
+        xa, fa_act = x[active], f_a[active]
+        f, df = _polyval(flows[active], xa)
+        same_side = np.sign(f) == np.sign(fa_act)
+        a_act = np.where(same_side, xa, a[active])
+        b_act = np.where(same_side, b[active], xa)
+        f_a[active] = np.where(same_side, f, fa_act)
+        a[active], b[active] = a_act, b_act
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = f / df
+        x_newton = xa - step
+        # A Newton step within tolerance is taken and ends the search, even if it lands on the bracket's edge
+        small_step = np.abs(step) <= tol * np.abs(xa)
+        inside = (x_newton > np.minimum(a_act, b_act)) & (x_newton < np.maximum(a_act, b_act))
+        x_next = np.where(inside | small_step, x_newton, (a_act + b_act) / 2)
+        converged = (f == 0) | small_step | (np.abs(x_next - xa) <= tol * np.abs(xa)) | (np.abs(b_act - a_act) <= tol * np.abs(xa))
+        x[active] = np.where(f == 0, xa, x_next)
+        done[active] = converged
+    status[rows[~done]] = IRR_NOT_CONVERGED
+    solved = rows[done]
+    rates[solved] = 1 / x[done] - 1
+    return rates, status
@@ -0,0 +1,136 @@
+"""Time-stepped fleet cash-flow simulation with per-machine lifecycles.
+
+Unlike the flat annuity in ``calculate_fleet_contracting_financials``, every
+machine is purchased, depreciated, maintained and retired on its own
+schedule, and is optionally replaced at an escalated price. Machine state is
+kept in NumPy arrays (one slot per machine) and advanced one step at a time.
+
+Ledger row 0 is the initial purchase of the fleet. Row ``p`` holds the
+operating flows of period ``p`` (booked at its end) together with the
+purchase of replacements that start working in period ``p + 1``. Machine
+capital counts once, as a purchase; depreciation is reported for the
+accounting profit but is not a cash flow.
+"""
+import numpy as np
+import pandas as pd
+
+from simulator.batch import MACHINE_PARAM_KEYS
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+from simulator.irr import IRR_OK, irr
+
+LEDGER_COLUMNS = (
+    "period",
+    "year",
+    "machines_active",
+    "machines_purchased",
+    "machines_retired",
+    "villas_completed",
+    "revenue",
+    "shell_material_costs",
+    "other_direct_costs",
+    "maintenance_costs",
+    "engineer_costs",
+    "operating_cash_flow",
+    "capital_expenditure",
+    "net_cash_flow",
+    "cumulative_cash_flow",
+    "depreciation",
+    "accounting_profit",
+    "fleet_book_value",
+    "discounted_cash_flow",
+)
+
+
+def _machine_arrays(machine_params_list):
+    return {
+        k: np.array([mp.get(k, DEFAULT_SINGLE_MACHINE_PARAMS[k]) for mp in machine_params_list], dtype=float)
+        for k in MACHINE_PARAM_KEYS
+    }
+
+def simulate_fleet_ledger(global_params, machine_params_list, horizon_years=20, steps_per_year=1,
+                          cost_escalation_rate=0.0, price_escalation_rate=0.0, replace_retired=True):
+    """Return the cash-flow ledger as a DataFrame with one row per period (see ``LEDGER_COLUMNS``)."""
+    g = {k: global_params.get(k, v) for k, v in DEFAULT_GLOBAL_PARAMS.items()}
+    m = _machine_arrays(machine_params_list)
+    num_machines = len(machine_params_list)
+    num_steps = int(round(horizon_years * steps_per_year))
+
+    villa_total_cycle_days_3dcp = g["villa_printing_days_3dcp"] + g["villa_additional_prep_finish_days_3dcp"]
+    if villa_total_cycle_days_3dcp == 0: villa_total_cycle_days_3dcp = 1
+    villas_per_step_per_machine = g["operating_days_per_year"] / villa_total_cycle_days_3dcp / steps_per_year
+    shell_material_cost_per_villa = g["powder_cost_per_ton"] * g["powder_tons_per_villa"] + g["steel_cables_cost_per_villa"]
+    other_direct_cost_per_villa = (
+        g["cost_foundation_per_villa_3dcp"] + g["cost_roofing_per_villa_3dcp"] + g["cost_mep_per_villa_3dcp"] +
+        g["cost_finishes_per_villa_3dcp"] + g["cost_site_prep_approvals_design_3dcp"]
+    )
+
+    # Per-machine state
+    lifespan_steps = np.maximum(np.round(m["machine_lifespan_years"] * steps_per_year), 1).astype(np.int64)
+    purchase_price = m["machine_cost"].copy()
+    book_value = purchase_price.copy()
+    age_steps = np.zeros(num_machines, dtype=np.int64)
+    active = np.ones(num_machines, dtype=bool)
+
+    ledger = {k: np.zeros(num_steps + 1) for k in LEDGER_COLUMNS}
+    ledger["period"] = np.arange(num_steps + 1)
+    ledger["year"] = ledger["period"] / steps_per_year
+    ledger["machines_purchased"][0] = num_machines
+    ledger["capital_expenditure"][0] = purchase_price.sum()
+    ledger["fleet_book_value"][0] = book_value.sum()
+
+    for p in range(1, num_steps + 1):
+        cost_index = (1 + cost_escalation_rate) ** ((p - 1) / steps_per_year)
+        price_index = (1 + price_escalation_rate) ** ((p - 1) / steps_per_year)
+        n_active = int(active.sum())
+        villas = villas_per_step_per_machine * n_active
+        ledger["machines_active"][p] = n_active
+        ledger["villas_completed"][p] = villas
+        ledger["revenue"][p] = villas * g["market_selling_price_per_villa"] * price_index
+        ledger["shell_material_costs"][p] = villas * shell_material_cost_per_villa * cost_index
+        ledger["other_direct_costs"][p] = villas * other_direct_cost_per_villa * cost_index
+        ledger["maintenance_costs"][p] = (purchase_price * m["annual_maintenance_cost_pct"])[active].sum() / steps_per_year
+        ledger["engineer_costs"][p] = m["engineer_monthly_salary"][active].sum() * 12 / steps_per_year * cost_index
+
+        step_depreciation = np.where(active, np.minimum(purchase_price / lifespan_steps, book_value), 0.0)
+        book_value -= step_depreciation
+        ledger["depreciation"][p] = step_depreciation.sum()
+
+        age_steps[active] += 1
+        retiring = active & (age_steps >= lifespan_steps)
+        ledger["machines_retired"][p] = retiring.sum()
+        active &= ~retiring
+        book_value[retiring] = 0.0
+        if replace_retired and p < num_steps and retiring.any():
+            # Replacements are bought at today's prices and start next period
+            replacement_index = (1 + cost_escalation_rate) ** (p / steps_per_year)
+            purchase_price[retiring] = m["machine_cost"][retiring] * replacement_index
+            book_value[retiring] = purchase_price[retiring]
+            age_steps[retiring] = 0
+            active |= retiring
+            ledger["machines_purchased"][p] = retiring.sum()
+            ledger["capital_expenditure"][p] = purchase_price[retiring].sum()
+        ledger["fleet_book_value"][p] = book_value.sum()
+
+    ledger["operating_cash_flow"] = ledger["revenue"] - (
+        ledger["shell_material_costs"] + ledger["other_direct_costs"] +
+        ledger["maintenance_costs"] + ledger["engineer_costs"]
+    )
+    ledger["net_cash_flow"] = ledger["operating_cash_flow"] - ledger["capital_expenditure"]
+    ledger["cumulative_cash_flow"] = np.cumsum(ledger["net_cash_flow"])
+    ledger["accounting_profit"] = ledger["operating_cash_flow"] - ledger["depreciation"]
+    ledger["discounted_cash_flow"] = ledger["net_cash_flow"] / (1 + g["discount_rate_for_npv"]) ** ledger["year"]
+    return pd.DataFrame(ledger, columns=list(LEDGER_COLUMNS))
+
+def summarize_ledger(ledger, steps_per_year=1):
+    """NPV, annualized IRR and payback year of a ledger from ``simulate_fleet_ledger``."""
+    periodic_rate, status = irr(ledger["net_cash_flow"].to_numpy())
+    summary = {
+        "npv": ledger["discounted_cash_flow"].sum(),
+        "irr": ((1 + periodic_rate[0]) ** steps_per_year - 1) * 100 if status[0] == IRR_OK else np.nan,
+        "irr_status": int(status[0]),
+        "total_capital_expenditure": ledger["capital_expenditure"].sum(),
+        "total_villas_completed": ledger["villas_completed"].sum(),
+    }
+    paid_back = np.flatnonzero(ledger["cumulative_cash_flow"].to_numpy() >= 0)
+    summary["payback_year"] = ledger["year"].iloc[paid_back[0]] if len(paid_back) else np.nan
+    return summary
@@ -0,0 +1,109 @@
+"""Monte Carlo risk simulation over distribution-valued parameters.
+
+Any entry of the global params or of a machine's params may be replaced by a
+distribution spec, e.g.::
+
+    {"dist": "triangular", "low": 600, "mode": 700, "high": 900}
+    {"dist": "normal", "mean": 2200000, "std": 150000}
+    {"dist": "discrete", "values": [25, 30, 35], "probs": [0.2, 0.5, 0.3]}
+
+Draws are taken in chunks with one child seed per chunk, so a run is fully
+reproducible for a given ``seed`` and ``chunk_size``. ``iter_monte_carlo``
+yields those chunks as they are evaluated, for streaming partial results.
+"""
+import numpy as np
+import pandas as pd
+
+from simulator.batch import MACHINE_PARAM_KEYS, evaluate_batch
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+
+RISK_METRICS = (
+    "npv_3dcp_fleet",
+    "irr_3dcp_fleet",
+    "roi_3dcp_fleet_contracting",
+    "break_even_villas_fleet",
+)
+
+DISTRIBUTIONS = ("normal", "lognormal", "triangular", "uniform", "discrete")
+
+# Lower bounds applied to drawn values, on top of a spec's own "min"; a lifespan
+# below one year has no profit years and divides the capital recovery by ~0
+DRAW_MINIMUMS = {"machine_lifespan_years": 1}
+
+
+def is_distribution(value):
+    return isinstance(value, dict) and "dist" in value
+
+def sample_distribution(spec, size, rng):
+    kind = spec["dist"]
+    if kind == "normal":
+        draws = rng.normal(spec["mean"], spec["std"], size)
+    elif kind == "lognormal":
+        draws = rng.lognormal(spec["mean"], spec["sigma"], size)
+    elif kind == "triangular":
+        draws = rng.triangular(spec["low"], spec["mode"], spec["high"], size)
+    elif kind == "uniform":
+        draws = rng.uniform(spec["low"], spec["high"], size)
+    elif kind == "discrete":
+        probs = spec.get("probs")
+        draws = rng.choice(np.asarray(spec["values"], dtype=float), size, p=probs)
+    else:
+        raise ValueError(f"Unknown distribution '{kind}', expected one of {', '.join(DISTRIBUTIONS)}")
+    # Optional truncation, e.g. to keep a normal price draw positive
+    if "min" in spec or "max" in spec:
+        draws = np.clip(draws, spec.get("min"), spec.get("max"))
+    return draws
+
+def _point_or_draw(key, value, size, rng):
+    if not is_distribution(value):
+        return np.full(size, value, dtype=float)
+    draws = sample_distribution(value, size, rng)
+    return np.maximum(draws, DRAW_MINIMUMS[key]) if key in DRAW_MINIMUMS else draws
+
+def sample_inputs(global_params, machine_params_list, size, rng):
+    """Draw ``size`` scenarios; returns (scenarios, machines) ready for ``evaluate_batch``.
+
+    Every column has ``size`` entries, whether or not it is drawn.
+    """
+    scenarios = {}
+    for key, default in DEFAULT_GLOBAL_PARAMS.items():
+        scenarios[key] = _point_or_draw(key, global_params.get(key, default), size, rng)
+    scenarios["num_machines"] = np.full(size, len(machine_params_list))
+    machines = {"scenario": np.tile(np.arange(size), len(machine_params_list))}
+    for key in MACHINE_PARAM_KEYS:
+        machines[key] = np.concatenate([
+            _point_or_draw(key, mp.get(key, DEFAULT_SINGLE_MACHINE_PARAMS[key]), size, rng) for mp in machine_params_list
+        ])
+    return scenarios, machines
+
+def iter_monte_carlo(global_params, machine_params_list, n_samples=10000, seed=None, chunk_size=100000, metrics=RISK_METRICS):
+    """Yield the draws of ``run_monte_carlo`` one chunk (a DataFrame of at most ``chunk_size`` rows) at a time."""
+    if not machine_params_list:
+        raise ValueError("Monte Carlo simulation needs at least one machine.")
+    n_chunks = -(-n_samples // chunk_size)
+    child_seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    return (_monte_carlo_chunk(global_params, machine_params_list, min(chunk_size, n_samples - chunk * chunk_size), child_seed, metrics)
+            for chunk, child_seed in enumerate(child_seeds))
+
+def _monte_carlo_chunk(global_params, machine_params_list, size, child_seed, metrics):
+    rng = np.random.default_rng(child_seed)
+    scenarios, machines = sample_inputs(global_params, machine_params_list, size, rng)
+    return evaluate_batch(scenarios, machines)[list(metrics)]
+
+def run_monte_carlo(global_params, machine_params_list, n_samples=10000, seed=None, chunk_size=100000, metrics=RISK_METRICS):
+    """Evaluate ``n_samples`` draws; returns a DataFrame with one column per metric."""
+    return pd.concat(iter_monte_carlo(global_params, machine_params_list, n_samples, seed, chunk_size, metrics), ignore_index=True)
+
+def summarize_distribution(samples, percentiles=(10, 50, 90)):
+    """P10/P50/P90-style table per metric; NaN draws (the scalar "N/A" cases) are counted, not ranked."""
+    rows = {}
+    for metric in samples.columns:
+        values = samples[metric].to_numpy(dtype=float)
+        valid = values[~np.isnan(values)]
+        row = {"mean": valid.mean() if len(valid) else np.nan, "std": valid.std() if len(valid) else np.nan}
+        for p, value in zip(percentiles, np.percentile(valid, percentiles) if len(valid) else [np.nan] * len(percentiles)):
+            row[f"P{p}"] = value
+        row["prob_negative"] = (valid < 0).mean() if len(valid) else np.nan
+        row["share_na"] = 1 - len(valid) / len(values) if len(values) else np.nan
+        rows[metric] = row
+    return pd.DataFrame.from_dict(rows, orient="index")
@@ -0,0 +1,171 @@
+"""Fleet size and mix optimizer under a capital budget and a demand cap.
+
+A fleet is a count per machine type. Its totals (capital, and the machines
+and machine operating cost active in each year) are kept as running sums,
+so a move (add one machine, remove one, or swap one type for another) is
+scored from the current totals plus that type's deltas instead of
+re-evaluating the fleet. All candidate moves of a step are scored in one
+vectorized call, and a steepest-ascent local search is run from several
+starting fleets.
+
+Economics follow ``calculate_fleet_contracting_financials``, except that
+each machine earns and costs only over its own lifespan (no replacement)
+instead of the whole fleet being an annuity over the longest lifespan;
+the villas sold each year are capped at ``max_villas_per_year``. For a
+fleet whose machines share one lifespan the two agree.
+"""
+import math
+
+import numpy as np
+
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS, calculate_machine_operational_costs
+from simulator.irr import irr
+
+OBJECTIVES = ("npv", "irr")
+
+
+def machine_types_from_fleet(machine_params_list):
+    """Distinct machine configurations of a fleet, in first-seen order."""
+    types, seen = [], set()
+    for mp in machine_params_list:
+        key = tuple(mp.get(k, DEFAULT_SINGLE_MACHINE_PARAMS[k]) for k in DEFAULT_SINGLE_MACHINE_PARAMS if k != "id")
+        if key not in seen:
+            seen.add(key)
+            types.append({k: mp.get(k, v) for k, v in DEFAULT_SINGLE_MACHINE_PARAMS.items()})
+    return types
+
+
+class FleetModel:
+    """Per-type constants and the vectorized objective over candidate fleet totals."""
+
+    def __init__(self, global_params, machine_types, max_villas_per_year=None):
+        g = {k: global_params.get(k, v) for k, v in DEFAULT_GLOBAL_PARAMS.items()}
+        self.cost = np.array([mt["machine_cost"] for mt in machine_types], dtype=float)
+        self.op_cost = np.array([calculate_machine_operational_costs(mt, g)[0] for mt in machine_types])
+        self.lifespan = np.array([int(mt["machine_lifespan_years"]) for mt in machine_types])
+        villa_total_cycle_days_3dcp = g["villa_printing_days_3dcp"] + g["villa_additional_prep_finish_days_3dcp"]
+        if villa_total_cycle_days_3dcp == 0: villa_total_cycle_days_3dcp = 1
+        self.villas_per_machine = g["operating_days_per_year"] / villa_total_cycle_days_3dcp
+        self.max_villas_per_year = math.inf if max_villas_per_year is None else max_villas_per_year
+        variable_cost_per_villa = (
+            g["powder_cost_per_ton"] * g["powder_tons_per_villa"] + g["steel_cables_cost_per_villa"] +
+            g["cost_foundation_per_villa_3dcp"] + g["cost_roofing_per_villa_3dcp"] + g["cost_mep_per_villa_3dcp"] +
+            g["cost_finishes_per_villa_3dcp"] + g["cost_site_prep_approvals_design_3dcp"]
+        )
+        self.margin_per_villa = g["market_selling_price_per_villa"] - variable_cost_per_villa
+        # Year t (column t - 1) of the horizon counts a machine only while t <= its lifespan
+        years = np.arange(1, max(int(self.lifespan.max()), 1) + 1)
+        self.active = (years[None, :] <= self.lifespan[:, None]).astype(float)
+        self.active_op_cost = self.active * self.op_cost[:, None]
+        self.discount = (1 + g["discount_rate_for_npv"]) ** -years
+
+    def totals(self, counts):
+        """``(capital, machines per year, operating cost per year)`` of a fleet given as counts per type."""
+        counts = np.asarray(counts, dtype=float)
+        return counts @ self.cost, counts @ self.active, counts @ self.active_op_cost
+
+    def villas(self, machines_per_year):
+        return np.minimum(machines_per_year * self.villas_per_machine, self.max_villas_per_year)
+
+    def annual_profit(self, machines_per_year, op_cost_per_year):
+        return self.villas(machines_per_year) * self.margin_per_villa - op_cost_per_year
+
+    def objective(self, objective, capital, machines_per_year, op_cost_per_year):
+        """Objective per candidate: ``capital`` has one entry per candidate, the per-year totals one row each."""
+        profit = self.annual_profit(machines_per_year, op_cost_per_year)
+        if objective == "npv":
+            return -capital + profit @ self.discount
+        cash_flows = np.column_stack([-capital, profit])
+        rates, status = irr(cash_flows)
+        return np.where(status == 0, rates * 100, -np.inf)
+
+
+def optimize_fleet(global_params, machine_types, objective="npv", capital_budget=None, max_villas_per_year=None,
+                   max_machines=500, min_machines=1, max_steps=10000):
+    """Search machine counts per type that maximize ``objective`` ("npv" or "irr")."""
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {', '.join(OBJECTIVES)}")
+    if not machine_types:
+        raise ValueError("The optimizer needs at least one machine type.")
+    model = FleetModel(global_params, machine_types, max_villas_per_year)
+    budget = math.inf if capital_budget is None else capital_budget
+    num_types = len(machine_types)
+    evaluations = 0
+
+    def feasible(capital, num_machines):
+        return (capital <= budget) & (num_machines >= min_machines) & (num_machines <= max_machines)
+
+    # Starting fleets: each single type sized to demand (or budget), plus one machine of each type
+    if math.isfinite(model.max_villas_per_year) and model.villas_per_machine > 0:
+        target = math.ceil(model.max_villas_per_year / model.villas_per_machine)
+    else:
+        target = max_machines
+    starts = []
+    for k in range(num_types):
+        affordable = int(budget // model.cost[k]) if math.isfinite(budget) and model.cost[k] > 0 else max_machines
+        for size in {max(min(target, affordable, max_machines), min_machines), min_machines}:
+            counts = np.zeros(num_types, dtype=np.int64)
+            counts[k] = size
+            starts.append(counts)
+
+    best = None
+    for counts in starts:
+        capital, machines, op_cost = model.totals(counts)
+        num_machines = int(counts.sum())
+        if not feasible(capital, num_machines):
+            continue
+        value = model.objective(objective, np.array([capital]), machines[None, :], op_cost[None, :])[0]
+        evaluations += 1
+        for _ in range(max_steps):
+            present = counts > 0
+            # Candidate moves: add k, remove k, swap k -> j (flattened k * num_types + j)
+            swap_machines = (model.active[None, :, :] - model.active[:, None, :]).reshape(-1, machines.size)
+            swap_op = (model.active_op_cost[None, :, :] - model.active_op_cost[:, None, :]).reshape(-1, op_cost.size)
+            cand_capital = capital + np.r_[model.cost, -model.cost, (model.cost[None, :] - model.cost[:, None]).ravel()]
+            cand_machines = machines + np.r_[model.active, -model.active, swap_machines]
+            cand_op = op_cost + np.r_[model.active_op_cost, -model.active_op_cost, swap_op]
+            cand_n = np.r_[np.full(num_types, num_machines + 1), np.full(num_types, num_machines - 1), np.full(num_types * num_types, num_machines)]
+            allowed = np.r_[np.ones(num_types, bool), present, (present[:, None] & ~np.eye(num_types, dtype=bool)).ravel()]
+            allowed &= feasible(cand_capital, cand_n)
+            if not allowed.any():
+                break
+            idx = np.flatnonzero(allowed)
+            values = model.objective(objective, cand_capital[idx], cand_machines[idx], cand_op[idx])
+            evaluations += len(idx)
+            pick = int(np.argmax(values))
+            if not values[pick] > value + 1e-9 * abs(value):
+                break
+            move = idx[pick]
+            if move < num_types:
+                counts[move] += 1
+            elif move < 2 * num_types:
+                counts[move - num_types] -= 1
+            else:
+                k, j = divmod(move - 2 * num_types, num_types)
+                counts[k] -= 1
+                counts[j] += 1
+            capital, machines, op_cost = cand_capital[move], cand_machines[move], cand_op[move]
+            num_machines, value = int(cand_n[move]), values[pick]
+        if best is None or value > best["objective_value"]:
+            best = {"counts": counts.copy(), "objective_value": value}
+
+    if best is None:
+        raise ValueError("No fleet satisfies the capital budget and machine limits.")
+    counts = best["counts"]
+    capital, machines, op_cost = model.totals(counts)
+    fleet = []
+    for k, count in enumerate(counts):
+        for _ in range(int(count)):
+            fleet.append(dict(machine_types[k], id=len(fleet) + 1))
+    return {
+        "objective": objective,
+        "counts": counts.tolist(),
+        "machine_params_list": fleet,
+        "num_machines": int(counts.sum()),
+        "total_capital_invested_fleet": float(capital),
+        "villas_per_year": float(model.villas(machines[0])),
+        "annual_profit": float(model.annual_profit(machines[0], op_cost[0])),
+        "npv": float(model.objective("npv", np.array([capital]), machines[None, :], op_cost[None, :])[0]),
+        "irr": float(model.objective("irr", np.array([capital]), machines[None, :], op_cost[None, :])[0]),
+        "evaluations": evaluations,
+    }
@@ -0,0 +1,296 @@
+"""Typed, validated scenario parameters.
+
+``GlobalParams`` and ``MachineParams`` are slotted dataclasses with one field
+per key of ``DEFAULT_GLOBAL_PARAMS`` / ``DEFAULT_SINGLE_MACHINE_PARAMS``.
+``FleetParams`` holds a whole fleet as one NumPy array per machine parameter
+(struct of arrays), so a 1,000-machine fleet is five arrays rather than
+1,000 dicts, and goes into the batch engine without per-machine copies.
+``ScenarioParams`` ties both together and converts to and from the
+dashboard's scenario JSON format.
+"""
+from dataclasses import asdict, dataclass, fields
+
+import numpy as np
+import pandas as pd
+
+from simulator.batch import MACHINE_PARAM_KEYS, evaluate_batch
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+from simulator.scenario import get_all_inputs_as_dict, normalize_scenario
+
+BULK_OPERATIONS = ("set", "scale", "add")
+
+_G = DEFAULT_GLOBAL_PARAMS
+_M = DEFAULT_SINGLE_MACHINE_PARAMS
+
+# Inclusive lower bounds; anything not listed must be >= 0
+_LOWER_BOUNDS = {
+    "operating_days_per_year": 1,
+    "discount_rate_for_npv": -0.99,
+    "lessor_target_profit_margin": -np.inf,
+    "machine_lifespan_years": 1,
+}
+
+
+def _coerce(cls, values):
+    # Typed field values from a mapping, ignoring unknown keys; int fields must be whole numbers
+    out = {}
+    errors = []
+    for field in fields(cls):
+        if field.name not in values:
+            continue
+        value = values[field.name]
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            errors.append(f"{field.name} must be a number, got {value!r}")
+            continue
+        if field.type is int:
+            if not number.is_integer():
+                errors.append(f"{field.name} must be a whole number, got {value!r}")
+                continue
+            number = int(number)
+        out[field.name] = number
+    if errors:
+        raise ValueError("; ".join(errors))
+    return out
+
+def _bound_errors(name, values):
+    lower = _LOWER_BOUNDS.get(name, 0)
+    values = np.asarray(values, dtype=float)
+    if np.isnan(values).any():
+        return [f"{name} must not be NaN"]
+    if (values < lower).any():
+        return [f"{name} must be at least {lower}"]
+    return []
+
+
+@dataclass(slots=True)
+class GlobalParams:
+    operating_days_per_year: int = _G["operating_days_per_year"]
+    discount_rate_for_npv: float = _G["discount_rate_for_npv"]
+    lessor_target_profit_margin: float = _G["lessor_target_profit_margin"]
+    machine_utilization_leasing_days_per_machine: int = _G["machine_utilization_leasing_days_per_machine"]
+    powder_cost_per_ton: float = _G["powder_cost_per_ton"]
+    powder_tons_per_villa: float = _G["powder_tons_per_villa"]
+    steel_cables_cost_per_villa: float = _G["steel_cables_cost_per_villa"]
+    villa_printing_days_3dcp: int = _G["villa_printing_days_3dcp"]
+    villa_additional_prep_finish_days_3dcp: int = _G["villa_additional_prep_finish_days_3dcp"]
+    market_selling_price_per_villa: float = _G["market_selling_price_per_villa"]
+    cost_foundation_per_villa_3dcp: float = _G["cost_foundation_per_villa_3dcp"]
+    cost_roofing_per_villa_3dcp: float = _G["cost_roofing_per_villa_3dcp"]
+    cost_mep_per_villa_3dcp: float = _G["cost_mep_per_villa_3dcp"]
+    cost_finishes_per_villa_3dcp: float = _G["cost_finishes_per_villa_3dcp"]
+    cost_site_prep_approvals_design_3dcp: float = _G["cost_site_prep_approvals_design_3dcp"]
+    traditional_villa_build_months: int = _G["traditional_villa_build_months"]
+    traditional_villa_cost: float = _G["traditional_villa_cost"]
+
+    @classmethod
+    def from_dict(cls, values):
+        """Build from a ``global_params`` dict; missing keys take their defaults."""
+        params = cls(**_coerce(cls, values))
+        params.validate()
+        return params
+
+    def to_dict(self):
+        return asdict(self)
+
+    def validate(self):
+        errors = []
+        for field in fields(self):
+            errors += _bound_errors(field.name, getattr(self, field.name))
+        if errors:
+            raise ValueError("Invalid global parameters: " + "; ".join(errors))
+
+
+@dataclass(slots=True)
+class MachineParams:
+    id: int = _M["id"]
+    machine_cost: float = _M["machine_cost"]
+    machine_lifespan_years: int = _M["machine_lifespan_years"]
+    annual_maintenance_cost_pct: float = _M["annual_maintenance_cost_pct"]
+    engineer_monthly_salary: float = _M["engineer_monthly_salary"]
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**_coerce(cls, values))
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class FleetParams:
+    """A fleet as one array per machine parameter (``ids`` plus ``MACHINE_PARAM_KEYS``)."""
+
+    __slots__ = ("ids",) + MACHINE_PARAM_KEYS
+
+    def __init__(self, ids, machine_cost, machine_lifespan_years, annual_maintenance_cost_pct, engineer_monthly_salary):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.machine_cost = np.asarray(machine_cost, dtype=float)
+        self.machine_lifespan_years = np.asarray(machine_lifespan_years, dtype=np.int64)
+        self.annual_maintenance_cost_pct = np.asarray(annual_maintenance_cost_pct, dtype=float)
+        self.engineer_monthly_salary = np.asarray(engineer_monthly_salary, dtype=float)
+        if any(np.shape(getattr(self, k)) != self.ids.shape for k in MACHINE_PARAM_KEYS):
+            raise ValueError("Fleet parameter arrays must all have one entry per machine.")
+
+    @classmethod
+    def default(cls, num_machines):
+        return cls(np.arange(1, num_machines + 1), *(np.full(num_machines, _M[k]) for k in MACHINE_PARAM_KEYS))
+
+    @classmethod
+    def from_machine_list(cls, machine_params_list):
+        """Build from the scenario format's ``machine_params_list``; missing keys take their defaults."""
+        machines = [MachineParams.from_dict(mp) for mp in machine_params_list]
+        ids = [mp.get("id", i + 1) for i, mp in enumerate(machine_params_list)]
+        fleet = cls(ids, *([getattr(m, k) for m in machines] for k in MACHINE_PARAM_KEYS))
+        fleet.validate()
+        return fleet
+
+    def to_machine_list(self):
+        columns = [self.ids.tolist()] + [getattr(self, k).tolist() for k in MACHINE_PARAM_KEYS]
+        return [dict(zip(("id",) + MACHINE_PARAM_KEYS, row)) for row in zip(*columns)]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return MachineParams(int(self.ids[i]), *(getattr(self, k)[i].item() for k in MACHINE_PARAM_KEYS))
+
+    def __setitem__(self, i, machine):
+        self.ids[i] = machine.id
+        for k in MACHINE_PARAM_KEYS:
+            getattr(self, k)[i] = getattr(machine, k)
+
+    def columns(self):
+        """The machine parameter arrays keyed like ``DEFAULT_SINGLE_MACHINE_PARAMS`` (without ``id``)."""
+        return {k: getattr(self, k) for k in MACHINE_PARAM_KEYS}
+
+    def resized(self, num_machines):
+        """A copy trimmed or padded with default machines (numbered after the last id) to ``num_machines``."""
+        keep = min(num_machines, len(self))
+        pad = FleetParams.default(num_machines - keep)
+        pad.ids += int(self.ids[:keep].max()) if keep else 0
+        return FleetParams(
+            np.r_[self.ids[:keep], pad.ids],
+            *(np.r_[getattr(self, k)[:keep], getattr(pad, k)] for k in MACHINE_PARAM_KEYS),
+        )
+
+    def copy(self):
+        return FleetParams(self.ids.copy(), *(getattr(self, k).copy() for k in MACHINE_PARAM_KEYS))
+
+    def take(self, rows):
+        """The machines at ``rows`` (indices or a boolean mask), as a new fleet."""
+        return FleetParams(self.ids[rows], *(getattr(self, k)[rows] for k in MACHINE_PARAM_KEYS))
+
+    def append(self, other):
+        return FleetParams(np.r_[self.ids, other.ids], *(np.r_[getattr(self, k), getattr(other, k)] for k in MACHINE_PARAM_KEYS))
+
+    def to_frame(self):
+        """The fleet as a DataFrame, one row per machine (``id`` first)."""
+        return pd.DataFrame({"id": self.ids, **self.columns()})
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Build from a DataFrame or CSV table with any of the machine columns; blank cells take their defaults."""
+        frame = frame.astype(object).where(frame.notna(), None)
+        return cls.from_machine_list([{k: v for k, v in row.items() if v is not None} for row in frame.to_dict(orient="records")])
+
+    def with_edits(self, edited_rows=None, added_rows=None, deleted_rows=None):
+        """A copy with table edits applied, in the form ``st.data_editor`` reports them.
+
+        ``edited_rows`` maps row positions to ``{column: value}`` (``None``
+        resets the default), ``deleted_rows`` lists row positions and
+        ``added_rows`` holds new rows; only those rows are touched. Machines
+        added, or whose id was cleared, are numbered after the highest id.
+        """
+        fleet = self.copy()
+        next_id = int(self.ids.max()) + 1 if len(self) else 1
+        for row, changes in (edited_rows or {}).items():
+            changes = {k: v for k, v in changes.items() if k in _M}
+            if "id" in changes and changes["id"] is None:
+                changes["id"] = next_id
+                next_id += 1
+            changes = {k: (_M[k] if v is None else v) for k, v in changes.items()}
+            for key, value in _coerce(MachineParams, changes).items():
+                getattr(fleet, "ids" if key == "id" else key)[int(row)] = value
+        if deleted_rows:
+            keep = np.ones(len(fleet), dtype=bool)
+            keep[list(deleted_rows)] = False
+            fleet = fleet.take(keep)
+        if added_rows:
+            added = FleetParams.from_machine_list([{k: v for k, v in row.items() if v is not None} for row in added_rows])
+            next_id = int(fleet.ids.max()) + 1 if len(fleet) else 1
+            for i, row in enumerate(added_rows):
+                if row.get("id") is None:
+                    added.ids[i] = next_id
+                    next_id += 1
+            fleet = fleet.append(added)
+        fleet.validate()
+        return fleet
+
+    def bulk_edit(self, parameter, operation, value, ids=None):
+        """A copy with ``parameter`` set to, multiplied by or increased by ``value`` (``operation`` "set",
+        "scale" or "add") for the machines whose id is in ``ids`` (default: all)."""
+        if parameter not in MACHINE_PARAM_KEYS:
+            raise ValueError(f"Unknown machine parameter '{parameter}'")
+        if operation not in BULK_OPERATIONS:
+            raise ValueError(f"Unknown bulk operation '{operation}', expected one of {', '.join(BULK_OPERATIONS)}")
+        fleet = self.copy()
+        rows = np.ones(len(fleet), dtype=bool) if ids is None else np.isin(fleet.ids, list(ids))
+        column = getattr(fleet, parameter)
+        current = column[rows].astype(float)
+        updated = {"set": np.full_like(current, value), "scale": current * value, "add": current + value}[operation]
+        if column.dtype.kind == "i":
+            updated = np.round(updated)
+        column[rows] = updated
+        fleet.validate()
+        return fleet
+
+    def with_copies(self, machine_id, count):
+        """A copy with ``count`` more machines like machine ``machine_id``, numbered after the highest id."""
+        rows = np.flatnonzero(self.ids == machine_id)
+        if not len(rows):
+            raise ValueError(f"No machine with id {machine_id}")
+        copies = self.take(np.full(count, rows[0]))
+        copies.ids = int(self.ids.max()) + 1 + np.arange(count)
+        return self.append(copies)
+
+    def validate(self):
+        errors = []
+        if (self.ids < 1).any():
+            errors.append("id must be at least 1")
+        # Bulk edits and copies address machines by id
+        unique_ids, id_counts = np.unique(self.ids, return_counts=True)
+        if (id_counts > 1).any():
+            errors.append(f"ids must be unique, found duplicates {', '.join(map(str, unique_ids[id_counts > 1]))}")
+        for k in MACHINE_PARAM_KEYS:
+            errors += _bound_errors(k, getattr(self, k))
+        if errors:
+            raise ValueError("Invalid machine parameters: " + "; ".join(errors))
+
+
+@dataclass(slots=True)
+class ScenarioParams:
+    global_params: GlobalParams
+    fleet: FleetParams
+
+    @classmethod
+    def from_dict(cls, scenario_data):
+        """Build from a scenario dict or JSON document, with the dashboard's defaults and fleet sizing."""
+        scenario = normalize_scenario(scenario_data)
+        return cls(GlobalParams.from_dict(scenario["global_params"]), FleetParams.from_machine_list(scenario["machine_params_list"]))
+
+    def to_dict(self):
+        """The scenario in the format saved by the dashboard (``3dcp_scenario.json``)."""
+        return get_all_inputs_as_dict(self.global_params.to_dict(), self.fleet.to_machine_list())
+
+    def batch_inputs(self):
+        """``(scenarios, machines)`` arguments for ``evaluate_batch``, one scenario row."""
+        scenarios = dict(self.global_params.to_dict(), num_machines=len(self.fleet))
+        machines = dict(self.fleet.columns(), scenario=np.zeros(len(self.fleet), dtype=np.intp))
+        return scenarios, machines
+
+    def evaluate(self):
+        """Results of the full "Run Simulation" pipeline as a one-row DataFrame."""
+        if not len(self.fleet):
+            raise ValueError("Please configure at least one machine.")
+        return evaluate_batch(*self.batch_inputs())
@@ -0,0 +1,175 @@
+"""Opt-in wall-time, call-count and allocation profiling of calculations and render stages.
+
+Calculation functions are decorated with ``@profiled``; dashboard code wraps
+render stages in ``profiler.stage(name)``. Nothing is recorded unless a
+``Profiler`` is active on the current thread (``profiler.activate()``), and
+while no thread has one the decorator costs a single global check per call.
+Activation is per thread, which keeps concurrent Streamlit sessions apart.
+
+With ``track_allocations=True`` each span also records the bytes it
+allocated (net) and its allocation peak, via ``tracemalloc``; that slows the
+profiled code down noticeably, so it is off by default. ``tracemalloc`` is
+process-wide: it runs while any profiler tracking allocations is active, and
+a span's figures include whatever other threads allocated meanwhile.
+A profiler still active when its thread ends (e.g. a Streamlit rerun cut
+short by ``st.stop``) is released with the thread's locals.
+
+``chrome_trace`` exports the spans in the Trace Event Format, which
+chrome://tracing, Perfetto and speedscope open directly.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+
+_local = threading.local()
+_state_lock = threading.Lock()
+# Number of threads with an active profiler; while zero, profiled calls skip the thread-local lookup
+_active_threads = [0]
+# Active profilers tracking allocations, and whether tracemalloc was started by them (and so is ours to stop)
+_tracemalloc_users = [0]
+_tracemalloc_owned = [False]
+
+
+def active_profiler():
+    return getattr(_local, "profiler", None)
+
+def _release(uses_tracemalloc):
+    with _state_lock:
+        _active_threads[0] -= 1
+        if uses_tracemalloc:
+            _tracemalloc_users[0] -= 1
+            if _tracemalloc_users[0] == 0 and _tracemalloc_owned[0]:
+                tracemalloc.stop()
+                _tracemalloc_owned[0] = False
+
+
+class _Activation:
+    """Only referenced from the activating thread's locals, so it is freed when that thread ends."""
+
+
+class Profiler:
+    def __init__(self, track_allocations=False):
+        self.track_allocations = track_allocations
+        self.spans = []
+        self._origin_ns = time.perf_counter_ns()
+        self._stack = []  # [start traced bytes, highest traced peak seen by children]
+        self._depth = 0
+
+    def activate(self):
+        previous = active_profiler()
+        if previous is self:
+            return self
+        if previous is not None:
+            previous.deactivate()
+        with _state_lock:
+            if self.track_allocations:
+                if _tracemalloc_users[0] == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _tracemalloc_owned[0] = True
+                _tracemalloc_users[0] += 1
+            _active_threads[0] += 1
+        _local.profiler = self
+        _local.activation = _Activation()
+        # Runs once: on deactivate, or when the thread ends with this profiler still active
+        _local.release = weakref.finalize(_local.activation, _release, self.track_allocations)
+        return self
+
+    def deactivate(self):
+        if active_profiler() is not self:
+            return
+        _local.release()
+        _local.profiler = _local.activation = _local.release = None
+
+    def __enter__(self):
+        return self.activate()
+
+    def __exit__(self, *exc_info):
+        self.deactivate()
+
+    @contextlib.contextmanager
+    def stage(self, name, category="render"):
+        """Record the enclosed block as a span, if this profiler is the active one."""
+        if active_profiler() is not self:
+            yield
+            return
+        tracing = self.track_allocations and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._stack.append([current, 0])
+        self._depth += 1
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self._depth -= 1
+            span = {"name": name, "category": category, "start_ns": start - self._origin_ns, "duration_ns": end - start,
+                    "depth": self._depth, "thread": threading.get_ident()}
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                start_bytes, child_peak = self._stack.pop()
+                peak = max(peak, child_peak)
+                span["alloc_bytes"] = current - start_bytes
+                span["peak_alloc_bytes"] = peak - start_bytes
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+            self.spans.append(span)
+
+    def elapsed_ms(self):
+        return (time.perf_counter_ns() - self._origin_ns) / 1e6
+
+    def summary(self):
+        """One row per span name: calls, total/mean/max milliseconds and allocations, slowest first."""
+        rows = {}
+        for span in self.spans:
+            row = rows.setdefault(span["name"], {"name": span["name"], "category": span["category"], "calls": 0,
+                                                 "total_ms": 0.0, "max_ms": 0.0, "alloc_bytes": 0, "peak_alloc_bytes": 0})
+            duration_ms = span["duration_ns"] / 1e6
+            row["calls"] += 1
+            row["total_ms"] += duration_ms
+            row["max_ms"] = max(row["max_ms"], duration_ms)
+            row["alloc_bytes"] += span.get("alloc_bytes", 0)
+            row["peak_alloc_bytes"] = max(row["peak_alloc_bytes"], span.get("peak_alloc_bytes", 0))
+        for row in rows.values():
+            row["mean_ms"] = row["total_ms"] / row["calls"]
+        return sorted(rows.values(), key=lambda row: row["total_ms"], reverse=True)
+
+    def chrome_trace(self):
+        """The spans as a Trace Event Format dict (``json.dumps`` it to get a ``.json`` trace file)."""
+        events = []
+        for span in self.spans:
+            args = {k: span[k] for k in ("alloc_bytes", "peak_alloc_bytes") if k in span}
+            events.append({"name": span["name"], "cat": span["category"], "ph": "X", "ts": span["start_ns"] / 1e3,
+                           "dur": span["duration_ns"] / 1e3, "pid": os.getpid(), "tid": span["thread"], "args": args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def profiled(func=None, name=None, category="calc"):
+    """Decorator recording each call of ``func`` on the active profiler, if any."""
+    if func is None:
+        return functools.partial(profiled, name=name, category=category)
+    span_name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _active_threads[0]:
+            return func(*args, **kwargs)
+        profiler = getattr(_local, "profiler", None)
+        if profiler is None:
+            return func(*args, **kwargs)
+        with profiler.stage(span_name, category):
+            return func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,51 @@
+"""Scenario files in the format saved by the dashboard (``3dcp_scenario.json``)."""
+import glob
+import json
+import os
+
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+
+
+def get_all_inputs_as_dict(global_inputs_from_ss, machine_list_from_ss):
+    # Global inputs are already in the correct format if taken from session_state
+    # Machine list is also in the correct format
+    return {
+        "global_params": global_inputs_from_ss,
+        "machine_params_list": machine_list_from_ss,
+        "num_machines": len(machine_list_from_ss)
+    }
+
+def normalize_scenario(scenario_data):
+    """Fill defaults and pad/trim the machine list to ``num_machines``, as loading into the dashboard does."""
+    loaded_global = scenario_data.get("global_params", {})
+    loaded_machines_list = scenario_data.get("machine_params_list", [])
+    loaded_num_machines = scenario_data.get("num_machines", 1)
+
+    global_params = {k: loaded_global.get(k, v) for k, v in DEFAULT_GLOBAL_PARAMS.items()}
+    machine_params_list = []
+    for i in range(loaded_num_machines):
+        machine_data = loaded_machines_list[i] if i < len(loaded_machines_list) else DEFAULT_SINGLE_MACHINE_PARAMS
+        machine = {k: machine_data.get(k, v) for k, v in DEFAULT_SINGLE_MACHINE_PARAMS.items()}
+        machine["id"] = machine_data.get("id", i + 1)
+        machine_params_list.append(machine)
+    return get_all_inputs_as_dict(global_params, machine_params_list)
+
+def find_scenario_files(inputs):
+    """Expand files, directories (``*.json`` inside) and glob patterns into a sorted, de-duplicated path list."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(glob.glob(os.path.join(item, "*.json")))
+        elif glob.has_magic(item):
+            paths.extend(glob.glob(item, recursive=True))
+        else:
+            paths.append(item)
+    return sorted(set(paths))
+
+def load_scenario_file(path):
+    with open(path) as f:
+        return json.load(f)
+
+def save_scenario_file(path, scenario_data):
+    with open(path, "w") as f:
+        json.dump(scenario_data, f, indent=2)
@@ -0,0 +1,170 @@
+"""Discrete-event simulation of villa production on a machine fleet.
+
+Each villa project goes through three phases: site prep (crew), printing
+(one machine) and finishing (crew). A machine is only held while printing,
+so it can start the next villa while crews prep and finish others. Crews
+are limited or unlimited. Time is counted in operating days, so one year is
+``operating_days_per_year`` days.
+
+Events sit on a ``heapq`` queue ordered by (time, sequence). Waiting
+projects queue FIFO per phase, and free crews take finishing work before
+new prep so that villas in progress complete first.
+"""
+import heapq
+from collections import deque
+
+import numpy as np
+
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS
+
+_ARRIVAL, _PREP_DONE, _PRINT_DONE, _FINISH_DONE = range(4)
+
+
+def generate_portfolio(global_params, num_projects, arrivals_per_year=None, duration_variability=0.0, prep_share=0.5, seed=None):
+    """Villa projects as arrays: ``arrival``, ``prep_days``, ``print_days``, ``finish_days``.
+
+    ``arrivals_per_year=None`` puts every project in the backlog on day 0;
+    otherwise arrivals are Poisson. ``duration_variability`` spreads each
+    duration uniformly by ±that fraction. The prep/finish days are split
+    before and after printing by ``prep_share``.
+    """
+    g = {k: global_params.get(k, v) for k, v in DEFAULT_GLOBAL_PARAMS.items()}
+    rng = np.random.default_rng(seed)
+    if arrivals_per_year:
+        gaps = rng.exponential(g["operating_days_per_year"] / arrivals_per_year, num_projects)
+        arrival = np.cumsum(gaps) - gaps[0]
+    else:
+        arrival = np.zeros(num_projects)
+
+    def spread(days):
+        if not duration_variability:
+            return np.full(num_projects, float(days))
+        return days * rng.uniform(1 - duration_variability, 1 + duration_variability, num_projects)
+
+    prep_finish_days = spread(g["villa_additional_prep_finish_days_3dcp"])
+    return {
+        "arrival": arrival,
+        "prep_days": prep_finish_days * prep_share,
+        "print_days": spread(g["villa_printing_days_3dcp"]),
+        "finish_days": prep_finish_days * (1 - prep_share),
+    }
+
+def simulate_production(portfolio, num_machines, num_crews=None, horizon_days=None):
+    """Schedule ``portfolio`` on ``num_machines`` machines and ``num_crews`` crews (``None`` = unlimited).
+
+    Returns per-project timings (NaN where a phase never started within
+    ``horizon_days``), per-machine busy days and the peak queue lengths.
+    """
+    arrival = np.asarray(portfolio["arrival"], dtype=float)
+    prep_days = np.asarray(portfolio["prep_days"], dtype=float)
+    print_days = np.asarray(portfolio["print_days"], dtype=float)
+    finish_days = np.asarray(portfolio["finish_days"], dtype=float)
+    num_projects = len(arrival)
+    horizon = np.inf if horizon_days is None else horizon_days
+
+    prep_start = np.full(num_projects, np.nan)
+    prep_end = np.full(num_projects, np.nan)
+    print_start = np.full(num_projects, np.nan)
+    print_end = np.full(num_projects, np.nan)
+    completed = np.full(num_projects, np.nan)
+    machine_of = np.full(num_projects, -1, dtype=np.int64)
+    machine_busy = np.zeros(num_machines)
+
+    events = [(arrival[p], p, _ARRIVAL, p) for p in range(num_projects)]
+    heapq.heapify(events)
+    seq = num_projects
+    free_machines = list(range(num_machines))
+    heapq.heapify(free_machines)
+    free_crews = np.inf if num_crews is None else num_crews
+    prep_queue, print_queue, finish_queue = deque(), deque(), deque()
+    peak_queue = {"prep": 0, "print": 0, "finish": 0}
+
+    while events:
+        now, _, kind, p = heapq.heappop(events)
+        if now > horizon:
+            break
+        if kind == _ARRIVAL:
+            prep_queue.append(p)
+        elif kind == _PREP_DONE:
+            free_crews += 1
+            prep_end[p] = now
+            print_queue.append(p)
+        elif kind == _PRINT_DONE:
+            heapq.heappush(free_machines, machine_of[p])
+            finish_queue.append(p)
+        else:
+            free_crews += 1
+            completed[p] = now
+
+        # Dispatch: crews finish villas before prepping new ones; machines print in arrival order
+        while free_crews > 0 and finish_queue:
+            q = finish_queue.popleft()
+            free_crews -= 1
+            heapq.heappush(events, (now + finish_days[q], seq, _FINISH_DONE, q))
+            seq += 1
+        while free_crews > 0 and prep_queue:
+            q = prep_queue.popleft()
+            free_crews -= 1
+            prep_start[q] = now
+            heapq.heappush(events, (now + prep_days[q], seq, _PREP_DONE, q))
+            seq += 1
+        while free_machines and print_queue:
+            q = print_queue.popleft()
+            m = heapq.heappop(free_machines)
+            machine_of[q] = m
+            print_start[q] = now
+            print_end[q] = now + print_days[q]
+            machine_busy[m] += print_days[q]
+            heapq.heappush(events, (print_end[q], seq, _PRINT_DONE, q))
+            seq += 1
+        peak_queue["prep"] = max(peak_queue["prep"], len(prep_queue))
+        peak_queue["print"] = max(peak_queue["print"], len(print_queue))
+        peak_queue["finish"] = max(peak_queue["finish"], len(finish_queue))
+
+    return {
+        "arrival": arrival,
+        "prep_start": prep_start,
+        "prep_end": prep_end,
+        "print_start": print_start,
+        "print_end": print_end,
+        "completed": completed,
+        "machine": machine_of,
+        "machine_busy_days": machine_busy,
+        "peak_queue": peak_queue,
+        "horizon_days": horizon_days,
+    }
+
+def summarize_production(schedule, operating_days_per_year):
+    """Realized villas per year, machine utilization, idle time and lead times of a schedule."""
+    completed = schedule["completed"]
+    done = ~np.isnan(completed)
+    if schedule["horizon_days"] is not None:
+        span = float(schedule["horizon_days"])
+    else:
+        span = float(np.nanmax(completed)) if done.any() else 0.0
+    busy = schedule["machine_busy_days"]
+    if schedule["horizon_days"] is not None:
+        # Printing that runs past the horizon only counts up to it
+        overrun = np.maximum(schedule["print_end"] - span, 0)
+        busy = busy - np.bincount(schedule["machine"][schedule["machine"] >= 0],
+                                  weights=np.nan_to_num(overrun[schedule["machine"] >= 0]), minlength=len(busy))
+    utilization = busy / span if span > 0 else np.zeros(len(busy))
+    lead_time = (completed - schedule["arrival"])[done]
+    machine_wait = (schedule["print_start"] - schedule["prep_end"])[~np.isnan(schedule["print_start"])]
+    years = span / operating_days_per_year if operating_days_per_year else 0.0
+    completion_year = (completed[done] // operating_days_per_year).astype(np.int64)
+    return {
+        "villas_completed": int(done.sum()),
+        "villas_in_progress_or_backlog": int((~done).sum()),
+        "simulated_years": years,
+        "realized_villas_per_year": float(done.sum() / years) if years > 0 else 0.0,
+        "villas_completed_by_year": np.bincount(completion_year).tolist() if len(completion_year) else [],
+        "machine_utilization_mean": float(utilization.mean()) if len(utilization) else 0.0,
+        "machine_utilization": utilization,
+        "machine_idle_days": span - busy,
+        "lead_time_mean_days": float(lead_time.mean()) if len(lead_time) else np.nan,
+        "lead_time_p50_days": float(np.percentile(lead_time, 50)) if len(lead_time) else np.nan,
+        "lead_time_p90_days": float(np.percentile(lead_time, 90)) if len(lead_time) else np.nan,
+        "machine_wait_mean_days": float(machine_wait.mean()) if len(machine_wait) else np.nan,
+        "peak_queue": schedule["peak_queue"],
+    }
@@ -0,0 +1,90 @@
+"""One-at-a-time sensitivity (tornado) analysis.
+
+The base case and every -X%/+X% perturbation are stacked into one batch, so
+a full tornado is a single ``evaluate_batch`` call: row 0 is the base case,
+rows ``2i + 1`` and ``2i + 2`` move parameter ``i`` down and up. Machine
+parameters are perturbed for every machine in the fleet at once. Whole-number
+inputs are rounded and move by at least one step each way.
+"""
+import numpy as np
+import pandas as pd
+
+from simulator.batch import MACHINE_PARAM_KEYS, evaluate_batch
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+
+SENSITIVITY_METRICS = (
+    "npv_3dcp_fleet",
+    "roi_3dcp_fleet_contracting",
+    "profit_per_3dcp_villa",
+)
+
+# Inputs the calculations use as whole numbers (the NPV horizon truncates the lifespan), so a
+# fractional perturbation would be cut back to the base value on one side
+INTEGER_PARAMETERS = ("machine_lifespan_years",)
+
+
+def sensitivity_parameters():
+    return list(DEFAULT_GLOBAL_PARAMS) + list(MACHINE_PARAM_KEYS)
+
+def _perturbed(parameter, values, factor):
+    if parameter not in INTEGER_PARAMETERS or factor == 1:
+        return values * factor
+    if factor > 1:
+        return np.maximum(np.round(values * factor), values + 1)
+    return np.maximum(np.minimum(np.round(values * factor), values - 1), 1)
+
+def _perturbation_batch(global_params, machine_params_list, parameters, pct):
+    num_rows = 2 * len(parameters) + 1
+    scenarios = {k: np.full(num_rows, global_params.get(k, v), dtype=float) for k, v in DEFAULT_GLOBAL_PARAMS.items()}
+    scenarios["num_machines"] = len(machine_params_list)
+    machines = {"scenario": np.repeat(np.arange(num_rows), len(machine_params_list))}
+    for key in MACHINE_PARAM_KEYS:
+        values = [mp.get(key, DEFAULT_SINGLE_MACHINE_PARAMS[key]) for mp in machine_params_list]
+        machines[key] = np.tile(np.asarray(values, dtype=float), num_rows)
+    machine_scenario = machines["scenario"]
+    for i, parameter in enumerate(parameters):
+        for row, factor in ((2 * i + 1, 1 - pct), (2 * i + 2, 1 + pct)):
+            if parameter in scenarios:
+                scenarios[parameter][row] = _perturbed(parameter, scenarios[parameter][row], factor)
+            else:
+                in_row = machine_scenario == row
+                machines[parameter][in_row] = _perturbed(parameter, machines[parameter][in_row], factor)
+    return scenarios, machines
+
+def sensitivity_analysis(global_params, machine_params_list, pct=0.10, parameters=None, metrics=SENSITIVITY_METRICS):
+    """Rank parameters by their effect on each metric when moved by ±``pct``.
+
+    Returns a long DataFrame with one row per (metric, parameter), sorted by
+    ``swing`` (|high - low| of the metric) within each metric. The inputs
+    shown for machine parameters are the first machine's.
+    """
+    if not machine_params_list:
+        raise ValueError("Sensitivity analysis needs at least one machine.")
+    parameters = list(parameters) if parameters is not None else sensitivity_parameters()
+    scenarios, machines = _perturbation_batch(global_params, machine_params_list, parameters, pct)
+    results = evaluate_batch(scenarios, machines)
+
+    base = results.iloc[0]
+    num_machines = len(machine_params_list)
+    rows = []
+    for metric in metrics:
+        values = results[metric].to_numpy(dtype=float)
+        for i, parameter in enumerate(parameters):
+            if parameter in scenarios:
+                inputs = scenarios[parameter][[0, 2 * i + 1, 2 * i + 2]]
+            else:
+                inputs = machines[parameter][[0, (2 * i + 1) * num_machines, (2 * i + 2) * num_machines]]
+            low, high = values[2 * i + 1], values[2 * i + 2]
+            rows.append({
+                "metric": metric,
+                "parameter": parameter,
+                "base_input": inputs[0],
+                "low_input": inputs[1],
+                "high_input": inputs[2],
+                "base_value": base[metric],
+                "low_value": low,
+                "high_value": high,
+                "swing": abs(high - low),
+            })
+    tornado = pd.DataFrame(rows)
+    return tornado.sort_values(["metric", "swing"], ascending=[True, False], kind="stable").reset_index(drop=True)
@@ -0,0 +1,201 @@
+"""SQLite store of scenario inputs and their computed results.
+
+The ``scenarios`` table holds the key metrics as indexed columns, so
+filters like "IRR > 20% and at most 3 machines" are index lookups over
+small rows; the normalized scenario JSON and the full results JSON live in
+``scenario_documents`` under the same id and are only read on load. Scenarios are
+keyed by a content hash of their inputs (machine ids are labels and do not
+count), so storing the same scenario twice keeps the first row. New
+scenarios are evaluated in one batch and inserted in one transaction.
+"""
+import hashlib
+import json
+import math
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from simulator.batch import MACHINE_PARAM_KEYS, evaluate_scenarios
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS
+from simulator.scenario import normalize_scenario
+
+DEFAULT_STORE_PATH = "3dcp_scenarios.db"
+
+# Indexed column -> results key
+STORE_METRICS = {
+    "npv": "npv_3dcp_fleet",
+    "irr": "irr_3dcp_fleet",
+    "roi": "roi_3dcp_fleet_contracting",
+    "annual_profit": "annual_profit_3dcp_fleet_contracting",
+    "total_capital": "total_capital_invested_fleet",
+    "villas_per_year": "total_villas_per_year_3dcp_fleet",
+    "profit_per_villa": "profit_per_3dcp_villa",
+}
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    input_hash TEXT NOT NULL UNIQUE,
+    name TEXT,
+    created_at REAL NOT NULL,
+    num_machines INTEGER NOT NULL,
+    {", ".join(f"{column} REAL" for column in STORE_METRICS)}
+);
+CREATE TABLE IF NOT EXISTS scenario_documents (
+    id INTEGER PRIMARY KEY REFERENCES scenarios (id) ON DELETE CASCADE,
+    inputs_json TEXT NOT NULL,
+    results_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scenarios_machines ON scenarios (num_machines, irr, npv, roi);
+CREATE INDEX IF NOT EXISTS idx_scenarios_irr ON scenarios (irr, num_machines, npv, roi);
+{"".join(f"CREATE INDEX IF NOT EXISTS idx_scenarios_{column} ON scenarios ({column});" for column in ("npv", "roi", "annual_profit"))}
+"""
+
+# SQLite's default limit on bound parameters is 999 on older builds
+_HASH_LOOKUP_CHUNK = 900
+
+
+def _normalized_scenario_hash(scenario):
+    # Normalized scenarios have every key, so the values in key order identify the inputs
+    values = [scenario["global_params"][k] for k in DEFAULT_GLOBAL_PARAMS]
+    for mp in scenario["machine_params_list"]:
+        values.extend(mp[k] for k in MACHINE_PARAM_KEYS)
+    return hashlib.blake2b(np.asarray(values, dtype=float).tobytes(), digest_size=16).hexdigest()
+
+def scenario_hash(scenario_data):
+    """Content hash of a scenario's normalized inputs, ignoring machine ids."""
+    return _normalized_scenario_hash(normalize_scenario(scenario_data))
+
+def _sql_value(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+class ScenarioStore:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        try:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(_SCHEMA)
+        except sqlite3.Error:
+            self.connection.close()
+            raise
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+
+    def existing_hashes(self, hashes):
+        found = set()
+        hashes = list(hashes)
+        for start in range(0, len(hashes), _HASH_LOOKUP_CHUNK):
+            chunk = hashes[start:start + _HASH_LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(f"SELECT input_hash FROM scenarios WHERE input_hash IN ({placeholders})", chunk)
+            found.update(row[0] for row in rows)
+        return found
+
+    def add_scenarios(self, scenarios, names=None):
+        """Evaluate and store the scenarios not stored yet; returns ``{"inserted": n, "duplicates": m}``."""
+        scenarios = [normalize_scenario(s) for s in scenarios]
+        names = list(names) if names is not None else [None] * len(scenarios)
+        hashes = [_normalized_scenario_hash(s) for s in scenarios]
+        existing = self.existing_hashes(set(hashes))
+        new, seen = [], set()
+        for scenario, name, input_hash in zip(scenarios, names, hashes):
+            if input_hash not in existing and input_hash not in seen:
+                seen.add(input_hash)
+                new.append((scenario, name, input_hash))
+        inserted = 0
+        if new:
+            results = evaluate_scenarios([scenario for scenario, _, _ in new])
+            records = results.astype(object).where(results.notna(), None).to_dict(orient="records")
+            now = time.time()
+            columns = ["id", "input_hash", "name", "created_at", "num_machines", *STORE_METRICS]
+            with self.connection:
+                # BEGIN IMMEDIATE takes the write lock before the duplicate re-check and the id allocation,
+                # so a scenario another writer stored since the lookup above is skipped, not inserted twice
+                self.connection.execute("BEGIN IMMEDIATE")
+                stored = self.existing_hashes(input_hash for _, _, input_hash in new)
+                (next_id,) = self.connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM scenarios").fetchone()
+                rows, documents = [], []
+                pending = [(item, record) for item, record in zip(new, records) if item[2] not in stored]
+                for scenario_id, ((scenario, name, input_hash), record) in enumerate(pending, start=next_id):
+                    record = {k: _sql_value(v) for k, v in record.items()}
+                    rows.append(
+                        (scenario_id, input_hash, name, now, scenario["num_machines"])
+                        + tuple(record[key] for key in STORE_METRICS.values())
+                    )
+                    documents.append((scenario_id, json.dumps(scenario), json.dumps(record)))
+                self.connection.executemany(
+                    f"INSERT INTO scenarios ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows
+                )
+                self.connection.executemany("INSERT INTO scenario_documents VALUES (?, ?, ?)", documents)
+            inserted = len(rows)
+            # Refresh the planner's statistics so it picks the selective index
+            self.connection.execute("PRAGMA optimize")
+        return {"inserted": inserted, "duplicates": len(scenarios) - inserted}
+
+    def query(self, min_irr=None, max_irr=None, min_npv=None, min_roi=None, min_machines=None, max_machines=None,
+              name_contains=None, order_by="npv", descending=True, limit=1000):
+        """Stored scenarios matching all given filters, as a DataFrame of the indexed columns.
+
+        IRR and ROI are in percent, as in the results. Scenarios without an
+        IRR never match an IRR filter.
+        """
+        if order_by not in ("id", "created_at", "num_machines", *STORE_METRICS):
+            raise ValueError(f"Cannot order stored scenarios by '{order_by}'")
+        conditions, params = [], []
+        for column, operator, value in (
+            ("irr", ">", min_irr), ("irr", "<=", max_irr), ("npv", ">", min_npv), ("roi", ">", min_roi),
+            ("num_machines", ">=", min_machines), ("num_machines", "<=", max_machines),
+        ):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        if name_contains:
+            conditions.append("name LIKE ?")
+            params.append(f"%{name_contains}%")
+        direction = "DESC" if descending else "ASC"
+        limit_clause = f" LIMIT {int(limit)}" if limit is not None else ""
+        select = f"SELECT id, name, created_at, num_machines, {', '.join(STORE_METRICS)} FROM scenarios"
+        if conditions:
+            # Pick the ids from a covering filter index first ("+" keeps SQLite from walking the
+            # ORDER BY index instead), then read only those rows
+            ids = f"SELECT id FROM scenarios WHERE {' AND '.join(conditions)} ORDER BY +{order_by} {direction}{limit_clause}"
+            sql = f"{select} WHERE id IN ({ids}) ORDER BY {order_by} {direction}"
+        else:
+            sql = f"{select} ORDER BY {order_by} {direction}{limit_clause}"
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    def get_scenario(self, scenario_id):
+        """The stored inputs of a scenario, in the dashboard's scenario format."""
+        row = self.connection.execute("SELECT inputs_json FROM scenario_documents WHERE id = ?", (int(scenario_id),)).fetchone()
+        if row is None:
+            raise KeyError(f"No stored scenario with id {scenario_id}")
+        return json.loads(row[0])
+
+    def get_results(self, scenario_id):
+        row = self.connection.execute("SELECT results_json FROM scenario_documents WHERE id = ?", (int(scenario_id),)).fetchone()
+        if row is None:
+            raise KeyError(f"No stored scenario with id {scenario_id}")
+        return json.loads(row[0])
+
+    def delete(self, scenario_ids):
+        ids = [(int(i),) for i in scenario_ids]
+        with self.connection:
+            self.connection.executemany("DELETE FROM scenario_documents WHERE id = ?", ids)
+            self.connection.executemany("DELETE FROM scenarios WHERE id = ?", ids)
@@ -0,0 +1,154 @@
+"""Parallel sweep over saved scenario files with a process pool.
+
+The sorted file list is cut into fixed-size chunks. Each worker loads its
+chunk, evaluates it in one vectorized pass and writes ``part-NNNNN.<fmt>``
+to the output directory (via a temporary file and an atomic rename). A
+finished part file is the checkpoint: re-running the same sweep skips
+chunks whose part already exists. ``sweep_manifest.json`` records the
+inputs and chunking so a resume cannot silently mix two different sweeps.
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from simulator.scenario import find_scenario_files
+
+MANIFEST_FILE = "sweep_manifest.json"
+
+
+def part_path(output_dir, chunk_index, fmt):
+    return os.path.join(output_dir, f"part-{chunk_index:05d}.{fmt}")
+
+def _paths_digest(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.abspath(path).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _check_manifest(output_dir, manifest, restart):
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path) and not restart:
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise ValueError(f"{output_dir} holds a different sweep (inputs, chunk size or format changed); use restart to overwrite it.")
+        return
+    for name in os.listdir(output_dir):
+        if name.startswith("part-"):
+            os.remove(os.path.join(output_dir, name))
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def run_chunk(chunk_index, paths, output_path, fmt):
+    """Evaluate one chunk of scenario files and write its part file; runs inside a worker process."""
+    import numpy as np
+    import pandas as pd
+
+    from simulator.api import SCENARIO_FILE_ERRORS, load_checked_scenario, run_scenarios, write_results
+
+    chunk_start = time.perf_counter()
+    scenarios, load_seconds, errors = [], [], []
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            scenarios.append(load_checked_scenario(path))
+            errors.append(None)
+        except SCENARIO_FILE_ERRORS as e:
+            scenarios.append(None)
+            errors.append(str(e))
+        load_seconds.append(time.perf_counter() - start)
+
+    loaded = [i for i, scenario in enumerate(scenarios) if scenario is not None]
+    start = time.perf_counter()
+    try:
+        results = run_scenarios([scenarios[i] for i in loaded])
+    except Exception:
+        # Something the load checks let through; evaluate file by file so only that file becomes an error row
+        evaluated = []
+        for i in list(loaded):
+            try:
+                evaluated.append(run_scenarios([scenarios[i]]))
+            except Exception as e:
+                loaded.remove(i)
+                errors[i] = f"Evaluation failed: {e}"
+        results = pd.concat(evaluated, ignore_index=True) if evaluated else run_scenarios([])
+    eval_seconds = time.perf_counter() - start
+    results.index = loaded
+    results = results.reindex(range(len(paths)))
+    results.insert(0, "scenario_file", paths)
+    results["error"] = errors
+    results["load_seconds"] = load_seconds
+    # Evaluation is one vectorized call, so its time is shared across the chunk
+    results["eval_seconds"] = np.where(results["error"].isna(), eval_seconds / max(len(loaded), 1), np.nan)
+
+    temp_path = output_path + ".tmp"
+    write_results(results, temp_path, fmt)
+    os.replace(temp_path, output_path)
+    return chunk_index, len(paths), len(paths) - len(loaded), time.perf_counter() - chunk_start
+
+def run_sweep(inputs, output_dir, workers=None, chunk_size=2000, fmt="csv", restart=False, progress=None):
+    """Evaluate every scenario file under ``inputs``; returns a summary dict.
+
+    ``progress`` is called as ``progress(done_chunks, total_chunks, info)`` after
+    each chunk finishes; the default prints a line to stderr.
+    """
+    paths = find_scenario_files(inputs)
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {"num_files": len(paths), "paths_sha256": _paths_digest(paths), "chunk_size": chunk_size, "format": fmt}
+    _check_manifest(output_dir, manifest, restart)
+
+    pending = [i for i in range(len(chunks)) if not os.path.exists(part_path(output_dir, i, fmt))]
+    progress = progress or _print_progress
+    summary = {
+        "num_files": len(paths),
+        "num_chunks": len(chunks),
+        "resumed_chunks": len(chunks) - len(pending),
+        "failed_files": 0,
+        "seconds": 0.0,
+    }
+    start = time.perf_counter()
+    done = summary["resumed_chunks"]
+    chunks_run = 0
+    scenarios_done = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_chunk, i, chunks[i], part_path(output_dir, i, fmt), fmt) for i in pending]
+        for future in as_completed(futures):
+            chunk_index, num_scenarios, num_failed, chunk_seconds = future.result()
+            done += 1
+            chunks_run += 1
+            scenarios_done += num_scenarios
+            summary["failed_files"] += num_failed
+            elapsed = time.perf_counter() - start
+            progress(done, len(chunks), {
+                "chunk_index": chunk_index,
+                "num_scenarios": num_scenarios,
+                "chunk_seconds": chunk_seconds,
+                "chunks_run": chunks_run,
+                "elapsed_seconds": elapsed,
+                "scenarios_per_second": scenarios_done / elapsed if elapsed > 0 else float("nan"),
+            })
+    summary["seconds"] = time.perf_counter() - start
+    summary["scenarios_per_second"] = scenarios_done / summary["seconds"] if summary["seconds"] > 0 else float("nan")
+    return summary
+
+def _print_progress(done, total, info):
+    remaining = (total - done) * info["elapsed_seconds"] / info["chunks_run"]
+    print(
+        f"[{done}/{total}] chunk {info['chunk_index']}: {info['num_scenarios']} scenarios in "
+        f"{info['chunk_seconds']:.2f} s ({info['chunk_seconds'] / max(info['num_scenarios'], 1) * 1000:.3f} ms/scenario), "
+        f"{info['scenarios_per_second']:,.0f} scenarios/s overall, ~{remaining:.0f} s left",
+        file=sys.stderr,
+    )
+
+def combine_parts(output_dir, fmt="csv"):
+    """Concatenate all part files of a finished sweep into one DataFrame, in input order."""
+    import pandas as pd
+
+    readers = {"csv": pd.read_csv, "parquet": pd.read_parquet, "json": pd.read_json}
+    parts = sorted(name for name in os.listdir(output_dir) if name.startswith("part-") and name.endswith(f".{fmt}"))
+    return pd.concat([readers[fmt](os.path.join(output_dir, name)) for name in parts], ignore_index=True)
@@ -0,0 +1,49 @@
+import math
+
+import numpy as np
+import pytest
+
+from benchmarks.batch_parity import compare, random_scenarios
+from simulator.api import run_scenario
+from simulator.batch import evaluate_batch, evaluate_scenarios
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+from simulator.scenario import get_all_inputs_as_dict
+
+
+def scenario(machines, **global_params):
+    return get_all_inputs_as_dict(dict(DEFAULT_GLOBAL_PARAMS, **global_params),
+                                  [dict(DEFAULT_SINGLE_MACHINE_PARAMS, id=i + 1, **m) for i, m in enumerate(machines)])
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_random_scenarios_match_scalar_path(seed):
+    num_compared, mismatches = compare(random_scenarios(300, seed))
+    assert num_compared > 0
+    assert mismatches == []
+
+def test_na_results_are_nan():
+    scenarios = [scenario([{}], market_selling_price_per_villa=100000.0)]
+    expected = run_scenario(scenarios[0])
+    results = evaluate_scenarios(scenarios).iloc[0]
+    assert isinstance(expected["break_even_villas_fleet"], str)
+    assert math.isnan(results["break_even_villas_fleet"])
+    assert isinstance(expected["irr_3dcp_fleet"], str)
+    assert math.isnan(results["irr_3dcp_fleet"])
+    assert results["irr_3dcp_fleet_status"] == expected["irr_3dcp_fleet_status"]
+
+@pytest.mark.parametrize("lifespans", [[-3], [-1], [1, -2], [3, 12, 7]])
+def test_lifespans_match_scalar_path(lifespans):
+    scenarios = [scenario([{"machine_lifespan_years": life} for life in lifespans])]
+    _, mismatches = compare(scenarios)
+    assert mismatches == []
+
+def test_scalar_globals_broadcast_to_machine_scenarios():
+    machines = {"scenario": np.array([0, 0, 1, 2]), "machine_cost": np.array([1e6, 2e6, 3e6, 4e6])}
+    results = evaluate_batch(dict(DEFAULT_GLOBAL_PARAMS), machines)
+    expected = evaluate_scenarios([
+        scenario([{"machine_cost": 1e6}, {"machine_cost": 2e6}]),
+        scenario([{"machine_cost": 3e6}]),
+        scenario([{"machine_cost": 4e6}]),
+    ])
+    assert len(results) == 3
+    assert results["npv_3dcp_fleet"].tolist() == expected["npv_3dcp_fleet"].tolist()
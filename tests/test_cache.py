@@ -0,0 +1,19 @@
+import numpy as np
+
+from simulator.cache import content_hash
+from simulator.params import FleetParams, GlobalParams, ScenarioParams
+
+
+def test_arrays_hash_by_content_dtype_and_shape():
+    values = np.arange(6, dtype=float)
+    assert content_hash(values) == content_hash(values.copy())
+    assert content_hash(values) != content_hash(values.astype(np.int64))
+    assert content_hash(values) != content_hash(values.reshape(2, 3))
+    assert content_hash(values) != content_hash(np.r_[values[:-1], 6.0])
+
+def test_batch_inputs_key_follows_the_params():
+    params = ScenarioParams(GlobalParams.from_dict({}), FleetParams.default(3))
+    key = content_hash(*params.batch_inputs())
+    assert content_hash(*params.batch_inputs()) == key
+    params.fleet.machine_cost[2] += 1
+    assert content_hash(*params.batch_inputs()) != key
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from simulator.api import run_scenario
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+from simulator.grid import evaluate_grid, iter_grid_chunks
+from simulator.scenario import get_all_inputs_as_dict
+
+MIXED_FLEET = [
+    dict(DEFAULT_SINGLE_MACHINE_PARAMS, id=1, machine_cost=1000000, machine_lifespan_years=4),
+    dict(DEFAULT_SINGLE_MACHINE_PARAMS, id=2, machine_cost=2500000, machine_lifespan_years=9, engineer_monthly_salary=9000),
+    dict(DEFAULT_SINGLE_MACHINE_PARAMS, id=3, machine_cost=600000, machine_lifespan_years=3),
+]
+
+
+def expected_grid(axes, metric):
+    keys = list(axes)
+    expected = np.empty(tuple(len(v) for v in axes.values()))
+    for index in np.ndindex(expected.shape):
+        point = {k: axes[k][i] for k, i in zip(keys, index)}
+        global_params = dict(DEFAULT_GLOBAL_PARAMS, **{k: v for k, v in point.items() if k in DEFAULT_GLOBAL_PARAMS})
+        machines = [dict(mp, **{k: v for k, v in point.items() if k in DEFAULT_SINGLE_MACHINE_PARAMS}) for mp in MIXED_FLEET]
+        expected[index] = run_scenario(get_all_inputs_as_dict(global_params, machines))[metric]
+    return expected
+
+@pytest.mark.parametrize("axes", [
+    {"engineer_monthly_salary": [0.0, 5000.0, 12000.0], "machine_lifespan_years": [2.0, 6.0]},
+    {"machine_cost": [5e5, 1.5e6], "annual_maintenance_cost_pct": [0.05, 0.1, 0.2]},
+    {"market_selling_price_per_villa": [1.8e6, 2.4e6], "machine_lifespan_years": [3.0, 12.0]},
+])
+def test_mixed_fleet_machine_axes_match_scalar_path(axes):
+    grid = evaluate_grid(DEFAULT_GLOBAL_PARAMS, MIXED_FLEET, axes)
+    assert np.array_equal(grid["metrics"]["npv_3dcp_fleet"], expected_grid(axes, "npv_3dcp_fleet"))
+
+def test_mixed_fleet_machine_axes_in_chunks():
+    axes = {"machine_cost": np.linspace(5e5, 3e6, 7), "engineer_monthly_salary": np.linspace(0, 20000, 5)}
+    chunks = list(iter_grid_chunks(DEFAULT_GLOBAL_PARAMS, MIXED_FLEET, axes, chunk_size=4))
+    flat = np.concatenate([values["npv_3dcp_fleet"] for _, values in chunks])
+    assert np.array_equal(flat.reshape(7, 5), expected_grid(axes, "npv_3dcp_fleet"))
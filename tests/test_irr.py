@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+import numpy_financial as npf
+
+from benchmarks.irr_benchmark import ACCURACY, random_cash_flows
+from simulator.calculations import (
+    DEFAULT_GLOBAL_PARAMS,
+    DEFAULT_SINGLE_MACHINE_PARAMS,
+    calculate_contracting_model_per_villa,
+    calculate_fleet_contracting_financials,
+)
+from simulator.irr import (
+    IRR_ERROR,
+    IRR_NO_SIGN_CHANGE,
+    IRR_NOT_BRACKETED,
+    IRR_NOT_CONVERGED,
+    IRR_OK,
+    IRR_STATUS_LABELS,
+    IRR_TOO_FEW_FLOWS,
+    irr,
+)
+
+
+def test_matches_npf_irr():
+    cash_flows, lifespans = random_cash_flows(2000, seed=1)
+    rates, status = irr(cash_flows)
+    reference = np.array([npf.irr(row[:years + 1]) for row, years in zip(cash_flows, lifespans)])
+    assert ((status == IRR_OK) == ~np.isnan(reference)).all()
+    solved = status == IRR_OK
+    assert np.abs(rates[solved] - reference[solved]).max() <= ACCURACY
+
+def test_single_vector_matches_vectorized_rows():
+    cash_flows, _ = random_cash_flows(500, seed=2)
+    rates, status = irr(cash_flows)
+    for row, rate, code in zip(cash_flows, rates, status):
+        single_rate, single_status = irr(row[None, :])
+        assert single_status[0] == code
+        assert single_rate[0] == rate or (math.isnan(single_rate[0]) and math.isnan(rate))
+
+def test_status_codes():
+    cases = {
+        IRR_NO_SIGN_CHANGE: [-100.0, -5.0, -5.0],
+        IRR_TOO_FEW_FLOWS: [-100.0],
+        IRR_NOT_BRACKETED: [-1.0, 1e30],
+    }
+    for expected, flows in cases.items():
+        for cash_flows in (np.array([flows]), np.array([flows, flows])):
+            rates, status = irr(cash_flows)
+            assert (status == expected).all()
+            assert np.isnan(rates).all()
+
+def test_not_converged():
+    flows = [-100.0, 10.0, 10.0, 200.0]
+    for cash_flows in (np.array([flows]), np.array([flows, flows])):
+        rates, status = irr(cash_flows, maxiter=2)
+        assert (status == IRR_NOT_CONVERGED).all()
+        assert np.isnan(rates).all()
+        assert (irr(cash_flows)[1] == IRR_OK).all()
+
+def test_fleet_financials_error_sets_status():
+    global_params = dict(DEFAULT_GLOBAL_PARAMS, discount_rate_for_npv=None)
+    machines = [dict(DEFAULT_SINGLE_MACHINE_PARAMS)]
+    villa = calculate_contracting_model_per_villa(1000.0, global_params)
+    results = calculate_fleet_contracting_financials(1, machines, global_params, villa)
+    assert results["irr_3dcp_fleet_status"] == IRR_ERROR
+    assert results["irr_3dcp_fleet"] == IRR_STATUS_LABELS[IRR_ERROR]
@@ -0,0 +1,43 @@
+import numpy as np
+
+from simulator.api import run_scenario
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+from simulator.montecarlo import run_monte_carlo, sample_inputs
+from simulator.scenario import get_all_inputs_as_dict
+
+
+def test_machine_only_distributions():
+    machines = [{"machine_cost": {"dist": "uniform", "low": 1e6, "high": 2e6}}]
+    samples = run_monte_carlo(DEFAULT_GLOBAL_PARAMS, machines, 10000, seed=1)
+    assert len(samples) == 10000
+    assert samples["npv_3dcp_fleet"].notna().all()
+    assert samples["npv_3dcp_fleet"].nunique() > 1
+
+def test_machine_only_distribution_matches_scalar_path():
+    # A one-value discrete draw is the point scenario; the second machine stays fixed
+    machines = [{"machine_cost": {"dist": "discrete", "values": [1500000]}}, {"machine_cost": 900000, "machine_lifespan_years": 8}]
+    samples = run_monte_carlo(DEFAULT_GLOBAL_PARAMS, machines, 50, seed=0)
+    expected = run_scenario(get_all_inputs_as_dict(DEFAULT_GLOBAL_PARAMS, [
+        dict(DEFAULT_SINGLE_MACHINE_PARAMS, id=1, machine_cost=1500000),
+        dict(DEFAULT_SINGLE_MACHINE_PARAMS, id=2, machine_cost=900000, machine_lifespan_years=8),
+    ]))
+    assert (samples["npv_3dcp_fleet"] == expected["npv_3dcp_fleet"]).all()
+    assert (samples["irr_3dcp_fleet"] == expected["irr_3dcp_fleet"]).all()
+
+def test_sampled_columns_cover_every_draw():
+    scenarios, machines = sample_inputs(DEFAULT_GLOBAL_PARAMS, [{}, {}], 7, np.random.default_rng(0))
+    assert all(np.shape(v) == (7,) for v in scenarios.values())
+    assert all(len(v) == 14 for v in machines.values())
+
+def test_lifespan_draws_stay_positive():
+    machines = [{"machine_lifespan_years": {"dist": "normal", "mean": 2, "std": 5}}]
+    _, drawn = sample_inputs(DEFAULT_GLOBAL_PARAMS, machines, 10000, np.random.default_rng(0))
+    assert drawn["machine_lifespan_years"].min() >= 1
+    samples = run_monte_carlo(DEFAULT_GLOBAL_PARAMS, machines, 10000, seed=0)
+    assert np.isfinite(samples["npv_3dcp_fleet"]).all()
+
+def test_seed_is_reproducible():
+    spec = {"market_selling_price_per_villa": {"dist": "normal", "mean": 2200000, "std": 150000}}
+    first = run_monte_carlo(dict(DEFAULT_GLOBAL_PARAMS, **spec), [{}], 1000, seed=3, chunk_size=250)
+    second = run_monte_carlo(dict(DEFAULT_GLOBAL_PARAMS, **spec), [{}], 1000, seed=3, chunk_size=250)
+    assert first.equals(second)
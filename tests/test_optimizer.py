@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from simulator.api import run_scenario
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+from simulator.optimizer import FleetModel, optimize_fleet
+from simulator.scenario import get_all_inputs_as_dict
+
+MIXED_TYPES = [
+    dict(DEFAULT_SINGLE_MACHINE_PARAMS, machine_cost=cost, machine_lifespan_years=lifespan)
+    for cost, lifespan in [(1500000, 3), (2000000, 5), (2500000, 7), (3000000, 10), (4000000, 25)]
+]
+
+
+def _fleet_npv(counts):
+    model = FleetModel(DEFAULT_GLOBAL_PARAMS, MIXED_TYPES, 1000)
+    capital, machines, op_cost = model.totals(counts)
+    return model.objective("npv", np.array([capital]), machines[None, :], op_cost[None, :])[0]
+
+@pytest.mark.parametrize("objective", ["npv", "irr"])
+def test_shared_lifespan_matches_dashboard(objective):
+    result = optimize_fleet(DEFAULT_GLOBAL_PARAMS, [DEFAULT_SINGLE_MACHINE_PARAMS], objective, min_machines=3, max_machines=3)
+    expected = run_scenario(get_all_inputs_as_dict(DEFAULT_GLOBAL_PARAMS, result["machine_params_list"]))
+    assert result["npv"] == pytest.approx(expected["npv_3dcp_fleet"], rel=1e-9)
+    assert result["irr"] == pytest.approx(expected["irr_3dcp_fleet"], abs=1e-6)
+
+def test_short_lived_machines_only_count_over_their_lifespan():
+    model = FleetModel(DEFAULT_GLOBAL_PARAMS, MIXED_TYPES)
+    _, machines, _ = model.totals([2, 0, 0, 0, 1])
+    assert machines[:3].tolist() == [3, 3, 3]
+    assert machines[3:].tolist() == [1] * 22
+
+def test_long_lived_machine_does_not_stretch_cheap_ones():
+    # One long-lived unit used to extend every machine's cash flows to its lifespan
+    result = optimize_fleet(DEFAULT_GLOBAL_PARAMS, MIXED_TYPES, "npv", capital_budget=5e8, max_villas_per_year=1000)
+    assert result["counts"] != [179, 0, 0, 0, 1]
+    assert result["npv"] > _fleet_npv([179, 0, 0, 0, 1])
+    assert result["total_capital_invested_fleet"] <= 5e8
@@ -0,0 +1,18 @@
+import pytest
+
+from simulator.params import FleetParams
+
+
+def test_edited_ids_go_to_ids():
+    fleet = FleetParams.default(3).with_edits({0: {"id": 70, "machine_cost": 50000.5}})
+    assert fleet.ids.tolist() == [70, 2, 3]
+    assert fleet.machine_cost[0] == 50000.5
+
+def test_cleared_id_takes_the_next_free_one():
+    fleet = FleetParams.default(3).with_edits({1: {"id": None}}, added_rows=[{}])
+    assert fleet.ids.tolist() == [1, 4, 3, 5]
+
+@pytest.mark.parametrize("edit", [{0: {"id": 2}}, {0: {"id": 0}}])
+def test_duplicate_or_non_positive_ids_are_rejected(edit):
+    with pytest.raises(ValueError, match="id"):
+        FleetParams.default(3).with_edits(edit)
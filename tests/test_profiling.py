@@ -0,0 +1,46 @@
+import threading
+import tracemalloc
+
+from simulator import profiling
+from simulator.profiling import Profiler, active_profiler
+
+
+def run_in_thread(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+def test_profiler_left_active_is_released_when_its_thread_ends():
+    # Like a Streamlit run stopped before its deactivate call
+    run_in_thread(lambda: Profiler(track_allocations=True).activate())
+    assert profiling._active_threads[0] == 0
+    assert profiling._tracemalloc_users[0] == 0
+    assert not tracemalloc.is_tracing()
+
+def test_tracemalloc_runs_until_the_last_tracking_profiler_stops():
+    other_active, finish = threading.Event(), threading.Event()
+
+    def other_session():
+        with Profiler(track_allocations=True):
+            other_active.set()
+            finish.wait()
+
+    thread = threading.Thread(target=other_session)
+    thread.start()
+    other_active.wait()
+    with Profiler(track_allocations=True):
+        assert profiling._tracemalloc_users[0] == 2
+    assert tracemalloc.is_tracing()
+    finish.set()
+    thread.join()
+    assert not tracemalloc.is_tracing()
+    assert profiling._active_threads[0] == 0
+
+def test_deactivate_releases_once():
+    profiler = Profiler()
+    with profiler:
+        assert active_profiler() is profiler
+        assert profiling._active_threads[0] == 1
+        profiler.deactivate()
+    assert active_profiler() is None
+    assert profiling._active_threads[0] == 0
@@ -0,0 +1,35 @@
+from simulator.api import run_scenario
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+from simulator.scenario import get_all_inputs_as_dict
+from simulator.store import ScenarioStore
+
+
+def make_scenario(machine_cost):
+    return get_all_inputs_as_dict(DEFAULT_GLOBAL_PARAMS, [dict(DEFAULT_SINGLE_MACHINE_PARAMS, machine_cost=machine_cost)])
+
+def test_add_scenarios_stores_results_once(tmp_path):
+    scenarios = [make_scenario(1500000), make_scenario(1800000), make_scenario(1500000)]
+    with ScenarioStore(str(tmp_path / "store.db")) as store:
+        assert store.add_scenarios(scenarios, names=["a", "b", "c"]) == {"inserted": 2, "duplicates": 1}
+        assert store.add_scenarios(scenarios[:1]) == {"inserted": 0, "duplicates": 1}
+        rows = store.query(order_by="id", descending=False)
+        assert rows["name"].tolist() == ["a", "b"]
+        assert store.get_results(int(rows["id"][0]))["npv_3dcp_fleet"] == run_scenario(scenarios[0])["npv_3dcp_fleet"]
+
+def test_scenario_stored_by_another_writer_meanwhile_is_skipped(tmp_path, monkeypatch):
+    path = str(tmp_path / "store.db")
+    with ScenarioStore(path) as writer, ScenarioStore(path) as other:
+        lookups = []
+        real_lookup = writer.existing_hashes
+
+        def stale_first_lookup(hashes):
+            # The unlocked lookup runs before the other writer commits
+            hashes = list(hashes)
+            lookups.append(hashes)
+            return set() if len(lookups) == 1 else real_lookup(hashes)
+
+        monkeypatch.setattr(writer, "existing_hashes", stale_first_lookup)
+        other.add_scenarios([make_scenario(1500000)])
+        assert writer.add_scenarios([make_scenario(1500000), make_scenario(1800000)]) == {"inserted": 1, "duplicates": 1}
+        assert len(writer) == 2
+        assert len(lookups) == 2
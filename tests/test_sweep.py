@@ -0,0 +1,55 @@
+import json
+
+import pandas as pd
+
+import simulator.api
+from simulator.calculations import DEFAULT_GLOBAL_PARAMS, DEFAULT_SINGLE_MACHINE_PARAMS
+from simulator.scenario import get_all_inputs_as_dict
+from simulator.sweep import run_chunk
+
+
+def write_files(tmp_path):
+    good = get_all_inputs_as_dict(DEFAULT_GLOBAL_PARAMS, [dict(DEFAULT_SINGLE_MACHINE_PARAMS)])
+    negative_lifespan = get_all_inputs_as_dict(DEFAULT_GLOBAL_PARAMS, [dict(DEFAULT_SINGLE_MACHINE_PARAMS, machine_lifespan_years=-3)])
+    contents = {
+        "a_good.json": json.dumps(good),
+        "b_lifespan.json": json.dumps(negative_lifespan),
+        "c_list.json": "[1, 2]",
+        "d_truncated.json": "{",
+        "e_good.json": json.dumps(good),
+    }
+    paths = []
+    for name, text in contents.items():
+        (tmp_path / name).write_text(text)
+        paths.append(str(tmp_path / name))
+    return paths
+
+def test_invalid_files_become_error_rows(tmp_path):
+    paths = write_files(tmp_path)
+    output_path = str(tmp_path / "part-00000.csv")
+    _, num_scenarios, num_failed, _ = run_chunk(0, paths, output_path, "csv")
+    results = pd.read_csv(output_path)
+    assert (num_scenarios, num_failed) == (5, 3)
+    assert results["error"].isna().tolist() == [True, False, False, False, True]
+    assert "machine_lifespan_years" in results.at[1, "error"]
+    assert results["npv_3dcp_fleet"].notna().tolist() == [True, False, False, False, True]
+
+def test_failed_batch_falls_back_to_single_files(tmp_path, monkeypatch):
+    paths = write_files(tmp_path)
+    run_scenarios = simulator.api.run_scenarios
+
+    def fail_on_second_file(scenarios):
+        if any(s["machine_params_list"][0].get("id") == 2 for s in scenarios):
+            raise ValueError("boom")
+        return run_scenarios(scenarios)
+
+    scenario = json.loads((tmp_path / "e_good.json").read_text())
+    scenario["machine_params_list"][0]["id"] = 2
+    (tmp_path / "e_good.json").write_text(json.dumps(scenario))
+    monkeypatch.setattr(simulator.api, "run_scenarios", fail_on_second_file)
+    output_path = str(tmp_path / "part-00000.csv")
+    _, _, num_failed, _ = run_chunk(0, paths, output_path, "csv")
+    results = pd.read_csv(output_path)
+    assert num_failed == 4
+    assert results.at[0, "npv_3dcp_fleet"] > 0
+    assert results.at[4, "error"] == "Evaluation failed: boom"